@@ -1,16 +1,38 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from anyio import to_thread
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List, Literal
-import mysql.connector
 from mysql.connector import Error
 from contextlib import contextmanager
 import json
 from datetime import datetime, date, time
+import logging
 import os
 
+import scheduler
+import validator
+from db import ConnectionPool, PoolTimeout
+from cache import ResponseCache
+from jobs import generation_jobs, DuplicateJobError
+from pagination import MAX_PAGE_SIZE, check_limit, decode_cursor, ndjson_batches, page
+from instrumentation import TimingMiddleware, timed
+import metrics
+from serialization import (
+    ColumnarResponse, FastJSONResponse, fetch_row, fetch_rows, proc_row, proc_rows,
+    to_columnar, wants_columnar
+)
+
 app = FastAPI(title="Exam Scheduler API", version="2.0.0")
 
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s %(message)s"
+)
+logger = logging.getLogger("exam_scheduler")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  
@@ -18,6 +40,15 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Only for clients sending Accept-Encoding: gzip; small bodies are not worth it
+app.add_middleware(GZipMiddleware, minimum_size=int(os.getenv("GZIP_MIN_BYTES", "1024")))
+app.add_middleware(metrics.MetricsMiddleware)
+# Outermost: Server-Timing header and JSON slow-request log (logger exam_scheduler.slow)
+app.add_middleware(
+    TimingMiddleware,
+    slow_ms=float(os.getenv("SLOW_REQUEST_MS", "500")),
+    logger=logging.getLogger("exam_scheduler.slow"),
+)
 
 DB_CONFIG = {
     "host": os.getenv("MYSQLHOST", "localhost"),
@@ -28,6 +59,37 @@ DB_CONFIG = {
     "charset": "utf8mb4"
 }
 
+db_pool = ConnectionPool(
+    DB_CONFIG,
+    size=int(os.getenv("DB_POOL_SIZE", "10")),
+    timeout=float(os.getenv("DB_POOL_TIMEOUT", "5")),
+    recycle=float(os.getenv("DB_POOL_RECYCLE", "1800")),
+    ping_after=float(os.getenv("DB_POOL_PING_AFTER", "30"))
+)
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", "2"))
+
+# Published timetables and dashboards, invalidated by generate / clear / approve
+response_cache = ResponseCache(max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
+DASHBOARD_ENDPOINTS = {
+    'dashboard/stats', 'dashboard/departments', 'dashboard/conflicts-by-type', 'dashboard/recent-activities'
+}
+
+# Worker threads for the (blocking) route handlers
+API_THREADS = int(os.getenv("API_THREADS", os.getenv("DB_POOL_SIZE", "10")))
+
+# Upper bound for the optimizer budget a single generate request may ask for
+MAX_OPTIMIZE_MS = int(os.getenv("MAX_OPTIMIZE_MS", "30000"))
+
+# Dry-run comparisons: most variants per request and worker processes used
+MAX_COMPARE_VARIANTS = 8
+COMPARE_WORKERS = int(os.getenv("COMPARE_WORKERS", str(os.cpu_count() or 2)))
+
+# Generation run retention, applied after each generation: runs older than
+# MAX_AGE_DAYS or beyond the newest KEEP of a period are dropped with their
+# conflicts (the latest full generation of a period is always kept)
+GENERATION_RUNS_KEEP = int(os.getenv("GENERATION_RUNS_KEEP", "50"))
+GENERATION_RUNS_MAX_AGE_DAYS = int(os.getenv("GENERATION_RUNS_MAX_AGE_DAYS", "730"))
+
 
 # ============================================
 # PYDANTIC MODELS
@@ -74,6 +136,26 @@ class GenerateScheduleRequest(BaseModel):
     end_date: str  # Format: "YYYY-MM-DD"
     time_slots: List[TimeSlot]
     created_by: int  # User ID
+    engine: Literal['sql', 'python'] = 'sql'  # 'python' runs scheduler.py in-process
+    strategy: Literal['greedy', 'dsatur'] = 'greedy'  # Phase-1 placement (python engine only)
+    optimize_ms: Optional[int] = None  # Local-search time budget after generation (python engine only)
+
+
+class CompareSchedulesRequest(BaseModel):
+    # Candidate settings; all must target the same annee_universitaire/semester
+    variants: List[GenerateScheduleRequest]
+
+
+class RegenerateScheduleRequest(BaseModel):
+    annee_universitaire: str
+    semester: str
+    start_date: str  # Format: "YYYY-MM-DD"
+    end_date: str  # Format: "YYYY-MM-DD"
+    time_slots: List[TimeSlot]
+    created_by: int
+    formation_ids: List[int] = []
+    department_ids: List[int] = []  # Every formation of these departments
+    strategy: Literal['greedy', 'dsatur'] = 'greedy'
 
 
 class GenerateScheduleResponse(BaseModel):
@@ -87,6 +169,14 @@ class ClearSchedulesRequest(BaseModel):
     semester: str
 
 
+class ValidateSchedulesRequest(BaseModel):
+    annee_universitaire: str
+    semester: str
+    schedule_id: Optional[int] = None     # None checks the whole period
+    created_by: Optional[int] = None
+    persist: bool = True                  # False only reports the findings
+
+
 class ChefApprovalRequest(BaseModel):
     schedule_id: int
     chef_id: int
@@ -116,13 +206,58 @@ class ApprovalResponse(BaseModel):
 def get_db_connection():
     connection = None
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        yield connection
+        connection = db_pool.acquire()
+        # Statements are timed into the request's Server-Timing / slow log
+        yield timed(connection)
+    except PoolTimeout as e:
+        metrics.record_db_error('pool_timeout')
+        raise HTTPException(status_code=503, detail=f"Database busy: {str(e)}")
     except Error as e:
+        metrics.record_db_error('query' if connection else 'connection')
         raise HTTPException(status_code=500, detail=f"Database connection failed: {str(e)}")
     finally:
-        if connection and connection.is_connected():
-            connection.close()
+        if connection:
+            db_pool.release(connection)
+
+
+@app.on_event("startup")
+def warm_db_pool():
+    # Routes are plain functions run on this thread pool, one thread per
+    # in-flight request; more threads than pooled connections would only wait
+    to_thread.current_default_thread_limiter().total_tokens = API_THREADS
+    try:
+        db_pool.warm(DB_POOL_WARM)
+    except Error as e:
+        # Start anyway: the pool opens connections on demand once MySQL is up
+        logger.warning("db_pool_warm_failed error=%s", e)
+
+
+@app.on_event("shutdown")
+def close_db_pool():
+    db_pool.close_all()
+
+
+# ============================================
+# RESPONSE FORMAT
+# ============================================
+
+def negotiate_columnar(http_request: Request, format: Optional[str]) -> bool:
+    try:
+        return wants_columnar(format, http_request.headers.get('accept'))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def exams_response(payload: dict, columnar: bool) -> FastJSONResponse:
+    """
+    An exam listing as usual, or with its "exams" rows in columnar form
+    (see serialization.to_columnar) when the client asked for it
+    """
+    headers = {"Vary": "Accept"}
+    if not columnar:
+        return FastJSONResponse(payload, headers=headers)
+    payload = {**payload, "format": "columnar", "exams": to_columnar(payload["exams"])}
+    return ColumnarResponse(payload, headers=headers)
 
 
 # ============================================
@@ -148,20 +283,62 @@ async def root():
 
 
 @app.get("/health")
-async def health_check():
+def health_check():
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT 1")
             cursor.fetchone()
             cursor.close()
-        return {"status": "healthy", "database": "connected"}
+        return {"status": "healthy", "database": "connected", "pool": db_pool.stats()}
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Service unavailable: {str(e)}")
 
 
+@app.get("/api/db/pool")
+async def db_pool_stats():
+    """Connection pool saturation: open / in use / waiting and wait times"""
+    return db_pool.stats()
+
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """Response cache hit/miss counters and memory use"""
+    return response_cache.stats()
+
+
+@metrics.registry.collector
+def pool_and_job_metrics():
+    pool = db_pool.stats()
+    yield ("db_pool_connections", "gauge", "Pooled database connections by state", [
+        ({"state": "open"}, pool["open"]),
+        ({"state": "in_use"}, pool["inUse"]),
+        ({"state": "idle"}, pool["idle"]),
+    ])
+    yield ("db_pool_size", "gauge", "Most connections the pool opens", [({}, pool["size"])])
+    yield ("db_pool_waiting", "gauge", "Requests waiting for a connection", [({}, pool["waiting"])])
+    yield ("db_pool_acquired_total", "counter", "Connections handed out", [({}, pool["acquired"])])
+    yield ("db_pool_timeouts_total", "counter", "Requests that gave up waiting", [({}, pool["timeouts"])])
+    yield ("db_pool_wait_seconds_total", "counter", "Time spent waiting for connections",
+           [({}, pool["waitMsTotal"] / 1000)])
+    yield ("generation_jobs", "gauge", "Generation jobs kept, by status",
+           [({"status": status}, count) for status, count in generation_jobs.counts().items()])
+    cache = response_cache.stats()
+    yield ("response_cache_bytes", "gauge", "Approximate size of cached responses", [({}, cache["bytes"])])
+    yield ("response_cache_lookups_total", "counter", "Response cache lookups", [
+        ({"result": "hit"}, cache["hits"]),
+        ({"result": "miss"}, cache["misses"]),
+    ])
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.post("/api/login", response_model=LoginResponse)
-async def login(credentials: LoginRequest):
+def login(credentials: LoginRequest):
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor(dictionary=True)
@@ -199,7 +376,7 @@ async def login(credentials: LoginRequest):
 
 
 @app.get("/api/user/{user_id}")
-async def get_user(user_id: int):
+def get_user(user_id: int):
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor(dictionary=True)
@@ -248,7 +425,7 @@ async def get_user(user_id: int):
 
 
 @app.get("/api/users")
-async def get_all_users():
+def get_all_users():
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor(dictionary=True)
@@ -267,7 +444,7 @@ async def get_all_users():
 
 
 @app.get("/api/departements")
-async def get_all_departements():
+def get_all_departements():
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor(dictionary=True)
@@ -294,50 +471,81 @@ async def get_all_departements():
 # SCHEDULE GENERATION ENDPOINT
 # ============================================
 
-@app.post("/api/generate-schedule", response_model=GenerateScheduleResponse)
-async def generate_schedule(request: GenerateScheduleRequest):
+def validate_generate_request(request: GenerateScheduleRequest):
+    """Check a generation request; returns (start_date, end_date)"""
+    if not request.time_slots:
+        raise HTTPException(status_code=400, detail="At least one time slot is required")
+    
+    if len(request.time_slots) > 10:
+        raise HTTPException(status_code=400, detail="Maximum 10 time slots allowed")
+    
+    # Validate semester
+    if request.semester not in ['S1', 'S2']:
+        raise HTTPException(status_code=400, detail="Semester must be S1 or S2")
+    
+    if request.strategy != 'greedy' and request.engine != 'python':
+        raise HTTPException(status_code=400, detail="The dsatur strategy requires engine 'python'")
+    
+    if request.optimize_ms is not None:
+        if request.engine != 'python':
+            raise HTTPException(status_code=400, detail="optimize_ms requires engine 'python'")
+        if not 0 < request.optimize_ms <= MAX_OPTIMIZE_MS:
+            raise HTTPException(status_code=400, detail=f"optimize_ms must be between 1 and {MAX_OPTIMIZE_MS}")
+    
+    # Validate dates
+    try:
+        start_date = datetime.strptime(request.start_date, '%Y-%m-%d').date()
+        end_date = datetime.strptime(request.end_date, '%Y-%m-%d').date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+    
+    if end_date <= start_date:
+        raise HTTPException(status_code=400, detail="End date must be after start date")
+    
+    if (end_date - start_date).days < 14:
+        raise HTTPException(status_code=400, detail="Date range must be at least 14 days")
+    
+    return start_date, end_date
+
+
+def run_generation(request: GenerateScheduleRequest, start_date: date, end_date: date, progress=None) -> dict:
     """
-    Generate exam schedule with dynamic time slots from UI
+    Blocking part of schedule generation; returns the response summary.
+    Runs in a worker thread, never on the event loop.
     """
-    try:
-        # Validate inputs
-        if not request.time_slots:
-            raise HTTPException(status_code=400, detail="At least one time slot is required")
-        
-        if len(request.time_slots) > 10:
-            raise HTTPException(status_code=400, detail="Maximum 10 time slots allowed")
-        
-        # Convert time slots to JSON format for MySQL
-        time_slots_json = json.dumps([
-            {
-                "label": slot.label,
-                "start": slot.start,
-                "end": slot.end
-            }
-            for slot in request.time_slots
-        ])
-        
-        # Validate semester
-        if request.semester not in ['S1', 'S2']:
-            raise HTTPException(status_code=400, detail="Semester must be S1 or S2")
-        
-        # Validate dates
-        try:
-            start_date = datetime.strptime(request.start_date, '%Y-%m-%d').date()
-            end_date = datetime.strptime(request.end_date, '%Y-%m-%d').date()
-            
-            if end_date <= start_date:
-                raise HTTPException(status_code=400, detail="End date must be after start date")
-            
-            days_diff = (end_date - start_date).days
-            if days_diff < 14:
-                raise HTTPException(status_code=400, detail="Date range must be at least 14 days")
-                
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
-        
-        with get_db_connection() as conn:
+    # Convert time slots to JSON format for MySQL
+    time_slots_json = json.dumps([
+        {
+            "label": slot.label,
+            "start": slot.start,
+            "end": slot.end
+        }
+        for slot in request.time_slots
+    ])
+    
+    # Times each phase into generator_phase_seconds, then reports it as before
+    phases = metrics.PhaseTimer(request.engine, request.annee_universitaire, request.semester, progress)
+    
+    with get_db_connection() as conn:
+        if request.engine == 'python':
+            result = scheduler.generate_schedule(
+                conn,
+                request.annee_universitaire,
+                request.semester,
+                start_date,
+                end_date,
+                [(slot.label, slot.start, slot.end) for slot in request.time_slots],
+                request.created_by,
+                strategy=request.strategy,
+                optimize_ms=request.optimize_ms,
+                progress=phases
+            )
+        else:
             cursor = conn.cursor(dictionary=True)
+            # The stored procedure runs all phases in one call; they are
+            # observed from the timings it records, once it returns
+            if progress:
+                progress('sp_generate_exam_schedule', 0)
             
             # Call the stored procedure with dynamic parameters
             cursor.callproc(
@@ -359,29 +567,305 @@ async def generate_schedule(request: GenerateScheduleRequest):
             
             cursor.close()
             
-            if result:
-                return GenerateScheduleResponse(
-                    success=True,
-                    message="Schedule generated successfully",
-                    result={
-                        "examsScheduled": result.get('exams_scheduled', 0),
-                        "formationsAffected": result.get('formations_affected', 0),
-                        "daysUsed": result.get('days_used', 0),
-                        "totalConflicts": result.get('total_conflicts', 0),
-                        "studentConflicts": result.get('student_conflicts', 0),
-                        "teacherConflicts": result.get('teacher_conflicts', 0),
-                        "roomConflicts": result.get('room_conflicts', 0),
-                        "timestamp": datetime.now().isoformat(),
-                        "dateRange": {
-                            "start": request.start_date,
-                            "end": request.end_date,
-                            "days": days_diff
-                        },
-                        "timeSlotsUsed": len(request.time_slots)
-                    }
-                )
-            else:
-                raise HTTPException(status_code=500, detail="No result from generator")
+            # The procedure recorded its phases under the run id it returns
+            if result and result.get('run_id'):
+                result['timings'] = scheduler.load_run_timings(conn, result['run_id'])
+                phases.record(result['timings'])
+        
+        scheduler.prune_runs(conn, GENERATION_RUNS_KEEP, GENERATION_RUNS_MAX_AGE_DAYS)
+    phases.finish()
+    
+    if not result:
+        raise HTTPException(status_code=500, detail="No result from generator")
+    response_cache.invalidate(request.annee_universitaire, request.semester)
+    
+    summary = {
+        "examsScheduled": result.get('exams_scheduled', 0),
+        "formationsAffected": result.get('formations_affected', 0),
+        "daysUsed": result.get('days_used', 0),
+        "totalConflicts": result.get('total_conflicts', 0),
+        "studentConflicts": result.get('student_conflicts', 0),
+        "teacherConflicts": result.get('teacher_conflicts', 0),
+        "roomConflicts": result.get('room_conflicts', 0),
+        "timestamp": datetime.now().isoformat(),
+        "dateRange": {
+            "start": request.start_date,
+            "end": request.end_date,
+            "days": (end_date - start_date).days
+        },
+        "timeSlotsUsed": len(request.time_slots),
+        "engine": request.engine,
+        "strategy": request.strategy,
+        "runId": result.get('run_id'),
+        "timings": result.get('timings')
+    }
+    if 'rooms_scanned' in result:
+        summary["roomAllocation"] = {
+            "roomsScanned": result['rooms_scanned'],
+            "wastedCapacity": result['wasted_capacity']
+        }
+    if 'objective_before' in result:
+        summary["optimizer"] = {
+            "objectiveBefore": result['objective_before'],
+            "objectiveAfter": result['objective_after'],
+            "movesTried": result['moves_tried'],
+            "movesAccepted": result['moves_accepted'],
+            "elapsedMs": result['optimizer_ms']
+        }
+    return summary
+
+
+@app.post("/api/generate-schedule", response_model=GenerateScheduleResponse)
+def generate_schedule(request: GenerateScheduleRequest):
+    """
+    Generate exam schedule with dynamic time slots from UI
+    """
+    try:
+        start_date, end_date = validate_generate_request(request)
+        
+        # Same one-per-period slot as the queued jobs, held on this thread
+        summary = generation_jobs.run(
+            (request.annee_universitaire, request.semester),
+            run_generation, request, start_date, end_date
+        )
+        
+        return GenerateScheduleResponse(
+            success=True,
+            message="Schedule generated successfully",
+            result=summary
+        )
+            
+    except DuplicateJobError as e:
+        raise HTTPException(
+            status_code=409,
+            detail=f"A generation for {request.annee_universitaire} {request.semester} is already running (job {e.job_id})"
+        )
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
+
+
+@app.post("/api/generate-schedule/jobs", status_code=202)
+async def submit_generation_job(request: GenerateScheduleRequest):
+    """
+    Queue a schedule generation and return its job id straight away.
+    Only one job per (annee, semester) may be active.
+    """
+    start_date, end_date = validate_generate_request(request)
+    
+    try:
+        job = generation_jobs.submit(
+            (request.annee_universitaire, request.semester),
+            run_generation, request, start_date, end_date
+        )
+    except DuplicateJobError as e:
+        raise HTTPException(
+            status_code=409,
+            detail=f"A generation for {request.annee_universitaire} {request.semester} is already running (job {e.job_id})"
+        )
+    
+    return {"jobId": job.id, "status": job.status}
+
+
+@app.get("/api/generate-schedule/jobs/{job_id}")
+async def get_generation_job(job_id: str):
+    """Job status, with the generation summary once done"""
+    job = generation_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@app.get("/api/generate-schedule/jobs/{job_id}/progress")
+async def get_generation_job_progress(job_id: str):
+    """Lightweight poll: current phase and percent complete"""
+    job = generation_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"jobId": job.id, "status": job.status, "phase": job.phase, "percent": job.percent}
+
+
+@app.get("/api/generation-runs")
+def get_generation_runs(annee: Optional[str] = None, semester: Optional[str] = None, limit: int = 20):
+    """Recent generation runs with their per-phase timings, newest first"""
+    if not 1 <= limit <= 500:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 500")
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, annee_universitaire, semester, engine, strategy, created_by,
+                       started_at, finished_at, error, total_ms, exams_scheduled, total_conflicts
+                FROM generation_runs
+                WHERE (%s IS NULL OR annee_universitaire = %s)
+                  AND (%s IS NULL OR semester = %s)
+                ORDER BY started_at DESC, id DESC
+                LIMIT %s
+            """, (annee, annee, semester, semester, limit))
+            runs = fetch_rows(cursor)
+
+            phases = {}
+            if runs:
+                placeholders = ", ".join(["%s"] * len(runs))
+                cursor.execute(f"""
+                    SELECT run_id, phase, wall_ms, iterations, rows_inserted, conflicts_logged
+                    FROM generation_run_phases
+                    WHERE run_id IN ({placeholders})
+                    ORDER BY run_id, seq
+                """, [run['id'] for run in runs])
+                for row in fetch_rows(cursor):
+                    phases.setdefault(row.pop('run_id'), []).append(row)
+            cursor.close()
+
+            for run in runs:
+                run['phases'] = phases.get(run['id'], [])
+            return FastJSONResponse({"success": True, "count": len(runs), "runs": runs})
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@app.post("/api/generate-schedule/compare")
+def compare_schedules(request: CompareSchedulesRequest):
+    """
+    Dry run: build every variant against one snapshot of the data, in
+    parallel, and compare them. Nothing is written; commit the chosen
+    variant with /api/generate-schedule. Variants always run on the
+    python engine.
+    """
+    try:
+        if not request.variants:
+            raise HTTPException(status_code=400, detail="At least one variant is required")
+        
+        if len(request.variants) > MAX_COMPARE_VARIANTS:
+            raise HTTPException(status_code=400, detail=f"Maximum {MAX_COMPARE_VARIANTS} variants allowed")
+        
+        periods = {(v.annee_universitaire, v.semester) for v in request.variants}
+        if len(periods) > 1:
+            raise HTTPException(status_code=400, detail="All variants must target the same year and semester")
+        annee, semester = periods.pop()
+        
+        variants = []
+        for variant in request.variants:
+            # Variants never reach the SQL engine, so the engine-only checks must pass
+            variant.engine = 'python'
+            start_date, end_date = validate_generate_request(variant)
+            variants.append((
+                start_date,
+                end_date,
+                [(slot.label, slot.start, slot.end) for slot in variant.time_slots],
+                variant.strategy,
+                variant.optimize_ms
+            ))
+        
+        with get_db_connection() as conn:
+            snapshot = scheduler.load_snapshot(conn, annee, semester)
+        
+        results = scheduler.dry_run_variants(snapshot, variants, COMPARE_WORKERS)
+        
+        comparison = []
+        for index, (variant, result) in enumerate(zip(request.variants, results)):
+            comparison.append({
+                "variant": index,
+                "startDate": variant.start_date,
+                "endDate": variant.end_date,
+                "timeSlotsUsed": len(variant.time_slots),
+                "strategy": variant.strategy,
+                "optimizeMs": variant.optimize_ms,
+                "examsScheduled": result['exams_scheduled'],
+                "formationsAffected": result['formations_affected'],
+                "daysUsed": result['days_used'],
+                "totalConflicts": result['total_conflicts'],
+                "conflictsByType": result['conflicts_by_type']
+            })
+        
+        return {
+            "success": True,
+            "annee_universitaire": annee,
+            "semester": semester,
+            "examCount": len(snapshot.exams),
+            "variants": comparison
+        }
+            
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
+
+
+@app.post("/api/regenerate-schedule", response_model=GenerateScheduleResponse)
+def regenerate_schedule(request: RegenerateScheduleRequest):
+    """
+    Regenerate the schedules of some formations (python engine). Other
+    schedules of the semester are kept and their rooms/teachers stay taken.
+    """
+    try:
+        if not request.formation_ids and not request.department_ids:
+            raise HTTPException(status_code=400, detail="Give at least one formation or department id")
+        
+        if not request.time_slots:
+            raise HTTPException(status_code=400, detail="At least one time slot is required")
+        
+        if len(request.time_slots) > 10:
+            raise HTTPException(status_code=400, detail="Maximum 10 time slots allowed")
+        
+        if request.semester not in ['S1', 'S2']:
+            raise HTTPException(status_code=400, detail="Semester must be S1 or S2")
+        
+        try:
+            start_date = datetime.strptime(request.start_date, '%Y-%m-%d').date()
+            end_date = datetime.strptime(request.end_date, '%Y-%m-%d').date()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+        
+        if end_date <= start_date:
+            raise HTTPException(status_code=400, detail="End date must be after start date")
+        
+        phases = metrics.PhaseTimer('python-regenerate', request.annee_universitaire, request.semester)
+        with get_db_connection() as conn:
+            formation_ids = scheduler.resolve_formations(conn, request.formation_ids, request.department_ids)
+            if not formation_ids:
+                raise HTTPException(status_code=404, detail="No matching formations")
+            
+            result = scheduler.regenerate_schedule(
+                conn,
+                request.annee_universitaire,
+                request.semester,
+                start_date,
+                end_date,
+                [(slot.label, slot.start, slot.end) for slot in request.time_slots],
+                request.created_by,
+                formation_ids,
+                strategy=request.strategy,
+                progress=phases
+            )
+            phases.finish()
+            scheduler.prune_runs(conn, GENERATION_RUNS_KEEP, GENERATION_RUNS_MAX_AGE_DAYS)
+        response_cache.invalidate(request.annee_universitaire, request.semester)
+        
+        return GenerateScheduleResponse(
+            success=True,
+            message=f"Schedule regenerated for {len(formation_ids)} formation(s)",
+            result={
+                "examsScheduled": result['exams_scheduled'],
+                "formationsAffected": result['formations_affected'],
+                "formationIds": formation_ids,
+                "daysUsed": result['days_used'],
+                "totalConflicts": result['total_conflicts'],
+                "studentConflicts": result['student_conflicts'],
+                "teacherConflicts": result['teacher_conflicts'],
+                "roomConflicts": result['room_conflicts'],
+                "timestamp": datetime.now().isoformat(),
+                "engine": "python",
+                "strategy": request.strategy,
+                "runId": result['run_id'],
+                "timings": result['timings']
+            }
+        )
             
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -396,7 +880,7 @@ async def generate_schedule(request: GenerateScheduleRequest):
 # ============================================
 
 @app.get("/api/schedules")
-async def get_schedules(
+def get_schedules(
     annee: Optional[str] = None,
     semester: Optional[str] = None
 ):
@@ -405,7 +889,7 @@ async def get_schedules(
     """
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             
             if annee and semester:
                 query = """
@@ -446,26 +930,21 @@ async def get_schedules(
                 """
                 cursor.execute(query)
             
-            schedules = cursor.fetchall()
+            schedules = fetch_rows(cursor)
             cursor.close()
             
-            # Convert datetime to string
-            for schedule in schedules:
-                if 'created_at' in schedule and schedule['created_at']:
-                    schedule['created_at'] = str(schedule['created_at'])
-            
-            return {
+            return FastJSONResponse({
                 "success": True,
                 "count": len(schedules),
                 "schedules": schedules
-            }
+            })
             
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
 @app.get("/api/schedule/{schedule_id}/stats")
-async def get_schedule_stats(schedule_id: int):
+def get_schedule_stats(schedule_id: int):
     """
     Get statistics for a specific schedule
     """
@@ -500,34 +979,27 @@ async def get_schedule_stats(schedule_id: int):
 
 
 @app.get("/api/schedule/{schedule_id}/details")
-async def get_schedule_details(schedule_id: int):
+def get_schedule_details(schedule_id: int, http_request: Request, format: Optional[str] = None):
     """
     Get detailed exam schedule for a specific schedule
+    format=columnar (or the columnar Accept type) returns the exams column-wise
     """
+    columnar = negotiate_columnar(http_request, format)
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             
             cursor.callproc("sp_get_schedule_details", [schedule_id])
             
-            details = []
-            for result in cursor.stored_results():
-                details = result.fetchall()
+            details = proc_rows(cursor)
             
             cursor.close()
             
-            # Convert dates and times to strings
-            for detail in details:
-                if 'date_exam' in detail and detail['date_exam']:
-                    detail['date_exam'] = str(detail['date_exam'])
-                if 'heure_debut' in detail and detail['heure_debut']:
-                    detail['heure_debut'] = str(detail['heure_debut'])
-            
-            return {
+            return exams_response({
                 "success": True,
                 "count": len(details),
                 "exams": details
-            }
+            }, columnar)
             
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -538,44 +1010,38 @@ async def get_schedule_details(schedule_id: int):
 # ============================================
 
 @app.get("/api/schedule/{schedule_id}/details/department/{department_id}")
-async def get_schedule_details_by_department(schedule_id: int, department_id: int):
+def get_schedule_details_by_department(schedule_id: int, department_id: int,
+                                       http_request: Request, format: Optional[str] = None):
     """
     Get detailed exam schedule for a specific schedule filtered by department
     This is used by Chef de Département to see only their department's exams
+    format=columnar (or the columnar Accept type) returns the exams column-wise
     """
+    columnar = negotiate_columnar(http_request, format)
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             
             cursor.callproc("sp_get_department_exams", [schedule_id, department_id])
             
-            details = []
-            for result in cursor.stored_results():
-                details = result.fetchall()
+            details = proc_rows(cursor)
             
             cursor.close()
             
-            # Convert dates and times to strings
-            for detail in details:
-                if 'date_exam' in detail and detail['date_exam']:
-                    detail['date_exam'] = str(detail['date_exam'])
-                if 'heure_debut' in detail and detail['heure_debut']:
-                    detail['heure_debut'] = str(detail['heure_debut'])
-            
-            return {
+            return exams_response({
                 "success": True,
                 "count": len(details),
                 "exams": details,
                 "department_id": department_id,
                 "schedule_id": schedule_id
-            }
+            }, columnar)
             
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
 @app.get("/api/debug/department/{department_id}/exams")
-async def debug_department_exams(
+def debug_department_exams(
     department_id: int,
     annee: str = "2025-2026",
     semester: str = "S1"
@@ -673,67 +1139,209 @@ async def debug_department_exams(
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
+# ============================================
+# PAGINATED / STREAMED LISTINGS
+# ============================================
+
+TIMETABLE_COLUMNS = """
+    date_exam, heure_debut, matiere, matiere_code, duree_minutes,
+    formation, formation_code, niveau, department, groupe,
+    salle, salle_capacite, surveillant, schedule_id, schedule_exam_id,
+    groupe_id, lieu_id
+"""
+TIMETABLE_KEY = ('date_exam', 'heure_debut', 'schedule_exam_id', 'id')
+
+CONFLICT_COLUMNS = """
+    sc.*,
+    e.formation_id,
+    m.nom AS matiere_nom,
+    f.nom AS formation_nom,
+    ens.nom AS enseignant_nom,
+    l.nom AS lieu_nom
+"""
+CONFLICT_JOINS = """
+    LEFT JOIN examens e ON e.id = sc.examen_id
+    LEFT JOIN matieres m ON m.id = e.matiere_id
+    LEFT JOIN formations f ON f.id = COALESCE(e.formation_id, sc.formation_id)
+    LEFT JOIN enseignants ens ON ens.id = sc.enseignant_id
+    LEFT JOIN lieux_examen l ON l.id = sc.lieu_id
+"""
+
+
+def stream_rows(sql: str, params: tuple) -> StreamingResponse:
+    """NDJSON response read from an unbuffered cursor, so memory stays flat"""
+    def rows():
+        with get_db_connection() as conn:
+            db_cursor = conn.cursor(dictionary=True, buffered=False)
+            try:
+                db_cursor.execute(sql, params)
+                yield from ndjson_batches(db_cursor)
+            finally:
+                try:
+                    db_cursor.close()
+                except Error:
+                    # Client went away mid-stream; the pool drops the connection
+                    pass
+    
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+
+def timetable_listing(annee: str, semester: str, published: bool,
+                      limit: Optional[int], after: Optional[str], stream: bool,
+                      columnar: bool = False):
+    """
+    Keyset page or NDJSON stream of timetable_rows, in
+    (date_exam, heure_debut, schedule_exam_id) order
+    """
+    try:
+        check_limit(limit)
+        key = decode_cursor(after, len(TIMETABLE_KEY)) if after else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    where = "annee_universitaire = %s AND semester = %s"
+    params = [annee, semester]
+    if published:
+        where += " AND statut = 'PUBLIE'"
+    if key:
+        where += " AND (date_exam, heure_debut, schedule_exam_id, id) > (%s, %s, %s, %s)"
+        params += key
+    
+    sql = f"""
+        SELECT {TIMETABLE_COLUMNS}, id
+        FROM timetable_rows
+        WHERE {where}
+        ORDER BY date_exam, heure_debut, schedule_exam_id, id
+    """
+    if stream:
+        return stream_rows(sql, tuple(params))
+    
+    limit = limit or MAX_PAGE_SIZE
+    try:
+        with get_db_connection() as conn:
+            db_cursor = conn.cursor()
+            db_cursor.execute(sql + " LIMIT %s", (*params, limit + 1))
+            rows = fetch_rows(db_cursor)
+            db_cursor.close()
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    
+    exams, next_cursor = page(rows, limit, TIMETABLE_KEY)
+    for exam in exams:
+        del exam['id']
+    
+    return exams_response({
+        "success": True,
+        "count": len(exams),
+        "exams": exams,
+        "next_cursor": next_cursor
+    }, columnar)
+
+
+def conflict_listing(annee: Optional[str], semester: Optional[str],
+                     limit: Optional[int], after: Optional[str], stream: bool):
+    """Keyset page or NDJSON stream of conflicts, newest first"""
+    try:
+        check_limit(limit)
+        key = [int(decode_cursor(after, 1)[0])] if after else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    conditions = []
+    params = []
+    runs = ""
+    if annee and semester:
+        # Through the period's runs: idx_conflict_run_type ranges, not a scan over examens
+        runs = "JOIN generation_runs r ON r.id = sc.run_id"
+        conditions.append("r.annee_universitaire = %s AND r.semester = %s")
+        params += [annee, semester]
+    if key:
+        conditions.append("sc.id < %s")
+        params += key
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    
+    sql = f"""
+        SELECT {CONFLICT_COLUMNS}
+        FROM schedule_conflicts sc
+        {runs}
+        {CONFLICT_JOINS}
+        {where}
+        ORDER BY sc.id DESC
+    """
+    if stream:
+        return stream_rows(sql, tuple(params))
+    
+    limit = limit or MAX_PAGE_SIZE
+    try:
+        with get_db_connection() as conn:
+            db_cursor = conn.cursor()
+            db_cursor.execute(sql + " LIMIT %s", (*params, limit + 1))
+            rows = fetch_rows(db_cursor)
+            db_cursor.close()
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    
+    conflicts, next_cursor = page(rows, limit, ('id',))
+    
+    return FastJSONResponse({
+        "success": True,
+        "count": len(conflicts),
+        "conflicts": conflicts,
+        "next_cursor": next_cursor
+    })
+
+
 # ============================================
 # CONFLICTS ENDPOINT
 # ============================================
 
 @app.get("/api/conflicts")
-async def get_conflicts(
+def get_conflicts(
     annee: Optional[str] = None,
-    semester: Optional[str] = None
+    semester: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stream: bool = False
 ):
     """
     Get all schedule conflicts, optionally filtered
+    limit / cursor page through them newest first; stream=true sends NDJSON
     """
+    if limit is not None or cursor or stream:
+        return conflict_listing(annee, semester, limit, cursor, stream)
+    
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             
             if annee and semester:
                 cursor.callproc("sp_get_schedule_conflicts", [annee, semester])
                 
-                conflicts = []
-                for result in cursor.stored_results():
-                    conflicts = result.fetchall()
+                conflicts = proc_rows(cursor)
             else:
-                cursor.execute("""
-                    SELECT 
-                        sc.*,
-                        e.formation_id,
-                        m.nom AS matiere_nom,
-                        f.nom AS formation_nom,
-                        ens.nom AS enseignant_nom,
-                        l.nom AS lieu_nom
+                cursor.execute(f"""
+                    SELECT {CONFLICT_COLUMNS}
                     FROM schedule_conflicts sc
-                    LEFT JOIN examens e ON e.id = sc.examen_id
-                    LEFT JOIN matieres m ON m.id = e.matiere_id
-                    LEFT JOIN formations f ON f.id = COALESCE(e.formation_id, sc.formation_id)
-                    LEFT JOIN enseignants ens ON ens.id = sc.enseignant_id
-                    LEFT JOIN lieux_examen l ON l.id = sc.lieu_id
+                    {CONFLICT_JOINS}
                     ORDER BY sc.created_at DESC
                     LIMIT 100
                 """)
-                conflicts = cursor.fetchall()
+                conflicts = fetch_rows(cursor)
             
             cursor.close()
             
-            # Convert datetime to string
-            for conflict in conflicts:
-                if 'created_at' in conflict and conflict['created_at']:
-                    conflict['created_at'] = str(conflict['created_at'])
-            
-            return {
+            return FastJSONResponse({
                 "success": True,
                 "count": len(conflicts),
                 "conflicts": conflicts
-            }
+            })
             
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
 @app.post("/api/clear-schedules")
-async def clear_schedules(request: ClearSchedulesRequest):
+def clear_schedules(request: ClearSchedulesRequest):
     """
     Clear all schedules for a specific period (for regeneration)
     """
@@ -751,6 +1359,9 @@ async def clear_schedules(request: ClearSchedulesRequest):
                 result = res.fetchone()
             
             cursor.close()
+            # The procedure does not commit, and the pool rolls back what is left open
+            conn.commit()
+            response_cache.invalidate(request.annee_universitaire, request.semester)
             
             return {
                 "success": True,
@@ -761,131 +1372,229 @@ async def clear_schedules(request: ClearSchedulesRequest):
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
+@app.post("/api/validate-schedules")
+def validate_schedules(request: ValidateSchedulesRequest):
+    """
+    Check the persisted schedules of a period (or one schedule) for room,
+    teacher and formation overlaps, e.g. after manual edits
+    With persist the findings replace the previous validation's conflicts
+    """
+    if request.semester not in ['S1', 'S2']:
+        raise HTTPException(status_code=400, detail="Semester must be S1 or S2")
+    
+    try:
+        with get_db_connection() as conn:
+            result = validator.validate(
+                conn,
+                request.annee_universitaire,
+                request.semester,
+                schedule_id=request.schedule_id,
+                created_by=request.created_by,
+                persist=request.persist
+            )
+            if request.persist:
+                scheduler.prune_runs(conn, GENERATION_RUNS_KEEP, GENERATION_RUNS_MAX_AGE_DAYS)
+        if request.persist:
+            response_cache.invalidate(request.annee_universitaire, request.semester)
+        
+        conflicts = [
+            {
+                "examen_id": examen_id,
+                "formation_id": formation_id,
+                "enseignant_id": enseignant_id,
+                "lieu_id": lieu_id,
+                "conflict_type": conflict_type,
+                "conflict_reason": reason
+            }
+            for examen_id, formation_id, enseignant_id, lieu_id, conflict_type, reason
+            in result['conflicts'][:MAX_PAGE_SIZE]
+        ]
+        return FastJSONResponse({
+            "success": True,
+            "runId": result['run_id'],
+            "scheduleId": request.schedule_id,
+            "examsChecked": result['exams_scheduled'],
+            "totalConflicts": result['total_conflicts'],
+            "conflictsByType": result['conflicts_by_type'],
+            "conflicts": conflicts,
+            "truncated": result['total_conflicts'] > len(conflicts),
+            "timings": result['timings']
+        })
+        
+    except Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
 @app.get("/api/exams/all")
-async def get_all_exams(
+def get_all_exams(
     annee: str,
-    semester: str
+    semester: str,
+    http_request: Request,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    format: Optional[str] = None
 ):
     """
     Get ALL exam details for a year/semester across all formations
     Used by Exam Admin to see all exams regardless of status
+    limit / cursor page through them; stream=true sends NDJSON
+    format=columnar (or the columnar Accept type) returns the exams column-wise
     """
+    columnar = negotiate_columnar(http_request, format)
+    if limit is not None or cursor or stream:
+        return timetable_listing(annee, semester, False, limit, cursor, stream, columnar)
+    
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             
             cursor.callproc("sp_get_all_exam_details", [annee, semester])
             
-            exams = []
-            for result in cursor.stored_results():
-                exams = result.fetchall()
+            exams = proc_rows(cursor)
             
             cursor.close()
             
-            # Convert dates and times to strings
-            for exam in exams:
-                if 'date_exam' in exam and exam['date_exam']:
-                    exam['date_exam'] = str(exam['date_exam'])
-                if 'heure_debut' in exam and exam['heure_debut']:
-                    exam['heure_debut'] = str(exam['heure_debut'])
-            
-            return {
+            return exams_response({
                 "success": True,
                 "count": len(exams),
                 "exams": exams
-            }
+            }, columnar)
             
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
 @app.get("/api/exams/published")
-async def get_published_exams(
+def get_published_exams(
     annee: str,
-    semester: str
+    semester: str,
+    http_request: Request,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    format: Optional[str] = None
 ):
     """
     Get PUBLISHED exam details for a year/semester
     Only returns exams with status 'PUBLIE' (approved by Doyen)
     Used by Students and Teachers to see their exam schedules
+    limit / cursor page through them; stream=true sends NDJSON
+    format=columnar (or the columnar Accept type) returns the exams column-wise
     """
+    columnar = negotiate_columnar(http_request, format)
+    if limit is not None or cursor or stream:
+        return timetable_listing(annee, semester, True, limit, cursor, stream, columnar)
+    
+    cached = response_cache.get('exams/published', annee, semester)
+    if cached is not None:
+        return exams_response(cached, columnar)
+    version = response_cache.version(annee, semester)
+    
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             
             cursor.callproc("sp_get_published_exam_details", [annee, semester])
             
-            exams = []
-            for result in cursor.stored_results():
-                exams = result.fetchall()
+            exams = proc_rows(cursor)
             
             cursor.close()
             
-            # Convert dates and times to strings
-            for exam in exams:
-                if 'date_exam' in exam and exam['date_exam']:
-                    exam['date_exam'] = str(exam['date_exam'])
-                if 'heure_debut' in exam and exam['heure_debut']:
-                    exam['heure_debut'] = str(exam['heure_debut'])
-            
-            return {
+            response = {
                 "success": True,
                 "count": len(exams),
                 "exams": exams
             }
+            response_cache.put('exams/published', annee, semester, None, response, version)
+            return exams_response(response, columnar)
             
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
 @app.get("/api/exams/student/{student_id}")
-async def get_student_exams(
+def get_student_exams(
     student_id: int,
     annee: str,
-    semester: str
+    semester: str,
+    http_request: Request,
+    format: Optional[str] = None
 ):
     """
     Get PUBLISHED exams for a specific student
     Filters by student's formation_id and optionally groupe_id
     Only returns exams with status 'PUBLIE' (approved by Doyen)
+    format=columnar (or the columnar Accept type) returns the exams column-wise
     """
+    columnar = negotiate_columnar(http_request, format)
+    cached = response_cache.get('exams/student', annee, semester, student_id)
+    if cached is not None:
+        return exams_response(cached, columnar)
+    version = response_cache.version(annee, semester)
+    
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             
-            # First verify the user exists and is a student
+            # One round trip: the student's role, formation and groupe come
+            # back on every row, next to the formation's published exams
             cursor.execute("""
-                SELECT id, role 
-                FROM utilisateurs 
-                WHERE id = %s AND role = 'Etudiant'
-            """, (student_id,))
+                SELECT
+                    et.id AS u_etudiant_id,
+                    et.formation_id AS u_formation_id,
+                    et.groupe_id AS u_groupe_id,
+                    f.nom AS u_formation_name,
+                    tr.date_exam,
+                    tr.heure_debut,
+                    tr.matiere,
+                    tr.matiere_code,
+                    tr.duree_minutes,
+                    tr.formation,
+                    tr.formation_code,
+                    tr.niveau,
+                    tr.department,
+                    tr.groupe,
+                    tr.groupe_id,
+                    tr.salle,
+                    tr.salle_capacite,
+                    tr.surveillant,
+                    tr.schedule_id,
+                    tr.schedule_exam_id,
+                    tr.groupe_id AS exam_groupe_id,
+                    tr.lieu_id,
+                    tr.formation_id
+                FROM utilisateurs u
+                LEFT JOIN etudiants et ON et.id = u.id
+                LEFT JOIN formations f ON f.id = et.formation_id
+                LEFT JOIN timetable_rows tr
+                    ON tr.formation_id = et.formation_id
+                   AND tr.annee_universitaire = %s
+                   AND tr.semester = %s
+                   AND tr.statut = 'PUBLIE'
+                WHERE u.id = %s AND u.role = 'Etudiant'
+                ORDER BY tr.date_exam, tr.heure_debut, tr.formation, tr.groupe
+            """, (annee, semester, student_id))
+            
+            rows = fetch_rows(cursor)
+            cursor.close()
             
-            user = cursor.fetchone()
-            if not user:
+            if not rows:
                 raise HTTPException(
                     status_code=404, 
                     detail=f"Student with ID {student_id} not found or user is not a student"
                 )
             
-            # Get student's formation_id and groupe_id from etudiants table
-            # Note: etudiants.id should match utilisateurs.id
-            cursor.execute("""
-                SELECT e.formation_id, e.groupe_id, f.nom AS formation_name
-                FROM etudiants e
-                LEFT JOIN formations f ON f.id = e.formation_id
-                WHERE e.id = %s
-            """, (student_id,))
-            
-            student = cursor.fetchone()
-            if not student:
+            student = rows[0]
+            if student['u_etudiant_id'] is None:
                 raise HTTPException(
                     status_code=404, 
                     detail=f"Student record not found in etudiants table for ID {student_id}"
                 )
             
-            formation_id = student.get('formation_id')
-            groupe_id = student.get('groupe_id')
-            formation_name = student.get('formation_name')
+            formation_id = student['u_formation_id']
+            groupe_id = student['u_groupe_id']
+            formation_name = student['u_formation_name']
             
             if not formation_id:
                 raise HTTPException(
@@ -893,36 +1602,18 @@ async def get_student_exams(
                     detail=f"Student {student_id} has no formation assigned"
                 )
             
-            print(f"🔍 Fetching exams for student {student_id}:")
-            print(f"   Formation ID: {formation_id} ({formation_name})")
-            print(f"   Groupe ID: {groupe_id}")
-            print(f"   Academic Year: {annee}, Semester: {semester}")
-            
-            # Get exams for this student's formation
-            # Pass NULL if groupe_id is None or 0
-            cursor.callproc("sp_get_student_exams", [
-                annee, 
-                semester, 
-                formation_id, 
-                groupe_id if groupe_id else None
-            ])
-            
             exams = []
-            for result in cursor.stored_results():
-                exams = result.fetchall()
-            
-            cursor.close()
-            
-            print(f"✅ Found {len(exams)} exams for formation_id={formation_id}")
-            
-            # Convert dates and times to strings
-            for exam in exams:
-                if 'date_exam' in exam and exam['date_exam']:
-                    exam['date_exam'] = str(exam['date_exam'])
-                if 'heure_debut' in exam and exam['heure_debut']:
-                    exam['heure_debut'] = str(exam['heure_debut'])
+            for row in rows:
+                if row['schedule_exam_id'] is None:
+                    continue
+                exams.append({key: value for key, value in row.items() if not key.startswith('u_')})
+            
+            logger.debug(
+                "student_exams student_id=%s formation_id=%s groupe_id=%s annee=%s semester=%s count=%d",
+                student_id, formation_id, groupe_id, annee, semester, len(exams)
+            )
             
-            return {
+            response = {
                 "success": True,
                 "count": len(exams),
                 "exams": exams,
@@ -930,19 +1621,21 @@ async def get_student_exams(
                 "formation_name": formation_name,
                 "groupe_id": groupe_id
             }
+            response_cache.put('exams/student', annee, semester, student_id, response, version)
+            return exams_response(response, columnar)
             
     except HTTPException:
         raise
     except Error as e:
-        print(f"❌ Database error: {str(e)}")
+        logger.error("student_exams student_id=%s database_error=%s", student_id, e)
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
-        print(f"❌ Unexpected error: {str(e)}")
+        logger.exception("student_exams student_id=%s unexpected_error", student_id)
         raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
 
 
 @app.get("/api/debug/student/{student_id}")
-async def debug_student(student_id: int):
+def debug_student(student_id: int):
     """
     Debug endpoint to check if student exists and get their data
     """
@@ -983,51 +1676,80 @@ async def debug_student(student_id: int):
 
 
 @app.get("/api/exams/teacher/{teacher_id}")
-async def get_teacher_exams(
+def get_teacher_exams(
     teacher_id: int,
     annee: str,
-    semester: str
+    semester: str,
+    http_request: Request,
+    format: Optional[str] = None
 ):
     """
     Get PUBLISHED exams for a specific teacher
     Filters by teacher's surveillances (exams where they are assigned)
     Only returns exams with status 'PUBLIE' (approved by Doyen)
+    format=columnar (or the columnar Accept type) returns the exams column-wise
     """
+    columnar = negotiate_columnar(http_request, format)
+    cached = response_cache.get('exams/teacher', annee, semester, teacher_id)
+    if cached is not None:
+        return exams_response(cached, columnar)
+    version = response_cache.version(annee, semester)
+    
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
-            
-            # Verify teacher exists
-            cursor.execute("SELECT id FROM enseignants WHERE id = %s", (teacher_id,))
-            if not cursor.fetchone():
-                raise HTTPException(status_code=404, detail="Teacher not found")
+            cursor = conn.cursor()
             
-            # Get exams where teacher is assigned
-            cursor.callproc("sp_get_teacher_exams", [
-                annee, 
-                semester, 
-                teacher_id
-            ])
+            # One round trip: existence check and assigned exams together
+            cursor.execute("""
+                SELECT
+                    tr.date_exam,
+                    tr.heure_debut,
+                    tr.matiere,
+                    tr.matiere_code,
+                    tr.duree_minutes,
+                    tr.formation,
+                    tr.formation_code,
+                    tr.niveau,
+                    tr.department,
+                    tr.groupe,
+                    tr.salle,
+                    tr.salle_capacite,
+                    tr.surveillant,
+                    tr.schedule_id,
+                    tr.schedule_exam_id,
+                    tr.groupe_id,
+                    tr.lieu_id
+                FROM enseignants ens
+                LEFT JOIN timetable_rows tr
+                    ON tr.enseignant_id = ens.id
+                   AND tr.annee_universitaire = %s
+                   AND tr.semester = %s
+                   AND tr.statut = 'PUBLIE'
+                WHERE ens.id = %s
+                ORDER BY tr.date_exam, tr.heure_debut, tr.formation, tr.groupe
+            """, (annee, semester, teacher_id))
+            
+            rows = fetch_rows(cursor)
+            cursor.close()
             
-            exams = []
-            for result in cursor.stored_results():
-                exams = result.fetchall()
+            if not rows:
+                raise HTTPException(status_code=404, detail="Teacher not found")
             
-            cursor.close()
+            exams = [row for row in rows if row['schedule_exam_id'] is not None]
             
-            # Convert dates and times to strings
-            for exam in exams:
-                if 'date_exam' in exam and exam['date_exam']:
-                    exam['date_exam'] = str(exam['date_exam'])
-                if 'heure_debut' in exam and exam['heure_debut']:
-                    exam['heure_debut'] = str(exam['heure_debut'])
+            logger.debug(
+                "teacher_exams teacher_id=%s annee=%s semester=%s count=%d",
+                teacher_id, annee, semester, len(exams)
+            )
             
-            return {
+            response = {
                 "success": True,
                 "count": len(exams),
                 "exams": exams,
                 "teacher_id": teacher_id
             }
+            response_cache.put('exams/teacher', annee, semester, teacher_id, response, version)
+            return exams_response(response, columnar)
             
     except HTTPException:
         raise
@@ -1036,7 +1758,7 @@ async def get_teacher_exams(
 
 
 @app.get("/api/debug/student-by-email/{email}")
-async def debug_student_by_email(email: str):
+def debug_student_by_email(email: str):
     """
     Debug endpoint to check student by email (e.g., ahmed.benamar@etu.univ.dz)
     """
@@ -1148,7 +1870,7 @@ async def debug_student_by_email(email: str):
 
 
 @app.get("/api/test/student-exams-example")
-async def get_test_student_exams_example():
+def get_test_student_exams_example():
     """
     Returns example exam data for testing purposes
     This is a legitimate example of what the API should return when working correctly
@@ -1238,67 +1960,80 @@ async def get_test_student_exams_example():
 # ============================================
 
 @app.get("/api/dashboard/stats")
-async def get_dashboard_stats(annee: str, semester: str):
+def get_dashboard_stats(annee: str, semester: str):
     """Get overall dashboard statistics"""
+    cached = response_cache.get('dashboard/stats', annee, semester)
+    if cached is not None:
+        return FastJSONResponse(cached)
+    version = response_cache.version(annee, semester)
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             cursor.callproc("sp_get_dashboard_stats", [annee, semester])
-            stats = None
-            for result in cursor.stored_results():
-                stats = result.fetchone()
+            stats = proc_row(cursor)
             cursor.close()
             if not stats:
-                return {"success": True, "stats": {"total_exams_target": 0, "total_exams_generated": 0, "total_conflicts": 0, "critical_conflicts": 0, "medium_conflicts": 0, "low_conflicts": 0, "pending_formations": 0}}
-            return {"success": True, "stats": stats}
+                stats = {"total_exams_target": 0, "total_exams_generated": 0, "total_conflicts": 0, "critical_conflicts": 0, "medium_conflicts": 0, "low_conflicts": 0, "pending_formations": 0}
+            response = {"success": True, "stats": stats}
+            response_cache.put('dashboard/stats', annee, semester, None, response, version)
+            return FastJSONResponse(response)
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 @app.get("/api/dashboard/departments")
-async def get_department_stats(annee: str, semester: str):
+def get_department_stats(annee: str, semester: str):
     """Get per-department statistics"""
+    cached = response_cache.get('dashboard/departments', annee, semester)
+    if cached is not None:
+        return FastJSONResponse(cached)
+    version = response_cache.version(annee, semester)
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             cursor.callproc("sp_get_department_stats", [annee, semester])
-            departments = []
-            for result in cursor.stored_results():
-                departments = result.fetchall()
+            departments = proc_rows(cursor)
             cursor.close()
-            return {"success": True, "count": len(departments), "departments": departments}
+            response = {"success": True, "count": len(departments), "departments": departments}
+            response_cache.put('dashboard/departments', annee, semester, None, response, version)
+            return FastJSONResponse(response)
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 @app.get("/api/dashboard/conflicts-by-type")
-async def get_conflicts_by_type(annee: str, semester: str):
+def get_conflicts_by_type(annee: str, semester: str):
     """Get conflicts breakdown by type"""
+    cached = response_cache.get('dashboard/conflicts-by-type', annee, semester)
+    if cached is not None:
+        return FastJSONResponse(cached)
+    version = response_cache.version(annee, semester)
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             cursor.callproc("sp_get_conflicts_by_type", [annee, semester])
-            conflicts = []
-            for result in cursor.stored_results():
-                conflicts = result.fetchall()
+            conflicts = proc_rows(cursor)
             cursor.close()
-            return {"success": True, "count": len(conflicts), "conflicts": conflicts}
+            response = {"success": True, "count": len(conflicts), "conflicts": conflicts}
+            response_cache.put('dashboard/conflicts-by-type', annee, semester, None, response, version)
+            return FastJSONResponse(response)
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 @app.get("/api/dashboard/recent-activities")
-async def get_recent_activities(annee: str, semester: str, limit: int = 10):
+def get_recent_activities(annee: str, semester: str, limit: int = 10):
     """Get recent scheduling activities"""
+    cached = response_cache.get('dashboard/recent-activities', annee, semester, limit)
+    if cached is not None:
+        return FastJSONResponse(cached)
+    version = response_cache.version(annee, semester)
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             cursor.callproc("sp_get_recent_activities", [annee, semester, limit])
-            activities = []
-            for result in cursor.stored_results():
-                activities = result.fetchall()
+            activities = proc_rows(cursor)
             cursor.close()
-            for activity in activities:
-                if 'time' in activity and activity['time']:
-                    activity['time'] = str(activity['time'])
-            return {"success": True, "count": len(activities), "activities": activities}
+            response = {"success": True, "count": len(activities), "activities": activities}
+            response_cache.put('dashboard/recent-activities', annee, semester, limit, response, version)
+            return FastJSONResponse(response)
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
@@ -1308,7 +2043,7 @@ async def get_recent_activities(annee: str, semester: str, limit: int = 10):
 # ============================================
 
 @app.get("/api/approvals/chef/{chef_id}")
-async def get_chef_approvals(
+def get_chef_approvals(
     chef_id: int,
     annee: str,
     semester: str
@@ -1319,13 +2054,11 @@ async def get_chef_approvals(
     """
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             
             cursor.callproc("sp_get_schedules_for_chef", [chef_id, annee, semester])
             
-            schedules = []
-            for result in cursor.stored_results():
-                schedules = result.fetchall()
+            schedules = proc_rows(cursor)
             
             cursor.close()
             
@@ -1333,16 +2066,11 @@ async def get_chef_approvals(
             if schedules and schedules[0].get('status') == 'ERROR':
                 raise HTTPException(status_code=400, detail=schedules[0].get('message'))
             
-            # Convert datetime to string
-            for schedule in schedules:
-                if 'created_at' in schedule and schedule['created_at']:
-                    schedule['created_at'] = str(schedule['created_at'])
-            
-            return {
+            return FastJSONResponse({
                 "success": True,
                 "count": len(schedules),
                 "schedules": schedules
-            }
+            })
             
     except HTTPException:
         raise
@@ -1351,7 +2079,7 @@ async def get_chef_approvals(
 
 
 @app.get("/api/approvals/doyen")
-async def get_doyen_approvals(
+def get_doyen_approvals(
     annee: str,
     semester: str
 ):
@@ -1361,74 +2089,51 @@ async def get_doyen_approvals(
     """
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             
             cursor.callproc("sp_get_schedules_for_doyen", [annee, semester])
             
-            schedules = []
-            for result in cursor.stored_results():
-                schedules = result.fetchall()
+            schedules = proc_rows(cursor)
             
             cursor.close()
             
-            # Convert datetime to string
-            for schedule in schedules:
-                if 'created_at' in schedule and schedule['created_at']:
-                    schedule['created_at'] = str(schedule['created_at'])
-                if 'chef_approved_at' in schedule and schedule['chef_approved_at']:
-                    schedule['chef_approved_at'] = str(schedule['chef_approved_at'])
-            
-            return {
+            return FastJSONResponse({
                 "success": True,
                 "count": len(schedules),
                 "schedules": schedules
-            }
+            })
             
     except Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
 @app.get("/api/approvals/details/{schedule_id}")
-async def get_approval_details(schedule_id: int):
+def get_approval_details(schedule_id: int):
     """
     Get detailed approval information for a specific schedule
     Returns schedule info + approval history
     """
     try:
         with get_db_connection() as conn:
-            cursor = conn.cursor(dictionary=True)
+            cursor = conn.cursor()
             
             cursor.callproc("sp_get_approval_details", [schedule_id])
             
-            # First result set: schedule details
-            schedule_info = None
-            for result in cursor.stored_results():
-                schedule_info = result.fetchone()
-                break
-            
-            # Second result set: approval history
-            approval_history = []
-            for result in cursor.stored_results():
-                approval_history = result.fetchall()
+            # First result set: schedule details, last one: approval history
+            results = list(cursor.stored_results())
+            schedule_info = fetch_row(results[0]) if results else None
+            approval_history = fetch_rows(results[-1]) if results else []
             
             cursor.close()
             
             if not schedule_info:
                 raise HTTPException(status_code=404, detail="Schedule not found")
             
-            # Convert datetime to string
-            if 'schedule_created_at' in schedule_info and schedule_info['schedule_created_at']:
-                schedule_info['schedule_created_at'] = str(schedule_info['schedule_created_at'])
-            
-            for approval in approval_history:
-                if 'approved_at' in approval and approval['approved_at']:
-                    approval['approved_at'] = str(approval['approved_at'])
-            
-            return {
+            return FastJSONResponse({
                 "success": True,
                 "schedule": schedule_info,
                 "approval_history": approval_history
-            }
+            })
             
     except HTTPException:
         raise
@@ -1436,8 +2141,21 @@ async def get_approval_details(schedule_id: int):
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
 
+def invalidate_schedule_period(conn, schedule_id: int, endpoints=None):
+    """Drop cached responses for the period of a schedule"""
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT annee_universitaire, semester FROM schedules WHERE id = %s",
+        (schedule_id,)
+    )
+    period = cursor.fetchone()
+    cursor.close()
+    if period:
+        response_cache.invalidate(period[0], period[1], endpoints)
+
+
 @app.post("/api/approvals/chef/approve", response_model=ApprovalResponse)
-async def chef_approve_schedule(request: ChefApprovalRequest):
+def chef_approve_schedule(request: ChefApprovalRequest):
     """
     Chef de Département approves or rejects a schedule
     
@@ -1468,6 +2186,9 @@ async def chef_approve_schedule(request: ChefApprovalRequest):
             if result and result.get('status') == 'ERROR':
                 raise HTTPException(status_code=400, detail=result.get('message'))
             
+            # Chef decisions never touch PUBLIE schedules: only dashboards change
+            invalidate_schedule_period(conn, request.schedule_id, DASHBOARD_ENDPOINTS)
+            
             return ApprovalResponse(
                 status=result.get('status', 'SUCCESS'),
                 message=result.get('message', 'Action completed'),
@@ -1481,7 +2202,7 @@ async def chef_approve_schedule(request: ChefApprovalRequest):
 
 
 @app.post("/api/approvals/doyen/approve", response_model=ApprovalResponse)
-async def doyen_approve_schedule(request: DoyenApprovalRequest):
+def doyen_approve_schedule(request: DoyenApprovalRequest):
     """
     Doyen or Vice-Doyen approves or rejects a schedule
     
@@ -1517,6 +2238,8 @@ async def doyen_approve_schedule(request: DoyenApprovalRequest):
                     detail=result.get('message')
                 )
             
+            invalidate_schedule_period(conn, request.schedule_id)
+            
             return ApprovalResponse(
                 status=result.get('status', 'SUCCESS'),
                 message=result.get('message', 'Action completed'),
@@ -1530,7 +2253,7 @@ async def doyen_approve_schedule(request: DoyenApprovalRequest):
 
 
 @app.get("/api/approvals/status/{schedule_id}")
-async def get_approval_status(schedule_id: int):
+def get_approval_status(schedule_id: int):
     """Quick status check for a schedule"""
     try:
         with get_db_connection() as conn:
@@ -1578,7 +2301,7 @@ async def get_approval_status(schedule_id: int):
 
 
 @app.get("/api/approvals/statistics")
-async def get_approval_statistics(annee: str, semester: str):
+def get_approval_statistics(annee: str, semester: str):
     """Get approval statistics for dashboard"""
     try:
         with get_db_connection() as conn:
@@ -1594,7 +2317,7 @@ async def get_approval_statistics(annee: str, semester: str):
 
 
 @app.get("/api/approvals/pending-count")
-async def get_pending_approval_count(user_id: int, annee: str, semester: str):
+def get_pending_approval_count(user_id: int, annee: str, semester: str):
     """Get count of schedules pending approval for notification badges"""
     try:
         with get_db_connection() as conn:
@@ -0,0 +1,92 @@
+"""
+Concurrent-request throughput benchmark for the API.
+
+Fires the same GET requests from many client threads at a running server
+and reports requests/second and latency percentiles. Run it against the
+server before and after a change, with the same database, to compare:
+
+    uvicorn app:app --port 8000
+    python bench/concurrency.py --url http://localhost:8000 \
+        --path /api/user/1 --path "/api/dashboard/stats?annee=2024-2025&semester=S1" \
+        --concurrency 32 --requests 2000
+"""
+
+import argparse
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def fetch(url: str, timeout: float):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, OSError):
+        status = 0
+    return status, time.perf_counter() - started
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run(base_url: str, paths, concurrency: int, total: int, timeout: float) -> dict:
+    urls = [base_url.rstrip('/') + paths[i % len(paths)] for i in range(total)]
+
+    # Warm-up: opens pooled DB connections and server threads
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda url: fetch(url, timeout), urls[:concurrency]))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda url: fetch(url, timeout), urls))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for _status, latency in results)
+    errors = sum(1 for status, _latency in results if not 200 <= status < 300)
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "elapsedSeconds": round(elapsed, 3),
+        "requestsPerSecond": round(total / elapsed, 1),
+        "latencyMs": {
+            "mean": round(statistics.fmean(latencies) * 1000, 2),
+            "p50": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99": round(percentile(latencies, 0.99) * 1000, 2),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--path", action="append", dest="paths",
+                        help="GET path to request (repeatable); defaults to /health")
+    parser.add_argument("--concurrency", type=int, action="append",
+                        help="Client threads (repeatable to sweep); defaults to 1, 8 and 32")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    paths = args.paths or ["/health"]
+    report = [
+        run(args.url, paths, concurrency, args.requests, args.timeout)
+        for concurrency in (args.concurrency or [1, 8, 32])
+    ]
+    print(json.dumps({"url": args.url, "paths": paths, "runs": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Per-row encoding cost of the listing responses.
+
+Builds synthetic timetable rows (the columns of timetable_rows, with the
+date, TIME-as-timedelta and datetime values mysql.connector returns) and
+times the old path (dict rows, str() loop over the date/time columns, then
+FastAPI's jsonable_encoder and json.dumps) against the new one (tuple rows
+zipped into dicts, one serialization.dumps call), and reports the payload
+size of the default and columnar shapes. Run from lib/backend:
+
+    python bench/encoding.py --rows 5000 --repeat 20
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serialization  # noqa: E402
+
+try:
+    from fastapi.encoders import jsonable_encoder
+except ImportError:  # pragma: no cover - depends on the environment
+    jsonable_encoder = None
+
+
+COLUMNS = (
+    'schedule_exam_id', 'date_exam', 'heure_debut', 'duree_minutes', 'module',
+    'formation', 'groupe', 'lieu', 'lieu_type', 'capacite', 'surveillant',
+    'departement', 'statut', 'created_at',
+)
+
+
+def make_rows(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    first_day = date(2025, 1, 12)
+    rows = []
+    for i in range(count):
+        rows.append((
+            i + 1,
+            first_day + timedelta(days=rng.randrange(20)),
+            timedelta(hours=rng.choice((8, 10, 13, 15)), minutes=rng.choice((0, 30))),
+            90,
+            f"Module {rng.randrange(400)}",
+            f"Formation {rng.randrange(60)}",
+            f"G{rng.randrange(1, 6)}",
+            f"Salle {rng.randrange(120)}",
+            rng.choice(('AMPHI', 'SALLE')),
+            rng.choice((20, 40, 120, 300)),
+            f"Enseignant {rng.randrange(500)}",
+            f"Departement {rng.randrange(8)}",
+            'PUBLIE',
+            datetime(2024, 12, 1, 9, 30) + timedelta(seconds=i),
+        ))
+    return rows
+
+
+def old_path(rows) -> bytes:
+    exams = [dict(zip(COLUMNS, row)) for row in rows]
+    for exam in exams:
+        if 'date_exam' in exam and exam['date_exam']:
+            exam['date_exam'] = str(exam['date_exam'])
+        if 'heure_debut' in exam and exam['heure_debut']:
+            exam['heure_debut'] = str(exam['heure_debut'])
+    content = {"success": True, "count": len(exams), "exams": exams}
+    if jsonable_encoder is not None:
+        content = jsonable_encoder(content)
+    # Starlette's JSONResponse.render
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(',', ':'), default=str
+    ).encode('utf-8')
+
+
+def new_path(rows) -> bytes:
+    exams = [dict(zip(COLUMNS, row)) for row in rows]
+    return serialization.dumps({"success": True, "count": len(exams), "exams": exams})
+
+
+def payload_sizes(rows) -> dict:
+    """Bytes on the wire for the default and columnar shapes, plain and gzipped"""
+    exams = [dict(zip(COLUMNS, row)) for row in rows]
+    default = serialization.dumps({"success": True, "count": len(exams), "exams": exams})
+    columnar = serialization.dumps({
+        "success": True, "count": len(exams), "format": "columnar",
+        "exams": serialization.to_columnar(exams),
+    })
+    return {
+        "json": len(default),
+        "jsonGzip": len(gzip.compress(default)),
+        "columnar": len(columnar),
+        "columnarGzip": len(gzip.compress(columnar)),
+    }
+
+
+def measure(fn, rows, repeat: int) -> float:
+    """Best wall time of repeat runs, in microseconds per row"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(rows)
+        best = min(best, time.perf_counter() - started)
+    return best * 1e6 / len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    old_us = measure(old_path, rows, args.repeat)
+    new_us = measure(new_path, rows, args.repeat)
+    print(json.dumps({
+        "rows": args.rows,
+        "backend": "orjson" if serialization.orjson is not None else "json",
+        "jsonableEncoder": jsonable_encoder is not None,
+        "oldUsPerRow": round(old_us, 3),
+        "newUsPerRow": round(new_us, 3),
+        "speedup": round(old_us / new_us, 2),
+        "payloadBytes": payload_sizes(rows),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
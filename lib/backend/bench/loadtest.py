@@ -0,0 +1,325 @@
+"""
+Exam-week load test: replays the post-publication traffic mix at a fixed rate.
+
+Starts the API with uvicorn against the local MySQL (or uses --url),
+then sends a weighted mix of student logins, student timetables, chef
+pending-count polls and published-exam listings at --rps for
+--duration seconds. Requests are open-loop: each one is due at a fixed
+time and its latency is measured from then, so a slow server shows up
+as latency instead of silently lowering the rate. Reports p50/p95/p99
+and error rates per route, and exits with status 1 when a gate fails:
+
+    MYSQL_DATABASE=exam_scheduler_bench python bench/loadtest.py \
+        --rps 200 --duration 60 --output load.json \
+        --max-p95-ms 250 --max-error-rate 0.01 --baseline previous-load.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import queue
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic  # noqa: E402
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MIX = "login=30,student_exams=55,pending_count=10,published=5"
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+# ============================================
+# TRAFFIC
+# ============================================
+
+class Traffic:
+    """Builds (route, method, path, body) requests for the users found in the database"""
+
+    def __init__(self, students, chefs, annee: str, semester: str, password: str, seed: int):
+        if not students:
+            raise SystemExit("No Etudiant users in the database; load bench/synthetic.py first")
+        self.students = students
+        self.chefs = chefs
+        self.period = urllib.parse.urlencode({"annee": annee, "semester": semester})
+        self.password = password
+        self.rng = random.Random(seed)
+
+    def build(self, route: str):
+        if route == 'login':
+            _student_id, email = self.rng.choice(self.students)
+            body = json.dumps({"email": email, "password": self.password})
+            return route, "POST", "/api/login", body
+        if route == 'student_exams':
+            student_id, _email = self.rng.choice(self.students)
+            return route, "GET", f"/api/exams/student/{student_id}?{self.period}", None
+        if route == 'pending_count':
+            user_id = self.rng.choice(self.chefs) if self.chefs else self.rng.choice(self.students)[0]
+            return route, "GET", f"/api/approvals/pending-count?user_id={user_id}&{self.period}", None
+        if route == 'published':
+            return route, "GET", f"/api/exams/published?{self.period}", None
+        raise ValueError(f"Unknown route {route!r}")
+
+
+def parse_mix(text: str):
+    mix = []
+    for part in text.split(','):
+        route, _, weight = part.partition('=')
+        mix.append((route.strip(), float(weight)))
+    return mix
+
+
+def load_users(limit: int):
+    conn = synthetic.connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, email FROM utilisateurs WHERE role = 'Etudiant' ORDER BY id LIMIT %s", (limit,))
+        students = cursor.fetchall()
+        cursor.execute("SELECT id FROM utilisateurs WHERE role = 'Chef-departement' ORDER BY id")
+        chefs = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+    finally:
+        conn.close()
+    return students, chefs
+
+
+def publish_period(annee: str, semester: str) -> None:
+    """Put the period in the state right after the Doyen's approval"""
+    conn = synthetic.connect()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE schedules SET statut = 'PUBLIE' WHERE annee_universitaire = %s AND semester = %s",
+                       (annee, semester))
+        cursor.execute("UPDATE timetable_rows SET statut = 'PUBLIE' WHERE annee_universitaire = %s AND semester = %s",
+                       (annee, semester))
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+
+# ============================================
+# SERVER
+# ============================================
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    # The server must read the database the users were loaded from
+    env = {**os.environ, "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+           "MYSQL_DATABASE": synthetic.database_name()}
+    command = [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1",
+               "--port", str(port), "--log-level", "warning", "--no-access-log"]
+    if workers > 1:
+        command += ["--workers", str(workers)]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+
+
+def wait_healthy(url: str, timeout: float) -> None:
+    parsed = urllib.parse.urlsplit(url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=2)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return
+        except OSError:
+            pass
+        time.sleep(0.25)
+    raise SystemExit(f"Server at {url} not healthy after {timeout:g}s")
+
+
+# ============================================
+# LOAD
+# ============================================
+
+def run_load(url: str, traffic: Traffic, mix, rps: float, duration: float, concurrency: int,
+             timeout: float):
+    parsed = urllib.parse.urlsplit(url)
+    routes = [route for route, _weight in mix]
+    weights = [weight for _route, weight in mix]
+    total = int(rps * duration)
+    due = queue.Queue(maxsize=concurrency * 4)
+    results = []
+    results_lock = threading.Lock()
+
+    def worker():
+        conn = None
+        local = []
+        while True:
+            item = due.get()
+            if item is None:
+                break
+            scheduled, (route, method, path, body) = item
+            status = 0
+            try:
+                if conn is None:
+                    conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=timeout)
+                headers = {"Content-Type": "application/json"} if body else {}
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                if conn is not None:
+                    conn.close()
+                conn = None
+            local.append((route, status, time.perf_counter() - scheduled))
+        if conn is not None:
+            conn.close()
+        with results_lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    rng = random.Random(0)
+    started = time.perf_counter()
+    for index in range(total):
+        scheduled = started + index / rps
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        route = rng.choices(routes, weights)[0]
+        due.put((scheduled, traffic.build(route)))
+    for _ in threads:
+        due.put(None)
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def summarize(results, elapsed: float) -> dict:
+    by_route = {}
+    for route, status, latency in results:
+        by_route.setdefault(route, []).append((status, latency))
+    routes = {}
+    for route, samples in sorted(by_route.items()):
+        latencies = sorted(latency for _status, latency in samples)
+        errors = sum(1 for status, _latency in samples if not 200 <= status < 300)
+        routes[route] = {
+            "requests": len(samples),
+            "errors": errors,
+            "errorRate": round(errors / len(samples), 4),
+            "latencyMs": {
+                "p50": round(percentile(latencies, 0.50) * 1000, 2),
+                "p95": round(percentile(latencies, 0.95) * 1000, 2),
+                "p99": round(percentile(latencies, 0.99) * 1000, 2),
+                "max": round(latencies[-1] * 1000, 2),
+            },
+        }
+    errors = sum(route["errors"] for route in routes.values())
+    return {
+        "requests": len(results),
+        "elapsedSeconds": round(elapsed, 2),
+        "achievedRps": round(len(results) / elapsed, 1) if elapsed else 0.0,
+        "errorRate": round(errors / len(results), 4) if results else 0.0,
+        "routes": routes,
+    }
+
+
+def check_gates(report: dict, args) -> list:
+    """Failed gate descriptions; empty when the run passes"""
+    failures = []
+    if report["errorRate"] > args.max_error_rate:
+        failures.append(f"error rate {report['errorRate']} > {args.max_error_rate}")
+    for route, stats in report["routes"].items():
+        p95 = stats["latencyMs"]["p95"]
+        if args.max_p95_ms is not None and p95 > args.max_p95_ms:
+            failures.append(f"{route}: p95 {p95}ms > {args.max_p95_ms}ms")
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["result"]["routes"]
+        for route, stats in report["routes"].items():
+            if route not in baseline:
+                continue
+            before = baseline[route]["latencyMs"]["p95"]
+            after = stats["latencyMs"]["p95"]
+            if before and after > before * (1 + args.tolerance):
+                failures.append(f"{route}: p95 {after}ms vs baseline {before}ms (+{args.tolerance:.0%} allowed)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="Use a running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--server-workers", type=int, default=1, help="uvicorn --workers")
+    parser.add_argument("--annee", default=synthetic.ANNEE)
+    parser.add_argument("--semester", choices=("S1", "S2"), default="S1")
+    parser.add_argument("--password", default="bench123", help="Password of the student users")
+    parser.add_argument("--students", type=int, default=5000, help="Distinct students to log in as")
+    parser.add_argument("--publish", action="store_true",
+                        help="Mark the period's schedules PUBLIE first, as after the Doyen's approval")
+    parser.add_argument("--force", action="store_true", help="Allow --publish against exam_scheduler_db")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"route=weight,... (default {DEFAULT_MIX})")
+    parser.add_argument("--rps", type=float, default=100)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Seconds at the same rate, not reported")
+    parser.add_argument("--concurrency", type=int, default=64, help="Client threads")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the report here as well as to stdout")
+    parser.add_argument("--max-p95-ms", type=float, help="Fail when any route's p95 is above this")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--baseline", help="Earlier report; fail when a route's p95 regresses")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 regression vs baseline")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    if args.publish:
+        synthetic.check_scratch_database(args.force)
+        publish_period(args.annee, args.semester)
+    students, chefs = load_users(args.students)
+    traffic = Traffic(students, chefs, args.annee, args.semester, args.password, args.seed)
+
+    server = None
+    url = args.url
+    if url is None:
+        url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args.port, args.server_workers)
+    try:
+        wait_healthy(url, timeout=30)
+        if args.warmup > 0:
+            run_load(url, traffic, mix, args.rps, args.warmup, args.concurrency, args.timeout)
+        results, elapsed = run_load(url, traffic, mix, args.rps, args.duration, args.concurrency, args.timeout)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    report = {
+        "createdAt": datetime.now().isoformat(timespec='seconds'),
+        "params": {
+            "url": url, "mix": dict(mix), "rps": args.rps, "duration": args.duration,
+            "concurrency": args.concurrency, "annee": args.annee, "semester": args.semester,
+        },
+        "result": summarize(results, elapsed),
+    }
+    failures = check_gates(report["result"], args)
+    report["gate"] = {"passed": not failures, "failures": failures}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    print(text)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
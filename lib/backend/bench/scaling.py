@@ -0,0 +1,223 @@
+"""
+Scaling benchmark for schedule generation and the read procedures.
+
+For each size, loads a synthetic university (bench/synthetic.py), then:
+- runs the SQL engine phase by phase (sp_phase1_plan_time_slots ..
+  sp_phase4_persist, on one session as sp_generate_exam_schedule does)
+  and the python engine (phases from its progress callback),
+- times the procedures behind the read endpoints,
+and writes one JSON report whose keys stay the same from run to run, so
+reports of two commits can be diffed. Use a scratch database:
+
+    MYSQL_DATABASE=exam_scheduler_bench python bench/scaling.py \
+        --size 5000:60 --size 20000:240 --size 50000:600 --output scaling.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from dataclasses import asdict
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import scheduler  # noqa: E402
+import synthetic  # noqa: E402
+
+
+TIME_SLOTS = [("Matin", "08:30", "10:30"), ("Midi", "11:00", "13:00"), ("Apres-midi", "13:30", "15:30")]
+SQL_PHASES = (
+    "sp_phase1_plan_time_slots", "sp_phase2_allocate_rooms",
+    "sp_phase3_assign_surveillance", "sp_phase4_persist",
+)
+
+
+def drain(cursor) -> int:
+    """Read every result set of a callproc; returns the number of rows"""
+    return sum(len(result.fetchall()) for result in cursor.stored_results())
+
+
+def timed_call(cursor, procedure: str, args) -> float:
+    started = time.perf_counter()
+    cursor.callproc(procedure, args)
+    drain(cursor)
+    return time.perf_counter() - started
+
+
+def run_sql_engine(conn, annee: str, semester: str, start: date, end: date) -> dict:
+    slots = json.dumps([{"label": label, "start": s, "end": e} for label, s, e in TIME_SLOTS])
+    cursor = conn.cursor()
+    try:
+        cursor.callproc("sp_clear_schedules", (annee, semester))
+        drain(cursor)
+        # The run the phases log their conflicts under, as sp_generate_exam_schedule sets it up
+        cursor.execute("""
+            INSERT INTO generation_runs (annee_universitaire, semester, engine, started_at)
+            VALUES (%s, %s, 'sql', SYSDATE(6))
+        """, (annee, semester))
+        run_id = cursor.lastrowid
+        cursor.execute("SET @gen_run_id = %s", (run_id,))
+        conn.commit()
+        phases = {
+            SQL_PHASES[0]: timed_call(cursor, SQL_PHASES[0], (annee, semester, start, end, slots)),
+            SQL_PHASES[1]: timed_call(cursor, SQL_PHASES[1], ()),
+            SQL_PHASES[2]: timed_call(cursor, SQL_PHASES[2], (3,)),
+            SQL_PHASES[3]: timed_call(cursor, SQL_PHASES[3], (annee, semester, None)),
+        }
+        conn.commit()
+        cursor.execute("SELECT COUNT(*) FROM tmp_slots")
+        exams = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM schedule_conflicts WHERE run_id = %s", (run_id,))
+        conflicts = cursor.fetchone()[0]
+        cursor.execute("SET @gen_run_id = NULL")
+    finally:
+        cursor.close()
+    return {"phases": phases, "examsScheduled": exams, "conflicts": conflicts}
+
+
+def run_python_engine(conn, annee: str, semester: str, start: date, end: date,
+                      strategy: str, optimize_ms) -> dict:
+    phases = {}
+    current = {"phase": None, "started": 0.0}
+
+    def progress(phase: str, percent: int) -> None:
+        now = time.perf_counter()
+        if current["phase"] is not None:
+            phases[current["phase"]] = now - current["started"]
+        current.update(phase=phase, started=now)
+
+    result = scheduler.generate_schedule(
+        conn, annee, semester, start, end, TIME_SLOTS, None,
+        strategy=strategy, optimize_ms=optimize_ms, progress=progress,
+    )
+    progress('done', 100)
+    return {
+        "phases": phases,
+        "examsScheduled": result.get('exams_scheduled', 0),
+        "conflicts": result.get('total_conflicts', 0),
+    }
+
+
+def time_reads(conn, annee: str, semester: str, rows: dict, repeat: int) -> dict:
+    formation_id, groupe_id = rows['groupes'][0][2], rows['groupes'][0][0]
+    teacher_id = rows['enseignants'][0][0]
+    calls = {
+        "sp_get_all_exam_details": (annee, semester),
+        "sp_get_published_exam_details": (annee, semester),
+        "sp_get_student_exams": (annee, semester, formation_id, groupe_id),
+        "sp_get_teacher_exams": (annee, semester, teacher_id),
+        "sp_get_dashboard_stats": (annee, semester),
+        "sp_get_department_stats": (annee, semester),
+        "sp_get_conflicts_by_type": (annee, semester),
+    }
+    report = {}
+    cursor = conn.cursor()
+    try:
+        for procedure, args in calls.items():
+            samples = []
+            returned = 0
+            for _ in range(repeat):
+                started = time.perf_counter()
+                cursor.callproc(procedure, args)
+                returned = drain(cursor)
+                samples.append((time.perf_counter() - started) * 1000)
+            samples.sort()
+            report[procedure] = {
+                "medianMs": round(statistics.median(samples), 2),
+                "p95Ms": round(samples[min(len(samples) - 1, int(0.95 * len(samples)))], 2),
+                "rows": returned,
+            }
+    finally:
+        cursor.close()
+    return report
+
+
+def run_size(students: int, formations: int, args) -> dict:
+    size = synthetic.Size.scaled(students, formations)
+    rows = synthetic.generate(size, args.seed, args.semester)
+    start = date.fromisoformat(args.start)
+    end = start + timedelta(days=args.days)
+    conn = synthetic.connect()
+    try:
+        started = time.perf_counter()
+        counts = synthetic.populate(conn, rows)
+        load_seconds = time.perf_counter() - started
+
+        generation = {}
+        for engine in args.engines:
+            started = time.perf_counter()
+            if engine == 'sql':
+                run = run_sql_engine(conn, synthetic.ANNEE, args.semester, start, end)
+            else:
+                run = run_python_engine(conn, synthetic.ANNEE, args.semester, start, end,
+                                        args.strategy, args.optimize_ms)
+            run["totalSeconds"] = round(time.perf_counter() - started, 4)
+            run["phases"] = {phase: round(seconds, 4) for phase, seconds in run["phases"].items()}
+            generation[engine] = run
+
+        # Reads see the schedule of the last engine run
+        reads = time_reads(conn, synthetic.ANNEE, args.semester, rows, args.repeat)
+    finally:
+        conn.close()
+    return {
+        "size": asdict(size),
+        "rows": counts,
+        "loadSeconds": round(load_seconds, 2),
+        "generation": generation,
+        "reads": reads,
+    }
+
+
+def parse_size(value: str):
+    students, _, formations = value.partition(':')
+    return int(students), int(formations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", action="append", type=parse_size, dest="sizes",
+                        help="STUDENTS:FORMATIONS (repeatable); defaults to 2000:24 5000:60 20000:240")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--semester", choices=("S1", "S2"), default="S1")
+    parser.add_argument("--start", default="2025-01-12", help="First exam day (YYYY-MM-DD)")
+    parser.add_argument("--days", type=int, default=21)
+    parser.add_argument("--engine", action="append", choices=("sql", "python"), dest="engines",
+                        help="Engines to run, in order (repeatable); defaults to sql then python")
+    parser.add_argument("--strategy", choices=("greedy", "dsatur"), default="greedy")
+    parser.add_argument("--optimize-ms", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per read procedure")
+    parser.add_argument("--output", help="Write the report here as well as to stdout")
+    parser.add_argument("--force", action="store_true", help="Allow running against exam_scheduler_db")
+    args = parser.parse_args()
+    args.engines = args.engines or ["sql", "python"]
+
+    synthetic.check_scratch_database(args.force)
+    report = {
+        "createdAt": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "seed": args.seed,
+        "params": {
+            "semester": args.semester, "start": args.start, "days": args.days,
+            "timeSlots": len(TIME_SLOTS), "engines": args.engines, "strategy": args.strategy,
+            "optimizeMs": args.optimize_ms, "repeat": args.repeat,
+        },
+        "runs": [
+            run_size(students, formations, args)
+            for students, formations in (args.sizes or [(2000, 24), (5000, 60), (20000, 240)])
+        ],
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Deterministic synthetic university for scaling runs.
+
+Generates departements (with a chef each), formations, groupes,
+etudiants (with their utilisateurs), enseignants, lieux_examen, matieres
+and examens at a chosen size; the same size and seed always give the
+same rows and ids.
+It replaces the scheduling data of the target database, so point it at a
+scratch copy of the schema (sql_script.sql), never at production:
+
+    MYSQL_DATABASE=exam_scheduler_bench python bench/synthetic.py \
+        --students 50000 --formations 600 --seed 1
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+import mysql.connector
+
+
+ANNEE = "2024-2025"
+NIVEAUX = (('Licence', 'L1'), ('Licence', 'L2'), ('Licence', 'L3'), ('Master', 'M1'), ('Master', 'M2'))
+GRADES = (
+    'Professeur', 'Maitre de conferences A', 'Maitre de conferences B',
+    'Maitre assistant A', 'Maitre assistant B',
+)
+NOMS = (
+    'Benali', 'Saidi', 'Khelifi', 'Mansour', 'Hamdi', 'Cherif', 'Salem', 'Zerrouki',
+    'Amara', 'Bouazza', 'Bouraoui', 'Kadri', 'Tahri', 'Ouali', 'Belkacem', 'Bouaziz',
+)
+PRENOMS = (
+    'Ahmed', 'Fatima', 'Karim', 'Sarah', 'Youcef', 'Amina', 'Mehdi', 'Nadia',
+    'Rachid', 'Lina', 'Samir', 'Yasmine', 'Omar', 'Meriem', 'Walid', 'Imane',
+)
+
+# Tables this script owns, children first
+TABLES = (
+    'timetable_rows', 'period_conflict_stats', 'period_department_stats',
+    'schedule_approvals', 'schedule_conflicts', 'generation_run_phases', 'generation_runs',
+    'surveillances', 'schedule_exam_salles',
+    'schedule_examens', 'schedules', 'examens', 'formation_matieres', 'matieres',
+    'etudiants', 'groupes', 'chefs_departement', 'enseignants', 'lieux_examen',
+    'formations', 'departements', 'utilisateurs',
+)
+
+
+@dataclass
+class Size:
+    students: int
+    formations: int
+    departments: int
+    teachers: int
+    rooms: int
+    group_size: int = 30
+    exams_per_formation: int = 6
+
+    @classmethod
+    def scaled(cls, students: int, formations: int) -> "Size":
+        """Department, teacher and room counts in the proportions of a real faculty"""
+        return cls(
+            students=students,
+            formations=formations,
+            departments=max(2, formations // 40),
+            teachers=max(10, students // 25),
+            rooms=max(5, students // 120),
+        )
+
+
+def generate(size: Size, seed: int, semester: str = 'S1') -> Dict[str, List[Tuple]]:
+    """Rows per table, ids assigned from 1 (the tables are emptied before loading)"""
+    rng = random.Random(seed)
+    rows: Dict[str, List[Tuple]] = {table: [] for table in (
+        'utilisateurs', 'departements', 'chefs_departement', 'formations', 'groupes', 'etudiants',
+        'enseignants', 'lieux_examen', 'matieres', 'formation_matieres', 'examens',
+    )}
+    user_id = 0
+
+    def person(role: str, prefix: str) -> Tuple[int, str, str]:
+        nonlocal user_id
+        user_id += 1
+        rows['utilisateurs'].append((user_id, f"{prefix}{user_id}@synthetic.univ.dz", 'bench123', role))
+        return user_id, rng.choice(NOMS), rng.choice(PRENOMS)
+
+    for department_id in range(1, size.departments + 1):
+        rows['departements'].append((department_id, f"Departement {department_id}", f"D{department_id}"))
+        chef_id, nom, prenom = person('Chef-departement', 'chef')
+        rows['chefs_departement'].append((chef_id, nom, prenom, department_id))
+
+    # Formations spread over departments and niveaux; students split unevenly
+    weights = [rng.uniform(0.5, 1.5) for _ in range(size.formations)]
+    total_weight = sum(weights)
+    subjects = 0
+    groupe_id = 0
+    exam_id = 0
+    for formation_id in range(1, size.formations + 1):
+        department_id = (formation_id - 1) % size.departments + 1
+        cycle, niveau = NIVEAUX[(formation_id - 1) // size.departments % len(NIVEAUX)]
+        rows['formations'].append((
+            formation_id, f"Formation {formation_id}", f"F{formation_id}", cycle, niveau,
+            semester, department_id,
+        ))
+
+        students = max(1, round(size.students * weights[formation_id - 1] / total_weight))
+        groups = []
+        for number in range(1, max(1, -(-students // size.group_size)) + 1):
+            groupe_id += 1
+            groups.append(groupe_id)
+            rows['groupes'].append((groupe_id, f"G{number}", formation_id))
+        for index in range(students):
+            student_id, nom, prenom = person('Etudiant', 'etu')
+            rows['etudiants'].append((
+                student_id, nom, prenom, formation_id, groups[index % len(groups)], ANNEE,
+                date(2000, 1, 1) + timedelta(days=rng.randrange(3650)),
+            ))
+
+        for _ in range(size.exams_per_formation):
+            subjects += 1
+            exam_id += 1
+            rows['matieres'].append((subjects, f"Matiere {subjects}", f"M{subjects}"))
+            rows['formation_matieres'].append((formation_id, subjects))
+            rows['examens'].append((
+                exam_id, formation_id, subjects, rng.choice((90, 90, 120)), ANNEE, semester,
+            ))
+
+    for _ in range(size.teachers):
+        teacher_id, nom, prenom = person('Enseignant', 'ens')
+        rows['enseignants'].append((
+            teacher_id, nom, prenom, rng.randrange(1, size.departments + 1),
+            f"Specialite {rng.randrange(50)}", rng.choice(GRADES),
+        ))
+
+    for lieu_id in range(1, size.rooms + 1):
+        kind, capacity = rng.choice((
+            ('Amphitheatre', 200), ('Amphitheatre', 300), ('Salle', 40), ('Salle', 40),
+            ('Salle', 60), ('Labo', 25),
+        ))
+        department_id = rng.randrange(1, size.departments + 1) if rng.random() < 0.7 else None
+        rows['lieux_examen'].append((lieu_id, f"{kind} {lieu_id}", f"L{lieu_id}", capacity, kind, department_id, True))
+
+    return rows
+
+
+INSERTS = {
+    'utilisateurs': "INSERT INTO utilisateurs (id, email, password, role) VALUES (%s, %s, %s, %s)",
+    'departements': "INSERT INTO departements (id, nom, code) VALUES (%s, %s, %s)",
+    'chefs_departement': "INSERT INTO chefs_departement (id, nom, prenom, department_id) VALUES (%s, %s, %s, %s)",
+    'formations': """INSERT INTO formations (id, nom, code, cycle, niveau, semester, department_id)
+                     VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+    'groupes': "INSERT INTO groupes (id, nom, formation_id) VALUES (%s, %s, %s)",
+    'etudiants': """INSERT INTO etudiants (id, nom, prenom, formation_id, groupe_id, promo, date_naissance)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+    'enseignants': """INSERT INTO enseignants (id, nom, prenom, department_id, speciality, grade)
+                      VALUES (%s, %s, %s, %s, %s, %s)""",
+    'lieux_examen': """INSERT INTO lieux_examen (id, nom, code, capacite, type, department_id, disponible)
+                       VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+    'matieres': "INSERT INTO matieres (id, nom, code) VALUES (%s, %s, %s)",
+    'formation_matieres': "INSERT INTO formation_matieres (formation_id, matiere_id) VALUES (%s, %s)",
+    'examens': """INSERT INTO examens (id, formation_id, matiere_id, duree_minutes, annee_universitaire, semester)
+                  VALUES (%s, %s, %s, %s, %s, %s)""",
+}
+
+
+def populate(conn, rows: Dict[str, List[Tuple]], batch_rows: int = 5000) -> Dict[str, int]:
+    """Empty the scheduling tables and load rows; returns row counts per table"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+        for table in TABLES:
+            cursor.execute(f"TRUNCATE TABLE {table}")
+        cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+        for table, sql in INSERTS.items():
+            data = rows[table]
+            for start in range(0, len(data), batch_rows):
+                cursor.executemany(sql, data[start:start + batch_rows])
+        conn.commit()
+        cursor.callproc("sp_refresh_period_stats", (None, None))
+        conn.commit()
+    finally:
+        cursor.close()
+    return {table: len(data) for table, data in rows.items()}
+
+
+def database_name() -> str:
+    # app.py's DB_CONFIG reads MYSQL_DATABASE (unlike MYSQLHOST and the others)
+    return os.getenv("MYSQL_DATABASE", "exam_scheduler_db")
+
+
+def connect():
+    """Same environment variables as app.py's DB_CONFIG, without the pool"""
+    return mysql.connector.connect(
+        host=os.getenv("MYSQLHOST", "localhost"),
+        port=int(os.getenv("MYSQLPORT", "3306")),
+        user=os.getenv("MYSQLUSER", "root"),
+        password=os.getenv("MYSQLPASSWORD", ""),
+        database=database_name(),
+        autocommit=False,
+    )
+
+
+def check_scratch_database(force: bool) -> None:
+    if database_name() == "exam_scheduler_db" and not force:
+        sys.exit("Refusing to replace the data of exam_scheduler_db; set MYSQL_DATABASE "
+                 "to a scratch database (or pass --force)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--formations", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--semester", choices=("S1", "S2"), default="S1")
+    parser.add_argument("--force", action="store_true", help="Allow loading into exam_scheduler_db")
+    args = parser.parse_args()
+
+    check_scratch_database(args.force)
+    size = Size.scaled(args.students, args.formations)
+    rows = generate(size, args.seed, args.semester)
+    conn = connect()
+    try:
+        started = time.perf_counter()
+        counts = populate(conn, rows)
+        elapsed = time.perf_counter() - started
+    finally:
+        conn.close()
+    print(json.dumps({"size": asdict(size), "seed": args.seed, "rows": counts,
+                      "loadSeconds": round(elapsed, 2)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
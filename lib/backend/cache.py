@@ -0,0 +1,123 @@
+"""
+In-process read-through cache for timetable and dashboard responses.
+
+Entries are keyed (endpoint, annee, semester, entity_id) and only change
+when a schedule of that period is generated, cleared or approved, so the
+write endpoints invalidate by period instead of using a TTL.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional, Set, Tuple
+
+from serialization import dumps
+
+
+class ResponseCache:
+    """
+    LRU cache bounded by the approximate size of its values (their encoded
+    JSON length). Each period has a version number bumped on invalidation; a
+    response computed while the period changed is not stored.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> (value, size), least recently used first
+        self._entries: "OrderedDict[Tuple, Tuple[object, int]]" = OrderedDict()
+        self._by_period: Dict[Tuple[str, str], Set[Tuple]] = {}
+        self._versions: Dict[Tuple[str, str], int] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_puts = 0
+
+    def get(self, endpoint: str, annee: str, semester: str, entity_id: Hashable = None):
+        """Cached value, or None on a miss"""
+        key = (endpoint, annee, semester, entity_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def version(self, annee: str, semester: str) -> int:
+        """Take before computing a value, pass to put()"""
+        with self._lock:
+            return self._versions.get((annee, semester), 0)
+
+    def put(self, endpoint: str, annee: str, semester: str, entity_id: Hashable,
+            value, version: int) -> None:
+        size = len(dumps(value))
+        if size > self.max_bytes:
+            return
+        key = (endpoint, annee, semester, entity_id)
+        period = (annee, semester)
+        with self._lock:
+            if self._versions.get(period, 0) != version:
+                # The period was invalidated while this value was computed
+                self.stale_puts += 1
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._by_period.setdefault(period, set()).add(key)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._evict_oldest()
+
+    def invalidate(self, annee: str, semester: str, endpoints: Optional[Set[str]] = None) -> int:
+        """Drop the period's entries (only for endpoints, if given); returns how many"""
+        period = (annee, semester)
+        with self._lock:
+            self._versions[period] = self._versions.get(period, 0) + 1
+            keys = self._by_period.get(period, set())
+            dropped = [key for key in keys if endpoints is None or key[0] in endpoints]
+            for key in dropped:
+                self._remove(key)
+            self.invalidations += 1
+            return len(dropped)
+
+    def clear(self) -> None:
+        with self._lock:
+            for period in list(self._by_period):
+                self._versions[period] = self._versions.get(period, 0) + 1
+            self._entries.clear()
+            self._by_period.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "stalePuts": self.stale_puts,
+            }
+
+    def _evict_oldest(self) -> None:
+        key = next(iter(self._entries))
+        self._remove(key)
+        self.evictions += 1
+
+    def _remove(self, key: Tuple) -> None:
+        _value, size = self._entries.pop(key)
+        self._bytes -= size
+        period = (key[1], key[2])
+        keys = self._by_period.get(period)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_period[period]
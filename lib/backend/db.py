@@ -0,0 +1,206 @@
+"""
+Bounded MySQL connection pool.
+
+mysql.connector's own pool fails immediately when it is exhausted and does
+not report how busy it is, so requests borrow connections from this one
+instead: callers wait (up to a timeout) for a free connection, idle
+connections are pinged before reuse, old ones are recycled, and the pool
+keeps counters for the health endpoint.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import Error
+
+
+class PoolTimeout(Exception):
+    """No connection became free within the pool timeout"""
+
+
+class ConnectionPool:
+    def __init__(self, config: dict, size: int = 10, timeout: float = 5.0,
+                 recycle: float = 1800.0, ping_after: float = 30.0):
+        """
+        size: most connections open at once
+        timeout: seconds to wait for a free connection
+        recycle: seconds after which a connection is closed and reopened
+        ping_after: idle seconds after which a connection is pinged before reuse
+        """
+        self.config = config
+        self.size = size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_after = ping_after
+
+        self._cond = threading.Condition()
+        # (connection, created_at, released_at), most recently used last
+        self._idle = deque()
+        self._open = 0
+        self._in_use = 0
+        self._waiting = 0
+        # connection id -> created_at for borrowed connections
+        self._created_at = {}
+
+        self._acquired = 0
+        self._timeouts = 0
+        self._created = 0
+        self._recycled = 0
+        self._failed_checks = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    # ---------- borrowing ----------
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._cond:
+            self._waiting += 1
+            try:
+                while not self._idle and self._open >= self.size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(f"No database connection free after {self.timeout:g}s")
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+            entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                self._open += 1
+            self._in_use += 1
+            waited = time.monotonic() - started
+            self._acquired += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        try:
+            if entry is not None:
+                connection, created_at = self._checked(*entry)
+            else:
+                connection, created_at = self._connect(), time.monotonic()
+        except BaseException:
+            with self._cond:
+                self._open -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        self._created_at[id(connection)] = created_at
+        return connection
+
+    def release(self, connection) -> None:
+        created_at = self._created_at.pop(id(connection), None)
+        reusable = created_at is not None
+        if reusable:
+            try:
+                # Never hand a half-done transaction (or a stale snapshot) to the next request
+                if connection.in_transaction:
+                    connection.rollback()
+            except Error:
+                reusable = False
+        if not reusable:
+            self._close(connection)
+
+        with self._cond:
+            self._in_use -= 1
+            if reusable:
+                self._idle.append((connection, created_at, time.monotonic()))
+            else:
+                self._open -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    # ---------- lifecycle ----------
+
+    def warm(self, count: int) -> int:
+        """Open up to count idle connections ahead of traffic; returns how many were opened"""
+        opened = 0
+        for _ in range(min(count, self.size)):
+            with self._cond:
+                if self._open >= self.size:
+                    break
+                self._open += 1
+            try:
+                connection = self._connect()
+            except Error:
+                with self._cond:
+                    self._open -= 1
+                raise
+            now = time.monotonic()
+            with self._cond:
+                self._idle.append((connection, now, now))
+                self._cond.notify()
+            opened += 1
+        return opened
+
+    def close_all(self) -> None:
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+        for connection, _created, _released in idle:
+            self._close(connection)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": self.size,
+                "open": self._open,
+                "inUse": self._in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "acquired": self._acquired,
+                "timeouts": self._timeouts,
+                "created": self._created,
+                "recycled": self._recycled,
+                "failedChecks": self._failed_checks,
+                "waitMsTotal": round(self._wait_total * 1000, 1),
+                "waitMsAvg": round(self._wait_total * 1000 / self._acquired, 3) if self._acquired else 0.0,
+                "waitMsMax": round(self._wait_max * 1000, 1),
+            }
+
+    # ---------- internals ----------
+
+    def _connect(self):
+        connection = mysql.connector.connect(**self.config)
+        with self._cond:
+            self._created += 1
+        return connection
+
+    def _checked(self, connection, created_at: float, released_at: float):
+        """Return a usable (connection, created_at), replacing a stale or dead one"""
+        now = time.monotonic()
+        if now - created_at > self.recycle:
+            with self._cond:
+                self._recycled += 1
+            self._close(connection)
+            return self._connect(), time.monotonic()
+        if now - released_at > self.ping_after:
+            try:
+                connection.ping(reconnect=False)
+            except Error:
+                with self._cond:
+                    self._failed_checks += 1
+                self._close(connection)
+                return self._connect(), time.monotonic()
+        return connection, created_at
+
+    @staticmethod
+    def _close(connection) -> None:
+        try:
+            connection.close()
+        except Error:
+            pass
@@ -0,0 +1,238 @@
+"""
+Per-request database and serialization timings.
+
+TimingMiddleware gives every HTTP request a RequestTimings, held in a
+context variable; connections handed out by get_db_connection are wrapped
+so each execute/callproc (round trip), its duration and the rows fetched
+from it are recorded there, and FastJSONResponse adds its encoding time.
+The totals go back to the client in a Server-Timing header, and requests
+slower than the threshold are written to the slow-request log as one JSON
+line.
+"""
+
+import json
+import logging
+import re
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+
+
+_current: ContextVar[Optional["RequestTimings"]] = ContextVar("request_timings", default=None)
+
+# Server-Timing entries for individual statements, slowest first
+MAX_TIMING_ENTRIES = 8
+
+_STATEMENT = re.compile(
+    r"^\s*(?:(UPDATE)\s+`?(\w+)|(SELECT|INSERT|DELETE|REPLACE)\b.*?\b(?:FROM|INTO)\s+`?(\w+))",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+class QueryTiming:
+    __slots__ = ("label", "ms", "rows")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.ms = 0.0
+        self.rows = 0
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries: List[QueryTiming] = []
+        self.serialize_ms = 0.0
+
+    @property
+    def db_ms(self) -> float:
+        return sum(query.ms for query in self.queries)
+
+    @property
+    def rows(self) -> int:
+        return sum(query.rows for query in self.queries)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: db, serialize, total and the slowest statements"""
+        entries = [
+            f'db;dur={self.db_ms:.1f};desc="{len(self.queries)} round trips, {self.rows} rows"',
+            f"serialize;dur={self.serialize_ms:.1f}",
+            f"total;dur={self.elapsed_ms():.1f}",
+        ]
+        by_label = {}
+        for query in self.queries:
+            by_label[query.label] = by_label.get(query.label, 0.0) + query.ms
+        slowest = sorted(by_label.items(), key=lambda item: item[1], reverse=True)
+        for label, ms in slowest[:MAX_TIMING_ENTRIES]:
+            entries.append(f"q.{label};dur={ms:.1f}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> dict:
+        return {
+            "totalMs": round(self.elapsed_ms(), 1),
+            "dbMs": round(self.db_ms, 1),
+            "roundTrips": len(self.queries),
+            "rowsFetched": self.rows,
+            "serializeMs": round(self.serialize_ms, 1),
+            "queries": [
+                {"label": query.label, "ms": round(query.ms, 2), "rows": query.rows}
+                for query in self.queries
+            ],
+        }
+
+
+def current() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+def statement_label(sql: str) -> str:
+    """'select.timetable_rows' for a SELECT ... FROM timetable_rows, 'sql' if unrecognised"""
+    match = _STATEMENT.match(sql)
+    if not match:
+        return "sql"
+    verb, table = (match.group(1), match.group(2)) if match.group(1) else (match.group(3), match.group(4))
+    return f"{verb.lower()}.{table}"
+
+
+# ============================================
+# CONNECTION / CURSOR WRAPPERS
+# ============================================
+
+class TimedConnection:
+    """Connection proxy whose cursors record into the current request"""
+
+    def __init__(self, connection, timings: RequestTimings):
+        self._connection = connection
+        self._timings = timings
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._connection.cursor(*args, **kwargs), self._timings)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class TimedCursor:
+    def __init__(self, cursor, timings: RequestTimings, query: Optional[QueryTiming] = None):
+        self._cursor = cursor
+        self._timings = timings
+        # Statement the fetched rows are counted against
+        self._query = query
+
+    def _run(self, label: str, method, *args):
+        query = QueryTiming(label)
+        self._timings.queries.append(query)
+        self._query = query
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            query.ms += (time.perf_counter() - started) * 1000
+
+    def execute(self, operation, params=()):
+        return self._run(statement_label(operation), self._cursor.execute, operation, params)
+
+    def executemany(self, operation, seq_params):
+        return self._run(statement_label(operation), self._cursor.executemany, operation, seq_params)
+
+    def callproc(self, procname, args=()):
+        return self._run(procname, self._cursor.callproc, procname, args)
+
+    def stored_results(self):
+        for result in self._cursor.stored_results():
+            yield TimedCursor(result, self._timings, self._query)
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        rows = method(*args)
+        if self._query is not None:
+            self._query.ms += (time.perf_counter() - started) * 1000
+            if isinstance(rows, list):
+                self._query.rows += len(rows)
+            elif rows is not None:
+                self._query.rows += 1
+        return rows
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall)
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone)
+
+    def fetchmany(self, size=1):
+        return self._fetch(self._cursor.fetchmany, size)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def timed(connection):
+    """connection wrapped for the current request; unchanged outside one (e.g. background jobs)"""
+    timings = _current.get()
+    return connection if timings is None else TimedConnection(connection, timings)
+
+
+def record_serialization(started: float) -> None:
+    timings = _current.get()
+    if timings is not None:
+        timings.serialize_ms += (time.perf_counter() - started) * 1000
+
+
+# ============================================
+# MIDDLEWARE
+# ============================================
+
+class TimingMiddleware:
+    """
+    ASGI middleware: sets up the request's RequestTimings, adds the
+    Server-Timing header and logs requests slower than slow_ms
+    """
+
+    def __init__(self, app, slow_ms: float, logger: logging.Logger):
+        self.app = app
+        self.slow_ms = slow_ms
+        self.logger = logger
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if timings.elapsed_ms() >= self.slow_ms:
+                self.logger.warning(json.dumps({
+                    "event": "slow_request",
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "query": scope.get("query_string", b"").decode("latin-1"),
+                    "status": status,
+                    **timings.to_dict(),
+                }))
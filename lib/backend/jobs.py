@@ -0,0 +1,147 @@
+"""
+Background schedule generation jobs.
+
+Generation can run for a long time, so instead of holding the request open
+it is submitted here, runs on a small thread pool and reports its progress
+(current phase and percent complete) for the client to poll.
+"""
+
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+
+ACTIVE_STATUSES = ('QUEUED', 'RUNNING')
+
+# Finished jobs kept for polling before the oldest are dropped
+MAX_FINISHED_JOBS = 100
+
+
+class DuplicateJobError(Exception):
+    """A job for the same key is already queued or running"""
+
+    def __init__(self, job_id: str):
+        super().__init__(f"Job {job_id} is already active")
+        self.job_id = job_id
+
+
+@dataclass
+class Job:
+    id: str
+    key: Tuple
+    status: str = 'QUEUED'  # QUEUED, RUNNING, DONE, FAILED
+    phase: str = 'queued'
+    percent: int = 0
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "jobId": self.id,
+            "status": self.status,
+            "phase": self.phase,
+            "percent": self.percent,
+            "result": self.result,
+            "error": self.error,
+            "createdAt": self.created_at.isoformat(),
+            "startedAt": self.started_at.isoformat() if self.started_at else None,
+            "finishedAt": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class JobManager:
+    """
+    Runs jobs on a thread pool. At most one job per key (e.g. an
+    (annee, semester) pair) may be queued or running at a time.
+    """
+
+    def __init__(self, max_workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='generation')
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._active: Dict[Tuple, str] = {}
+
+    def submit(self, key: Tuple, fn: Callable, *args, **kwargs) -> Job:
+        """
+        Queue fn(*args, progress=..., **kwargs). The progress callback takes
+        (phase, percent). Raises DuplicateJobError if key is already active.
+        """
+        job = self._register(key)
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def run(self, key: Tuple, fn: Callable, *args, **kwargs):
+        """
+        Like submit, but run fn on the calling thread and return its result
+        (or raise its exception). The key is taken while it runs, so a
+        synchronous run and a queued job never overlap either.
+        """
+        job = self._register(key)
+        return self._execute(job, fn, args, kwargs)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def counts(self) -> Dict[str, int]:
+        """Number of kept jobs per status"""
+        with self._lock:
+            counts = {status: 0 for status in ('QUEUED', 'RUNNING', 'DONE', 'FAILED')}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
+
+    def _register(self, key: Tuple) -> Job:
+        with self._lock:
+            active_id = self._active.get(key)
+            if active_id is not None:
+                raise DuplicateJobError(active_id)
+            job = Job(id=uuid.uuid4().hex, key=key)
+            self._jobs[job.id] = job
+            self._active[key] = job.id
+            self._prune()
+        return job
+
+    def _run(self, job: Job, fn: Callable, args, kwargs) -> None:
+        try:
+            self._execute(job, fn, args, kwargs)
+        except Exception:
+            # Kept on the job for polling
+            pass
+
+    def _execute(self, job: Job, fn: Callable, args, kwargs):
+        def progress(phase: str, percent: int) -> None:
+            job.phase = phase
+            job.percent = percent
+
+        job.status = 'RUNNING'
+        job.started_at = datetime.now()
+        try:
+            job.result = fn(*args, progress=progress, **kwargs)
+            job.status = 'DONE'
+            progress('done', 100)
+        except Exception as e:
+            # HTTPException keeps its message in .detail
+            job.error = str(getattr(e, 'detail', None) or e)
+            job.status = 'FAILED'
+            raise
+        finally:
+            job.finished_at = datetime.now()
+            with self._lock:
+                self._active.pop(job.key, None)
+        return job.result
+
+    def _prune(self) -> None:
+        finished = [job for job in self._jobs.values() if job.status not in ACTIVE_STATUSES]
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.id]
+
+
+generation_jobs = JobManager(max_workers=int(os.getenv("GENERATION_WORKERS", "2")))
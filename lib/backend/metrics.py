@@ -0,0 +1,288 @@
+"""
+Prometheus metrics for the API and the schedule generator.
+
+A small in-process registry rendered in the Prometheus text format
+(0.0.4) by GET /metrics, so no client library is needed:
+
+- http_requests_total / http_request_duration_seconds per route template
+  (e.g. /api/exams/student/{student_id}), http_requests_in_flight
+- http_request_db_seconds: time spent in the database per request
+  (from instrumentation.RequestTimings)
+- db_errors_total per route and kind (pool_timeout, connection, query)
+- generator_phase_seconds per phase, engine, annee and semester
+- gauges read at scrape time through collectors (connection pool,
+  generation jobs)
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import instrumentation
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# Request scope of the current request, for labelling db errors by route
+_scope: ContextVar[Optional[dict]] = ContextVar("metrics_scope", default=None)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> ([count per bucket, +Inf last], sum)
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total[0])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+# (name, type, help, [(labels dict, value)])
+Family = Tuple[str, str, str, Iterable[Tuple[dict, float]]]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self._add(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self._add(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self._add(Histogram(*args, **kwargs))
+
+    def collector(self, fn: Callable[[], Iterable[Family]]) -> Callable[[], Iterable[Family]]:
+        """Register fn, called at each scrape for values read from elsewhere (usable as a decorator)"""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            for name, kind, documentation, samples in collect():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} "
+                                 f"{_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+http_latency = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+http_db_time = registry.histogram(
+    "http_request_db_seconds", "Database time per HTTP request", ("method", "route"))
+http_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests being handled", ("method",))
+db_errors = registry.counter(
+    "db_errors_total", "Database errors turned into HTTP errors, by route", ("route", "kind"))
+generator_phases = registry.histogram(
+    "generator_phase_seconds", "Schedule generation time per phase",
+    ("phase", "engine", "annee", "semester"), buckets=PHASE_BUCKETS)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ============================================
+# ROUTES / DB ERRORS
+# ============================================
+
+def route_label(scope: dict) -> str:
+    """Path template of the matched route; 'unmatched' (e.g. 404s) keeps the label set bounded"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    endpoint = scope.get("endpoint")
+    app = scope.get("app")
+    if endpoint is not None and app is not None:
+        for candidate in app.routes:
+            if getattr(candidate, "endpoint", None) is endpoint:
+                return candidate.path
+    return "unmatched"
+
+
+def record_db_error(kind: str) -> None:
+    scope = _scope.get()
+    db_errors.inc(route=route_label(scope) if scope is not None else "background", kind=kind)
+
+
+# ============================================
+# GENERATOR PHASES
+# ============================================
+
+class PhaseTimer:
+    """
+    Progress callback (phase, percent) that times each phase until the
+    next one starts, into generator_phase_seconds; forwards to progress
+    """
+
+    def __init__(self, engine: str, annee: str, semester: str, progress: Optional[Callable] = None):
+        self.labels = {"engine": engine, "annee": annee, "semester": semester}
+        self.progress = progress
+        self._phase = None
+        self._started = 0.0
+
+    def __call__(self, phase: str, percent: int) -> None:
+        self._close()
+        self._phase = phase
+        self._started = time.perf_counter()
+        if self.progress:
+            self.progress(phase, percent)
+
+    def finish(self) -> None:
+        self._close()
+
+    def record(self, timings: dict) -> None:
+        """Observe phases timed elsewhere: a RunTimings.to_dict(), e.g. the ones sp_generate_exam_schedule stored"""
+        for timing in timings["phases"]:
+            generator_phases.observe(timing["wallMs"] / 1000, phase=timing["phase"], **self.labels)
+
+    def _close(self) -> None:
+        if self._phase is not None:
+            generator_phases.observe(time.perf_counter() - self._started, phase=self._phase, **self.labels)
+            self._phase = None
+
+
+# ============================================
+# MIDDLEWARE
+# ============================================
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, latency, in-flight and DB time"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        started = time.perf_counter()
+        token = _scope.set(scope)
+        http_in_flight.inc(method=method)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _scope.reset(token)
+            http_in_flight.dec(method=method)
+            route = route_label(scope)
+            http_requests.inc(method=method, route=route, status=status)
+            http_latency.observe(time.perf_counter() - started, method=method, route=route)
+            timings = instrumentation.current()
+            if timings is not None:
+                http_db_time.observe(timings.db_ms / 1000, method=method, route=route)
@@ -0,0 +1,60 @@
+"""
+Keyset pagination and NDJSON streaming for the large listing endpoints.
+
+A page is requested with ?limit=N and continued with the opaque
+?cursor=... returned as next_cursor; the cursor holds the sort key of the
+last row sent, so each page is an index range scan whatever its depth.
+?stream=true instead sends every row as one JSON line, read from an
+unbuffered cursor in fixed-size batches.
+"""
+
+import base64
+import json
+from typing import Iterator, List, Optional, Sequence
+
+
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_ROWS = 500
+
+
+def encode_cursor(values: Sequence) -> str:
+    raw = json.dumps([str(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: str, size: int) -> List[str]:
+    """Sort key values of a cursor; ValueError if it is not one of ours"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def page(rows: list, limit: int, key_columns: Sequence[str]):
+    """Split limit + 1 fetched rows into (rows, next_cursor or None)"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([last[column] for column in key_columns])
+
+
+def ndjson_batches(cursor, batch_rows: int = STREAM_BATCH_ROWS) -> Iterator[str]:
+    """
+    One NDJSON chunk per batch of rows. Dates, times and timedeltas are
+    written with str(), as the JSON endpoints convert them.
+    """
+    while True:
+        batch = cursor.fetchmany(batch_rows)
+        if not batch:
+            return
+        yield ''.join(json.dumps(row, default=str) + '\n' for row in batch)
+
+
+def check_limit(limit: Optional[int]) -> None:
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
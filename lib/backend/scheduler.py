@@ -0,0 +1,1512 @@
+"""
+In-process exam schedule generator.
+
+Mirrors sp_generate_exam_schedule (phases 1-4 of sql_script.sql) but loads the
+inputs in a handful of bulk queries, builds the plan in memory and persists it
+in a single transaction.
+"""
+
+import logging
+import math
+import random
+import time
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from heapq import heapify, heappop, heappush
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+MAX_SURVEILLANCES_PER_DAY = 3
+
+logger = logging.getLogger("exam_scheduler.scheduler")
+
+
+# ============================================
+# DATA SNAPSHOT
+# ============================================
+
+@dataclass
+class Snapshot:
+    """Everything the generator reads from the database for one period"""
+    # (exam_id, formation_id, duree_minutes), ordered by formation_id, id
+    exams: List[Tuple[int, int, int]]
+    # formation_id -> (nom, department_id)
+    formations: Dict[int, Tuple[str, int]]
+    # formation_id -> [(groupe_id, student_count)], ordered by groupe_id
+    groups: Dict[int, List[Tuple[int, int]]]
+    # (lieu_id, capacite, department_id), available rooms only
+    rooms: List[Tuple[int, int, Optional[int]]]
+    # (enseignant_id, department_id), ordered by id
+    teachers: List[Tuple[int, Optional[int]]]
+
+
+def load_snapshot(conn, annee: str, semester: str, formation_ids: Optional[List[int]] = None) -> Snapshot:
+    """Load the generator inputs for a year/semester in five queries, optionally for some formations only"""
+    cursor = conn.cursor()
+
+    scope, scope_params = _formation_scope('formation_id', formation_ids)
+    cursor.execute(f"""
+        SELECT id, formation_id, duree_minutes
+        FROM examens
+        WHERE annee_universitaire = %s AND semester = %s{scope}
+        ORDER BY formation_id, id
+    """, (annee, semester, *scope_params))
+    exams = [tuple(row) for row in cursor.fetchall()]
+
+    cursor.execute("SELECT id, nom, department_id FROM formations")
+    formations = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+    scope, scope_params = _formation_scope('g.formation_id', formation_ids, 'WHERE')
+    cursor.execute(f"""
+        SELECT g.id, g.formation_id, COUNT(et.id)
+        FROM groupes g
+        LEFT JOIN etudiants et ON et.groupe_id = g.id{scope}
+        GROUP BY g.id, g.formation_id
+        ORDER BY g.formation_id, g.id
+    """, scope_params)
+    groups = {}
+    for groupe_id, formation_id, student_count in cursor.fetchall():
+        groups.setdefault(formation_id, []).append((groupe_id, student_count))
+
+    cursor.execute("""
+        SELECT id, capacite, department_id
+        FROM lieux_examen
+        WHERE disponible = TRUE
+        ORDER BY capacite, id
+    """)
+    rooms = [tuple(row) for row in cursor.fetchall()]
+
+    cursor.execute("SELECT id, department_id FROM enseignants ORDER BY id")
+    teachers = [tuple(row) for row in cursor.fetchall()]
+
+    cursor.close()
+    return Snapshot(exams, formations, groups, rooms, teachers)
+
+
+def _formation_scope(column: str, formation_ids: Optional[List[int]], keyword: str = 'AND') -> Tuple[str, tuple]:
+    """SQL fragment restricting column to formation_ids; empty when not scoped"""
+    if formation_ids is None:
+        return '', ()
+    placeholders = ', '.join(['%s'] * len(formation_ids))
+    return f"\n        {keyword} {column} IN ({placeholders})", tuple(formation_ids)
+
+
+@dataclass
+class Occupancy:
+    """
+    Rooms and teachers already committed by schedules outside a partial
+    regeneration. The generator treats them as fixed.
+    """
+    # date -> number of exams already scheduled that day
+    exams_per_date: Dict[date, int] = field(default_factory=dict)
+    # (date, start_minutes, lieu_id)
+    rooms: List[Tuple[date, int, int]] = field(default_factory=list)
+    # (date, start_minutes, enseignant_id), one row per surveillance
+    surveillances: List[Tuple[date, int, int]] = field(default_factory=list)
+
+
+def load_occupancy(conn, annee: str, semester: str, start_date: date, end_date: date,
+                   formation_ids: List[int]) -> Occupancy:
+    """Everything scheduled in the date range except this period's schedules of formation_ids"""
+    cursor = conn.cursor()
+    placeholders = ', '.join(['%s'] * len(formation_ids))
+    # Rows of the schedules being regenerated are not occupancy
+    others = f"""
+        se.date_exam BETWEEN %s AND %s
+        AND NOT (s.annee_universitaire = %s AND s.semester = %s AND s.formation_id IN ({placeholders}))
+    """
+    params = (start_date, end_date, annee, semester, *formation_ids)
+    occupancy = Occupancy()
+
+    cursor.execute(f"""
+        SELECT se.date_exam, COUNT(*)
+        FROM schedule_examens se
+        JOIN schedules s ON s.id = se.schedule_id
+        WHERE {others}
+        GROUP BY se.date_exam
+    """, params)
+    occupancy.exams_per_date = {day: count for day, count in cursor.fetchall()}
+
+    cursor.execute(f"""
+        SELECT se.date_exam, se.heure_debut, ses.lieu_id
+        FROM schedule_exam_salles ses
+        JOIN schedule_examens se ON se.id = ses.schedule_exam_id
+        JOIN schedules s ON s.id = se.schedule_id
+        WHERE {others}
+    """, params)
+    occupancy.rooms = [(day, _time_to_minutes(start), lieu_id) for day, start, lieu_id in cursor.fetchall()]
+
+    cursor.execute(f"""
+        SELECT se.date_exam, se.heure_debut, sv.enseignant_id
+        FROM surveillances sv
+        JOIN schedule_examens se ON se.examen_id = sv.examen_id
+        JOIN schedules s ON s.id = se.schedule_id
+        WHERE {others}
+    """, params)
+    occupancy.surveillances = [
+        (day, _time_to_minutes(start), teacher_id) for day, start, teacher_id in cursor.fetchall()
+    ]
+
+    cursor.close()
+    return occupancy
+
+
+def _time_to_minutes(value) -> int:
+    # TIME columns come back as timedelta
+    return int(value.total_seconds()) // 60
+
+
+# ============================================
+# PLAN
+# ============================================
+
+@dataclass
+class Plan:
+    """
+    In-memory schedule. Exams and sittings (one exam for one group) are
+    stored column-wise in arrays indexed by position.
+    """
+    start_date: date
+    day_count: int
+    # (label, start_minutes, end_minutes)
+    slots: List[Tuple[str, int, int]]
+    # Per exam (same order as Snapshot.exams); -1 when not placed
+    exam_day: array = None
+    exam_slot: array = None
+    # Per sitting; lieu / teacher are -1 when none could be assigned
+    sit_exam: array = field(default_factory=lambda: array('i'))
+    sit_groupe: array = field(default_factory=lambda: array('i'))
+    sit_students: array = field(default_factory=lambda: array('i'))
+    sit_lieu: array = field(default_factory=lambda: array('i'))
+    sit_teacher: array = field(default_factory=lambda: array('i'))
+    # (examen_id, formation_id, enseignant_id, lieu_id, conflict_type, reason)
+    conflicts: List[tuple] = field(default_factory=list)
+    # Per-phase counters reported back to the caller
+    stats: Dict[str, int] = field(default_factory=dict)
+
+    def exam_date(self, day: int) -> date:
+        return self.start_date + timedelta(days=day)
+
+    def fixed_on_days(self, rows):
+        """(day, start, value) for the Occupancy rows that fall inside the plan's range"""
+        for when, start, value in rows:
+            day = (when - self.start_date).days
+            if 0 <= day < self.day_count:
+                yield day, start, value
+
+
+def parse_time_slots(time_slots) -> List[Tuple[str, int, int]]:
+    """Convert (label, "HH:MM", "HH:MM") triples to minutes since midnight"""
+    return [(label, _to_minutes(start), _to_minutes(end)) for label, start, end in time_slots]
+
+
+def _to_minutes(value: str) -> int:
+    parts = value.split(':')
+    return int(parts[0]) * 60 + int(parts[1])
+
+
+def format_time(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:00"
+
+
+# ============================================
+# RUN TIMINGS
+# ============================================
+
+@dataclass
+class PhaseTiming:
+    """
+    Wall time and work done by one phase. rows_inserted counts what the
+    phase adds to the plan (the rows sp_phase1-3 write to their temporary
+    tables) and, for persisting, the rows written to the schedule tables.
+    """
+    phase: str
+    wall_ms: float = 0.0
+    iterations: int = 0
+    rows_inserted: int = 0
+    conflicts_logged: int = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "phase": self.phase,
+            "wallMs": round(self.wall_ms, 3),
+            "iterations": self.iterations,
+            "rowsInserted": self.rows_inserted,
+            "conflictsLogged": self.conflicts_logged,
+        }
+
+
+class RunTimings:
+    """Phases of one generation, in the order they ran"""
+
+    def __init__(self):
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self.phases: List[PhaseTiming] = []
+
+    @contextmanager
+    def phase(self, name: str, plan: Optional[Plan] = None):
+        """Time the block; with a plan, conflicts it appends are counted too"""
+        timing = PhaseTiming(name)
+        conflicts_before = len(plan.conflicts) if plan is not None else 0
+        started = time.perf_counter()
+        try:
+            yield timing
+        finally:
+            timing.wall_ms = (time.perf_counter() - started) * 1000
+            if plan is not None:
+                timing.conflicts_logged = len(plan.conflicts) - conflicts_before
+            self.phases.append(timing)
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self._started) * 1000
+
+    def to_dict(self) -> dict:
+        return {
+            "totalMs": round(self.total_ms(), 3),
+            "phases": [timing.to_dict() for timing in self.phases],
+        }
+
+
+# ============================================
+# PHASE 1: TIME SLOTS
+# Only rule: 1 exam per day per formation
+# ============================================
+
+def plan_time_slots(snapshot: Snapshot, plan: Plan, fixed: Optional[Occupancy] = None) -> None:
+    exam_count = len(snapshot.exams)
+    slot_count = len(plan.slots)
+    plan.exam_day = array('i', [-1]) * exam_count
+    plan.exam_slot = array('i', [-1]) * exam_count
+
+    # Formation x day occupancy: bit d of occupancy[formation] is set once the
+    # formation has an exam on day d, so the next free day is the lowest clear bit
+    all_days = (1 << plan.day_count) - 1
+    occupancy: Dict[int, int] = {}
+    exams_per_day = array('i', [0]) * plan.day_count
+    if fixed is not None:
+        for when, count in fixed.exams_per_date.items():
+            day = (when - plan.start_date).days
+            if 0 <= day < plan.day_count:
+                exams_per_day[day] = count
+
+    for i, (exam_id, formation_id, _duree) in enumerate(snapshot.exams):
+        free = ~occupancy.get(formation_id, 0) & all_days
+        if not free:
+            plan.conflicts.append((
+                exam_id, formation_id, None, None,
+                'STUDENT_OVERLOAD', 'No dates available in range'
+            ))
+            continue
+
+        lowest = free & -free
+        day = lowest.bit_length() - 1
+        occupancy[formation_id] = occupancy.get(formation_id, 0) | lowest
+
+        # Rotate through the slots by how many exams the day already has
+        plan.exam_day[i] = day
+        plan.exam_slot[i] = exams_per_day[day] % slot_count
+        exams_per_day[day] += 1
+
+    # One step per exam: the free day comes from a bit mask, not a scan
+    plan.stats['placement_steps'] = exam_count
+
+
+def plan_time_slots_dsatur(snapshot: Snapshot, plan: Plan,
+                           max_per_day: int = MAX_SURVEILLANCES_PER_DAY,
+                           fixed: Optional[Occupancy] = None) -> None:
+    """
+    Phase 1 as graph colouring. Exams are vertices, a colour is a (day, slot)
+    pair, and exams of the same formation are adjacent because they may not
+    share a day. Rooms and teachers are shared resources, so a colour is only
+    usable while its free rooms can seat the exam's groups and enough teachers
+    remain for that slot and day.
+
+    Exams are coloured DSatur-style: most days already blocked by placed
+    neighbours first, then highest degree, then most students. Each exam gets
+    the earliest feasible day, which keeps the number of days used low.
+    """
+    exam_count = len(snapshot.exams)
+    slot_count = len(plan.slots)
+    plan.exam_day = array('i', [-1]) * exam_count
+    plan.exam_slot = array('i', [-1]) * exam_count
+
+    by_formation: Dict[int, List[int]] = {}
+    for i, (_exam_id, formation_id, _duree) in enumerate(snapshot.exams):
+        by_formation.setdefault(formation_id, []).append(i)
+    # Seats needed per sitting, largest first
+    group_sizes = {
+        formation_id: sorted((count for _g, count in snapshot.groups.get(formation_id, []) if count > 0), reverse=True)
+        for formation_id in by_formation
+    }
+
+    all_days = (1 << plan.day_count) - 1
+    occupancy: Dict[int, int] = {}
+    room_capacities = sorted(capacite for _lieu, capacite, _dept in snapshot.rooms)
+    free_capacities: Dict[Tuple[int, int], list] = {}
+    sittings_at: Dict[Tuple[int, int], int] = {}
+    sittings_on_day = array('i', [0]) * plan.day_count
+    teacher_count = len(snapshot.teachers)
+    if fixed is not None:
+        room_capacity = {lieu_id: capacite for lieu_id, capacite, _dept in snapshot.rooms}
+        for day, start, lieu_id in plan.fixed_on_days(fixed.rooms):
+            if lieu_id in room_capacity:
+                capacities = free_capacities.setdefault((day, start), list(room_capacities))
+                pos = bisect_left(capacities, room_capacity[lieu_id])
+                if pos < len(capacities) and capacities[pos] == room_capacity[lieu_id]:
+                    del capacities[pos]
+        for day, start, _teacher_id in plan.fixed_on_days(fixed.surveillances):
+            sittings_at[(day, start)] = sittings_at.get((day, start), 0) + 1
+            sittings_on_day[day] += 1
+
+    steps = 0
+
+    def seat(day: int, start: int, sizes: List[int], commit: bool) -> bool:
+        nonlocal steps
+        steps += 1
+        if sittings_at.get((day, start), 0) + len(sizes) > teacher_count:
+            return False
+        if sittings_on_day[day] + len(sizes) > teacher_count * max_per_day:
+            return False
+        capacities = free_capacities.get((day, start), room_capacities)
+        taken = []
+        for size in sizes:
+            pos = bisect_left(capacities, size)
+            while pos in taken:
+                pos += 1
+            if pos >= len(capacities):
+                return False
+            taken.append(pos)
+        if commit:
+            capacities = free_capacities[(day, start)] = list(capacities)
+            for pos in sorted(taken, reverse=True):
+                del capacities[pos]
+            sittings_at[(day, start)] = sittings_at.get((day, start), 0) + len(sizes)
+            sittings_on_day[day] += len(sizes)
+        return True
+
+    saturation = array('i', [0]) * exam_count
+    heap = []
+    for i, (exam_id, formation_id, _duree) in enumerate(snapshot.exams):
+        degree = len(by_formation[formation_id]) - 1
+        heap.append((0, -degree, -sum(group_sizes[formation_id]), exam_id, i))
+    heapify(heap)
+
+    while heap:
+        neg_saturation, neg_degree, neg_students, exam_id, i = heappop(heap)
+        if plan.exam_day[i] >= 0 or -neg_saturation != saturation[i]:
+            continue
+        formation_id = snapshot.exams[i][1]
+        sizes = group_sizes[formation_id]
+
+        free = ~occupancy.get(formation_id, 0) & all_days
+        if not free:
+            plan.conflicts.append((
+                exam_id, formation_id, None, None,
+                'STUDENT_OVERLOAD', 'No dates available in range'
+            ))
+            continue
+
+        chosen = None
+        fallback = None
+        while free and chosen is None:
+            lowest = free & -free
+            day = lowest.bit_length() - 1
+            free ^= lowest
+            # Least busy slot of the day first
+            slots = sorted(range(slot_count), key=lambda k: (sittings_at.get((day, plan.slots[k][1]), 0), k))
+            if fallback is None:
+                fallback = (day, slots[0])
+            for k in slots:
+                if seat(day, plan.slots[k][1], sizes, commit=True):
+                    chosen = (day, k)
+                    break
+
+        # No colour has room for it: take the earliest free day anyway and
+        # let phases 2-3 log the shortfall, as the greedy strategy would
+        day, k = chosen or fallback
+        plan.exam_day[i] = day
+        plan.exam_slot[i] = k
+        occupancy[formation_id] = occupancy.get(formation_id, 0) | (1 << day)
+
+        for j in by_formation[formation_id]:
+            if plan.exam_day[j] < 0:
+                saturation[j] += 1
+                heappush(heap, (
+                    -saturation[j], neg_degree, neg_students, snapshot.exams[j][0], j
+                ))
+
+    # Colours tried
+    plan.stats['placement_steps'] = steps
+
+
+# ============================================
+# PHASE 2: ROOMS
+# ============================================
+
+def allocate_rooms(snapshot: Snapshot, plan: Plan, fixed: Optional[Occupancy] = None) -> None:
+    # Formations with empty groups are logged once, against their first exam
+    first_exam: Dict[int, int] = {}
+    for i, (exam_id, formation_id, _duree) in enumerate(snapshot.exams):
+        if plan.exam_day[i] >= 0 and formation_id not in first_exam:
+            first_exam[formation_id] = exam_id
+    for formation_id in sorted(first_exam):
+        if any(count == 0 for _g, count in snapshot.groups.get(formation_id, [])):
+            plan.conflicts.append((
+                first_exam[formation_id], formation_id, None, None, 'NO_STUDENTS',
+                f"Formation {snapshot.formations[formation_id][0]} has groups with 0 students"
+            ))
+
+    for i in _exams_in_time_order(snapshot, plan):
+        formation_id = snapshot.exams[i][1]
+        for groupe_id, student_count in snapshot.groups.get(formation_id, []):
+            if student_count > 0:
+                plan.sit_exam.append(i)
+                plan.sit_groupe.append(groupe_id)
+                plan.sit_students.append(student_count)
+
+    sitting_count = len(plan.sit_exam)
+    plan.sit_lieu = array('i', [-1]) * sitting_count
+    plan.sit_teacher = array('i', [-1]) * sitting_count
+
+    free_rooms = FreeRoomIndex(snapshot.rooms)
+    if fixed is not None:
+        for day, start, lieu_id in plan.fixed_on_days(fixed.rooms):
+            free_rooms.reserve(day, start, lieu_id)
+    wasted_capacity = 0
+    for s in range(sitting_count):
+        i = plan.sit_exam[s]
+        exam_id, formation_id, _duree = snapshot.exams[i]
+        dept_id = snapshot.formations[formation_id][1]
+        day = plan.exam_day[i]
+        start = plan.slots[plan.exam_slot[i]][1]
+        student_count = plan.sit_students[s]
+
+        room = free_rooms.take(day, start, dept_id, student_count)
+        if room is not None:
+            plan.sit_lieu[s] = room[0]
+            wasted_capacity += room[1] - student_count
+        else:
+            plan.conflicts.append((
+                exam_id, formation_id, None, None, 'ROOM_CAPACITY',
+                f"No room available for {student_count} students at "
+                f"{plan.exam_date(day)} {format_time(start)}"
+            ))
+
+    plan.stats['rooms_scanned'] = free_rooms.rooms_scanned
+    plan.stats['wasted_capacity'] = wasted_capacity
+
+
+class FreeRoomIndex:
+    """
+    Free rooms per (day, start time). Each pool is a list of (capacite, lieu_id)
+    kept sorted, so the smallest room that fits is found by binary search.
+    A sitting first looks in its department's pool, then in the pool of all
+    rooms (the fallback query of sp_phase2_allocate_rooms).
+    """
+
+    def __init__(self, rooms):
+        self._all = sorted((capacite, lieu_id) for lieu_id, capacite, _dept in rooms)
+        self._by_dept: Dict[int, list] = {}
+        self._dept_of: Dict[int, Optional[int]] = {}
+        self._capacity_of: Dict[int, int] = {}
+        for lieu_id, capacite, dept_id in rooms:
+            self._dept_of[lieu_id] = dept_id
+            self._capacity_of[lieu_id] = capacite
+            if dept_id is not None:
+                self._by_dept.setdefault(dept_id, []).append((capacite, lieu_id))
+        for pool in self._by_dept.values():
+            pool.sort()
+        # (day, start) -> (all rooms pool, {dept_id: pool}); copied on first use
+        self._pools: Dict[Tuple[int, int], tuple] = {}
+        self.rooms_scanned = 0
+
+    def _pools_at(self, day: int, start: int):
+        pools = self._pools.get((day, start))
+        if pools is None:
+            pools = self._pools[(day, start)] = (list(self._all), {})
+        return pools
+
+    def _dept_pool(self, dept_pools: dict, dept_id) -> Optional[list]:
+        pool = dept_pools.get(dept_id)
+        if pool is None and dept_id in self._by_dept:
+            pool = dept_pools[dept_id] = list(self._by_dept[dept_id])
+        return pool
+
+    def take(self, day: int, start: int, dept_id: int, student_count: int) -> Optional[Tuple[int, int]]:
+        """Remove and return (lieu_id, capacite) of the best-fit free room, if any"""
+        all_rooms, dept_pools = self._pools_at(day, start)
+        for pool in (self._dept_pool(dept_pools, dept_id), all_rooms):
+            if not pool:
+                continue
+            self.rooms_scanned += len(pool).bit_length()
+            pos = bisect_left(pool, (student_count, 0))
+            if pos < len(pool):
+                capacite, lieu_id = pool.pop(pos)
+                self._discard(all_rooms, dept_pools, capacite, lieu_id)
+                return lieu_id, capacite
+        return None
+
+    def reserve(self, day: int, start: int, lieu_id: int) -> None:
+        """Mark a room as taken by a schedule outside the plan"""
+        capacite = self._capacity_of.get(lieu_id)
+        if capacite is not None:
+            all_rooms, dept_pools = self._pools_at(day, start)
+            self._discard(all_rooms, dept_pools, capacite, lieu_id)
+
+    def _discard(self, all_rooms: list, dept_pools: dict, capacite: int, lieu_id: int) -> None:
+        # Drop the room from whichever pool it was not taken from
+        for pool in (all_rooms, self._dept_pool(dept_pools, self._dept_of[lieu_id])):
+            if pool:
+                pos = bisect_left(pool, (capacite, lieu_id))
+                if pos < len(pool) and pool[pos] == (capacite, lieu_id):
+                    pool.pop(pos)
+
+
+def _exams_in_time_order(snapshot: Snapshot, plan: Plan) -> List[int]:
+    placed = [i for i in range(len(snapshot.exams)) if plan.exam_day[i] >= 0]
+    placed.sort(key=lambda i: (
+        plan.exam_day[i], plan.slots[plan.exam_slot[i]][1], snapshot.exams[i][0]
+    ))
+    return placed
+
+
+# ============================================
+# PHASE 3: SURVEILLANCE
+# ============================================
+
+def assign_surveillance(snapshot: Snapshot, plan: Plan,
+                        max_per_day: int = MAX_SURVEILLANCES_PER_DAY,
+                        fixed: Optional[Occupancy] = None) -> None:
+    days_used = sorted({plan.exam_day[i] for i in range(len(snapshot.exams)) if plan.exam_day[i] >= 0})
+    loads = TeacherLoadIndex(snapshot.teachers, max_per_day)
+    if fixed is not None:
+        for day, start, teacher_id in plan.fixed_on_days(fixed.surveillances):
+            if teacher_id in loads.dept_of:
+                loads.assign(day, start, teacher_id)
+
+    for s in range(len(plan.sit_exam)):
+        if plan.sit_lieu[s] < 0:
+            continue
+        i = plan.sit_exam[s]
+        exam_id, formation_id, _duree = snapshot.exams[i]
+        dept_id = snapshot.formations[formation_id][1]
+        day = plan.exam_day[i]
+        start = plan.slots[plan.exam_slot[i]][1]
+
+        # Least loaded free teacher today: same department first, then anyone
+        teacher_id = loads.pick(day, start, dept_id)
+        if teacher_id is None:
+            teacher_id = loads.pick(day, start, None)
+
+        if teacher_id is None:
+            plan.conflicts.append((
+                exam_id, formation_id, None, None, 'TEACHER_UNAVAILABLE',
+                f"CRITICAL: No teacher available at {plan.exam_date(day)} {format_time(start)}"
+            ))
+            continue
+
+        teacher_dept = loads.dept_of[teacher_id]
+        if teacher_dept is not None and teacher_dept != dept_id:
+            plan.conflicts.append((
+                exam_id, None, teacher_id, None, 'TEACHER_CROSS_DEPT',
+                f"Teacher from dept {teacher_dept} helping dept {dept_id}"
+            ))
+        plan.sit_teacher[s] = teacher_id
+        loads.assign(day, start, teacher_id)
+
+    for day in days_used:
+        low, high = loads.load_range(day)
+        if high - low > 2:
+            plan.conflicts.append((
+                None, None, None, None, 'TEACHER_DAILY_IMBALANCE',
+                f"Date {plan.exam_date(day)}: workload gap {low} to {high}"
+            ))
+
+    plan.stats['teachers_scanned'] = loads.entries_scanned
+
+
+class TeacherLoadIndex:
+    """
+    Daily surveillance load per teacher. For each day there is one min-heap of
+    (load, teacher_id) per department plus one over all teachers, so the least
+    loaded teacher is found in O(log T). Heaps are updated lazily: assigning a
+    teacher pushes a fresh entry and the old one is skipped once it surfaces.
+    """
+
+    def __init__(self, teachers, max_per_day: int):
+        self.max_per_day = max_per_day
+        self.dept_of: Dict[int, Optional[int]] = dict(teachers)
+        self._members: Dict[Optional[int], List[int]] = {None: [t for t, _d in teachers]}
+        for teacher_id, dept_id in teachers:
+            if dept_id is not None:
+                self._members.setdefault(dept_id, []).append(teacher_id)
+        # day -> {teacher_id: load}; day -> highest load
+        self._load: Dict[int, Dict[int, int]] = {}
+        self._max_load: Dict[int, int] = {}
+        # (day, dept_id or None for all teachers) -> heap
+        self._heaps: Dict[Tuple[int, Optional[int]], list] = {}
+        # (teacher_id, day, start) already surveilling
+        self._busy = set()
+        self.entries_scanned = 0
+
+    def _day_load(self, day: int) -> Dict[int, int]:
+        load = self._load.get(day)
+        if load is None:
+            load = self._load[day] = dict.fromkeys(self.dept_of, 0)
+            self._max_load[day] = 0
+        return load
+
+    def _heap(self, day: int, dept_id: Optional[int]) -> list:
+        heap = self._heaps.get((day, dept_id))
+        if heap is None:
+            load = self._day_load(day)
+            heap = [(load[t], t) for t in self._members.get(dept_id, [])]
+            heapify(heap)
+            self._heaps[(day, dept_id)] = heap
+        return heap
+
+    def pick(self, day: int, start: int, dept_id: Optional[int]) -> Optional[int]:
+        """Least loaded teacher under the daily limit and free at (day, start); None = all teachers"""
+        heap = self._heap(day, dept_id)
+        load = self._load[day]
+        skipped = []
+        chosen = None
+        while heap:
+            self.entries_scanned += 1
+            entry_load, teacher_id = heap[0]
+            if entry_load != load[teacher_id]:
+                heappop(heap)
+            elif entry_load >= self.max_per_day:
+                break
+            elif (teacher_id, day, start) in self._busy:
+                skipped.append(heappop(heap))
+            else:
+                chosen = teacher_id
+                break
+        for entry in skipped:
+            heappush(heap, entry)
+        return chosen
+
+    def assign(self, day: int, start: int, teacher_id: int) -> None:
+        load = self._day_load(day)
+        load[teacher_id] += 1
+        self._max_load[day] = max(self._max_load[day], load[teacher_id])
+        self._busy.add((teacher_id, day, start))
+        for key in {(day, None), (day, self.dept_of[teacher_id])}:
+            if key in self._heaps:
+                heappush(self._heaps[key], (load[teacher_id], teacher_id))
+
+    def load_range(self, day: int) -> Tuple[int, int]:
+        """(lowest, highest) load of the day, read off the all-teachers heap"""
+        heap = self._heap(day, None)
+        load = self._load[day]
+        while heap and heap[0][0] != load[heap[0][1]]:
+            heappop(heap)
+        if not heap:
+            return 0, 0
+        return heap[0][0], self._max_load[day]
+
+
+def build_plan(snapshot: Snapshot, start_date: date, end_date: date, time_slots,
+               max_per_day: int = MAX_SURVEILLANCES_PER_DAY, strategy: str = 'greedy',
+               fixed: Optional[Occupancy] = None, progress: Optional[Callable[[str, int], None]] = None,
+               timings: Optional[RunTimings] = None) -> Plan:
+    """Run phases 1-3 in memory, around the fixed occupancy if given"""
+    progress = progress or _no_progress
+    timings = timings or RunTimings()
+    plan = Plan(
+        start_date=start_date,
+        day_count=(end_date - start_date).days + 1,
+        slots=parse_time_slots(time_slots),
+    )
+    progress('time_slots', 10)
+    with timings.phase('time_slots', plan) as phase:
+        if strategy == 'dsatur':
+            plan_time_slots_dsatur(snapshot, plan, max_per_day, fixed)
+        else:
+            plan_time_slots(snapshot, plan, fixed)
+        phase.iterations = plan.stats['placement_steps']
+        phase.rows_inserted = sum(1 for day in plan.exam_day if day >= 0)
+    progress('rooms', 30)
+    with timings.phase('rooms', plan) as phase:
+        allocate_rooms(snapshot, plan, fixed)
+        phase.iterations = plan.stats['rooms_scanned']
+        phase.rows_inserted = sum(1 for lieu_id in plan.sit_lieu if lieu_id >= 0)
+    progress('surveillance', 50)
+    with timings.phase('surveillance', plan) as phase:
+        assign_surveillance(snapshot, plan, max_per_day, fixed)
+        phase.iterations = plan.stats['teachers_scanned']
+        phase.rows_inserted = sum(1 for teacher_id in plan.sit_teacher if teacher_id >= 0)
+    return plan
+
+
+def _no_progress(phase: str, percent: int) -> None:
+    pass
+
+
+# ============================================
+# POST-PASS: LOCAL SEARCH
+# Simulated annealing on rooms and surveillance
+# ============================================
+
+# Objective weights, per conflict the pass can repair
+WEIGHT_ROOM_CAPACITY = 10
+WEIGHT_TEACHER_UNAVAILABLE = 10
+WEIGHT_TEACHER_CROSS_DEPT = 1
+WEIGHT_TEACHER_IMBALANCE = 3  # per surveillance of gap above 2 on a day
+
+OPTIMIZER_STATS = ('objective_before', 'objective_after', 'moves_tried', 'moves_accepted', 'optimizer_ms')
+
+
+class LocalSearch:
+    """
+    Improves the room and surveillance assignment of a plan without moving
+    exams. Moves: give a sitting another teacher, swap the teachers of two
+    sittings on the same day, and seat a roomless sitting (relocating the
+    occupant of a big enough room if needed). Each move is scored from the
+    counters it touches, so evaluating it does not depend on the plan size.
+    """
+
+    def __init__(self, snapshot: Snapshot, plan: Plan, max_per_day: int):
+        self.snapshot = snapshot
+        self.plan = plan
+        self.max_per_day = max_per_day
+
+        self.teacher_ids = [t for t, _d in snapshot.teachers]
+        self.teacher_dept = dict(snapshot.teachers)
+        self.dept_teachers: Dict[int, List[int]] = {}
+        for teacher_id, dept_id in snapshot.teachers:
+            if dept_id is not None:
+                self.dept_teachers.setdefault(dept_id, []).append(teacher_id)
+        self.room_capacity = {lieu_id: capacite for lieu_id, capacite, _d in snapshot.rooms}
+
+        count = len(plan.sit_exam)
+        self.sit_day = array('i', [0]) * count
+        self.sit_start = array('i', [0]) * count
+        self.sit_dept = array('i', [0]) * count
+        self.sittings_on_day: Dict[int, List[int]] = {}
+        for s in range(count):
+            i = plan.sit_exam[s]
+            self.sit_day[s] = plan.exam_day[i]
+            self.sit_start[s] = plan.slots[plan.exam_slot[i]][1]
+            self.sit_dept[s] = snapshot.formations[snapshot.exams[i][1]][1]
+            self.sittings_on_day.setdefault(self.sit_day[s], []).append(s)
+        self.roomless = [s for s in range(count) if plan.sit_lieu[s] < 0]
+
+        # (day, start) -> {lieu_id: sitting} and sorted free (capacite, lieu_id)
+        self.room_user: Dict[Tuple[int, int], Dict[int, int]] = {}
+        for s in range(count):
+            if plan.sit_lieu[s] >= 0:
+                self._room_users(s)[plan.sit_lieu[s]] = s
+        self.free_rooms: Dict[Tuple[int, int], list] = {}
+
+        # Busy (teacher, day, start); per day load per teacher and a histogram
+        # of loads, so the daily gap is read from at most max_per_day + 1 buckets
+        self.busy = set()
+        self.load: Dict[int, Dict[int, int]] = {day: dict.fromkeys(self.teacher_ids, 0) for day in self.sittings_on_day}
+        self.histogram: Dict[int, List[int]] = {}
+        for s in range(count):
+            teacher_id = plan.sit_teacher[s]
+            if teacher_id >= 0:
+                self.busy.add((teacher_id, self.sit_day[s], self.sit_start[s]))
+                self.load[self.sit_day[s]][teacher_id] += 1
+        for day, loads in self.load.items():
+            buckets = [0] * (max(max_per_day, *loads.values(), 0) + 2)
+            for value in loads.values():
+                buckets[value] += 1
+            self.histogram[day] = buckets
+
+        self.objective = self._full_objective()
+
+    # ---------- scoring ----------
+
+    def _cross(self, s: int, teacher_id: int) -> int:
+        if teacher_id < 0:
+            return 0
+        teacher_dept = self.teacher_dept[teacher_id]
+        return 1 if teacher_dept is not None and teacher_dept != self.sit_dept[s] else 0
+
+    def _gap_penalty(self, day: int) -> int:
+        buckets = self.histogram[day]
+        used = [value for value, n in enumerate(buckets) if n]
+        if not used:
+            return 0
+        return max(0, used[-1] - used[0] - 2)
+
+    def _sitting_cost(self, s: int) -> int:
+        if self.plan.sit_lieu[s] < 0:
+            return WEIGHT_ROOM_CAPACITY
+        teacher_id = self.plan.sit_teacher[s]
+        if teacher_id < 0:
+            return WEIGHT_TEACHER_UNAVAILABLE
+        return WEIGHT_TEACHER_CROSS_DEPT * self._cross(s, teacher_id)
+
+    def _full_objective(self) -> int:
+        total = sum(self._sitting_cost(s) for s in range(len(self.plan.sit_exam)))
+        total += WEIGHT_TEACHER_IMBALANCE * sum(self._gap_penalty(day) for day in self.histogram)
+        return total
+
+    def _load_change_delta(self, day: int, changes) -> int:
+        """Imbalance delta of applying [(teacher_id, +1/-1)] to a day's loads"""
+        buckets = self.histogram[day]
+        before = self._gap_penalty(day)
+        self._shift(day, changes, buckets)
+        after = self._gap_penalty(day)
+        self._shift(day, [(t, -step) for t, step in reversed(changes)], buckets)
+        return WEIGHT_TEACHER_IMBALANCE * (after - before)
+
+    def _shift(self, day: int, changes, buckets) -> None:
+        loads = self.load[day]
+        for teacher_id, step in changes:
+            buckets[loads[teacher_id]] -= 1
+            loads[teacher_id] += step
+            buckets[loads[teacher_id]] += 1
+
+    # ---------- rooms ----------
+
+    def _room_users(self, s: int) -> Dict[int, int]:
+        key = (self.sit_day[s], self.sit_start[s])
+        users = self.room_user.get(key)
+        if users is None:
+            users = self.room_user[key] = {}
+        return users
+
+    def _free_rooms(self, s: int) -> list:
+        key = (self.sit_day[s], self.sit_start[s])
+        pool = self.free_rooms.get(key)
+        if pool is None:
+            users = self._room_users(s)
+            pool = self.free_rooms[key] = sorted(
+                (capacite, lieu_id) for lieu_id, capacite in self.room_capacity.items() if lieu_id not in users
+            )
+        return pool
+
+    def _best_free_room(self, s: int, students: int) -> Optional[Tuple[int, int]]:
+        pool = self._free_rooms(s)
+        pos = bisect_left(pool, (students, 0))
+        return pool[pos] if pos < len(pool) else None
+
+    def _occupy(self, s: int, lieu_id: int) -> None:
+        pool = self._free_rooms(s)
+        pool.pop(bisect_left(pool, (self.room_capacity[lieu_id], lieu_id)))
+        self._room_users(s)[lieu_id] = s
+        self.plan.sit_lieu[s] = lieu_id
+
+    def _vacate(self, s: int) -> None:
+        lieu_id = self.plan.sit_lieu[s]
+        del self._room_users(s)[lieu_id]
+        pool = self._free_rooms(s)
+        entry = (self.room_capacity[lieu_id], lieu_id)
+        pool.insert(bisect_left(pool, entry), entry)
+        self.plan.sit_lieu[s] = -1
+
+    # ---------- moves ----------
+
+    def propose(self, rng):
+        """Return (delta, apply) for a random move, or None if the draw is not applicable"""
+        roll = rng.random()
+        if self.roomless and roll < 0.2:
+            return self._propose_seat(rng)
+        if roll < 0.7:
+            return self._propose_reassign(rng)
+        return self._propose_swap(rng)
+
+    def _propose_reassign(self, rng):
+        s = rng.randrange(len(self.plan.sit_exam))
+        if self.plan.sit_lieu[s] < 0:
+            return None
+        pool = self.dept_teachers.get(self.sit_dept[s]) if rng.random() < 0.7 else None
+        candidate = rng.choice(pool or self.teacher_ids)
+        current = self.plan.sit_teacher[s]
+        day, start = self.sit_day[s], self.sit_start[s]
+        if candidate == current or (candidate, day, start) in self.busy:
+            return None
+        if self.load[day][candidate] >= self.max_per_day:
+            return None
+
+        changes = [(candidate, 1)] + ([(current, -1)] if current >= 0 else [])
+        delta = self._load_change_delta(day, changes)
+        if current < 0:
+            delta -= WEIGHT_TEACHER_UNAVAILABLE
+        delta += WEIGHT_TEACHER_CROSS_DEPT * (self._cross(s, candidate) - self._cross(s, current))
+
+        def apply():
+            self._shift(day, changes, self.histogram[day])
+            if current >= 0:
+                self.busy.discard((current, day, start))
+            self.busy.add((candidate, day, start))
+            self.plan.sit_teacher[s] = candidate
+        return delta, apply
+
+    def _propose_swap(self, rng):
+        s1 = rng.randrange(len(self.plan.sit_exam))
+        day = self.sit_day[s1]
+        s2 = rng.choice(self.sittings_on_day[day])
+        t1, t2 = self.plan.sit_teacher[s1], self.plan.sit_teacher[s2]
+        start1, start2 = self.sit_start[s1], self.sit_start[s2]
+        if t1 < 0 or t2 < 0 or t1 == t2 or start1 == start2:
+            return None
+        if (t1, day, start2) in self.busy or (t2, day, start1) in self.busy:
+            return None
+
+        # Loads are unchanged, only the department match can move
+        delta = WEIGHT_TEACHER_CROSS_DEPT * (
+            self._cross(s1, t2) + self._cross(s2, t1) - self._cross(s1, t1) - self._cross(s2, t2)
+        )
+
+        def apply():
+            self.busy -= {(t1, day, start1), (t2, day, start2)}
+            self.busy |= {(t2, day, start1), (t1, day, start2)}
+            self.plan.sit_teacher[s1], self.plan.sit_teacher[s2] = t2, t1
+        return delta, apply
+
+    def _propose_seat(self, rng):
+        pos = rng.randrange(len(self.roomless))
+        s = self.roomless[pos]
+        students = self.plan.sit_students[s]
+        # A seated sitting without teacher costs WEIGHT_TEACHER_UNAVAILABLE instead
+        delta = WEIGHT_TEACHER_UNAVAILABLE - WEIGHT_ROOM_CAPACITY
+
+        room = self._best_free_room(s, students)
+        if room is not None:
+            def apply():
+                self._occupy(s, room[1])
+                self.roomless[pos] = self.roomless[-1]
+                self.roomless.pop()
+            return delta, apply
+
+        # Move the occupant of a big enough room into a free room that fits it
+        users = self._room_users(s)
+        if not users:
+            return None
+        lieu_id = rng.choice(list(users))
+        if self.room_capacity[lieu_id] < students:
+            return None
+        occupant = users[lieu_id]
+        target = self._best_free_room(occupant, self.plan.sit_students[occupant])
+        if target is None:
+            return None
+
+        def apply():
+            self._vacate(occupant)
+            self._occupy(occupant, target[1])
+            self._occupy(s, lieu_id)
+            self.roomless[pos] = self.roomless[-1]
+            self.roomless.pop()
+        return delta, apply
+
+    # ---------- results ----------
+
+    def rebuild_conflicts(self) -> None:
+        """Re-derive the phase 2-3 conflicts from the final assignment"""
+        plan, snapshot = self.plan, self.snapshot
+        kept = [c for c in plan.conflicts if c[4] in ('STUDENT_OVERLOAD', 'NO_STUDENTS')]
+        rooms, teachers = [], []
+        for s in range(len(plan.sit_exam)):
+            exam_id, formation_id, _duree = snapshot.exams[plan.sit_exam[s]]
+            day, start = self.sit_day[s], self.sit_start[s]
+            when = f"{plan.exam_date(day)} {format_time(start)}"
+            teacher_id = plan.sit_teacher[s]
+            if plan.sit_lieu[s] < 0:
+                rooms.append((
+                    exam_id, formation_id, None, None, 'ROOM_CAPACITY',
+                    f"No room available for {plan.sit_students[s]} students at {when}"
+                ))
+            elif teacher_id < 0:
+                teachers.append((
+                    exam_id, formation_id, None, None, 'TEACHER_UNAVAILABLE',
+                    f"CRITICAL: No teacher available at {when}"
+                ))
+            elif self._cross(s, teacher_id):
+                teachers.append((
+                    exam_id, None, teacher_id, None, 'TEACHER_CROSS_DEPT',
+                    f"Teacher from dept {self.teacher_dept[teacher_id]} helping dept {self.sit_dept[s]}"
+                ))
+        imbalance = []
+        for day in sorted(self.histogram):
+            used = [value for value, n in enumerate(self.histogram[day]) if n]
+            if used and used[-1] - used[0] > 2:
+                imbalance.append((
+                    None, None, None, None, 'TEACHER_DAILY_IMBALANCE',
+                    f"Date {plan.exam_date(day)}: workload gap {used[0]} to {used[-1]}"
+                ))
+        plan.conflicts = kept + rooms + teachers + imbalance
+
+
+def accept_move(delta: int, temperature: float, rng) -> bool:
+    """Metropolis rule: always take an improvement, a worsening with probability exp(-delta / T)"""
+    return delta <= 0 or rng.random() < math.exp(-delta / temperature)
+
+
+def optimize_plan(snapshot: Snapshot, plan: Plan, budget_ms: int,
+                  max_per_day: int = MAX_SURVEILLANCES_PER_DAY, seed: int = 0) -> None:
+    """Anneal the plan for at most budget_ms milliseconds; results go to plan.stats"""
+    search = LocalSearch(snapshot, plan, max_per_day)
+    rng = random.Random(seed)
+    objective_before = search.objective
+    initial = (plan.sit_lieu[:], plan.sit_teacher[:], plan.conflicts)
+    tried = accepted = 0
+
+    started = time.perf_counter()
+    budget = budget_ms / 1000.0
+    temperature = 2.0
+    while plan.sit_exam and search.objective > 0:
+        # Check the clock (and cool down) every 256 moves
+        if tried % 256 == 0:
+            elapsed = time.perf_counter() - started
+            if elapsed >= budget:
+                break
+            temperature = 2.0 * (0.01 ** (elapsed / budget))
+        tried += 1
+
+        move = search.propose(rng)
+        if move is None:
+            continue
+        delta, apply = move
+        if accept_move(delta, temperature, rng):
+            apply()
+            search.objective += delta
+            accepted += 1
+
+    if search.objective > objective_before:
+        # Annealing ended uphill: keep the generated plan
+        plan.sit_lieu, plan.sit_teacher, plan.conflicts = initial
+        search.objective = objective_before
+    else:
+        search.rebuild_conflicts()
+    plan.stats.update({
+        'objective_before': objective_before,
+        'objective_after': search.objective,
+        'moves_tried': tried,
+        'moves_accepted': accepted,
+        'optimizer_ms': round((time.perf_counter() - started) * 1000),
+    })
+
+
+# ============================================
+# DRY RUNS
+# Compare candidate settings without persisting
+# ============================================
+
+# Snapshot shared by the worker processes of one comparison
+_worker_snapshot: Optional[Snapshot] = None
+
+
+def _init_worker(snapshot: Snapshot) -> None:
+    global _worker_snapshot
+    _worker_snapshot = snapshot
+
+
+def plan_summary(snapshot: Snapshot, plan: Plan) -> dict:
+    """Counts of a plan that has not been persisted"""
+    placed = [i for i in range(len(snapshot.exams)) if plan.exam_day[i] >= 0]
+    conflicts: Dict[str, int] = {}
+    for conflict in plan.conflicts:
+        conflicts[conflict[4]] = conflicts.get(conflict[4], 0) + 1
+    return {
+        "exams_scheduled": len(placed),
+        "formations_affected": len({snapshot.exams[i][1] for i in placed}),
+        "days_used": len({plan.exam_day[i] for i in placed}),
+        "total_conflicts": len(plan.conflicts),
+        "conflicts_by_type": conflicts,
+        **plan.stats,
+    }
+
+
+def _dry_run(variant) -> dict:
+    start_date, end_date, time_slots, strategy, optimize_ms = variant
+    plan = build_plan(_worker_snapshot, start_date, end_date, time_slots, strategy=strategy)
+    if optimize_ms:
+        optimize_plan(_worker_snapshot, plan, optimize_ms)
+    return plan_summary(_worker_snapshot, plan)
+
+
+def dry_run_variants(snapshot: Snapshot, variants, max_workers: int) -> List[dict]:
+    """
+    Build one plan per (start_date, end_date, time_slots, strategy, optimize_ms)
+    variant on a process pool and return their summaries in order. The snapshot
+    is sent to each worker once, not once per variant.
+    """
+    with ProcessPoolExecutor(max_workers=max(1, min(max_workers, len(variants))),
+                             initializer=_init_worker, initargs=(snapshot,)) as pool:
+        return list(pool.map(_dry_run, variants))
+
+
+# ============================================
+# PHASE 4: PERSIST
+# ============================================
+
+def persist_plan(conn, snapshot: Snapshot, plan: Plan, annee: str, semester: str, created_by: int,
+                 formation_ids: Optional[List[int]] = None, run_id: Optional[int] = None) -> int:
+    """
+    Replace the year/semester schedule with the plan in one transaction.
+    With formation_ids only those formations' rows are replaced. The plan's
+    conflicts are stored under run_id. Returns the number of rows inserted
+    (timetable rows and counters not included).
+    """
+    inserted = len(plan.conflicts)
+    cursor = conn.cursor()
+    try:
+        # Loading the snapshot left a transaction open (autocommit is off)
+        if conn.in_transaction:
+            conn.commit()
+        conn.start_transaction()
+
+        scope, scope_params = _formation_scope('s.formation_id', formation_ids)
+        exam_scope, exam_scope_params = _formation_scope('formation_id', formation_ids)
+        cursor.execute(f"""
+            DELETE ses FROM schedule_exam_salles ses
+            JOIN schedule_examens se ON se.id = ses.schedule_exam_id
+            JOIN schedules s ON s.id = se.schedule_id
+            WHERE s.annee_universitaire = %s AND s.semester = %s{scope}
+        """, (annee, semester, *scope_params))
+        cursor.execute(f"""
+            DELETE se FROM schedule_examens se
+            JOIN schedules s ON s.id = se.schedule_id
+            WHERE s.annee_universitaire = %s AND s.semester = %s{scope}
+        """, (annee, semester, *scope_params))
+        cursor.execute(f"""
+            DELETE FROM surveillances
+            WHERE examen_id IN (
+                SELECT id FROM examens WHERE annee_universitaire = %s AND semester = %s{exam_scope}
+            )
+        """, (annee, semester, *exam_scope_params))
+        cursor.execute(f"""
+            DELETE s FROM schedules s
+            WHERE s.annee_universitaire = %s AND s.semester = %s{scope}
+        """, (annee, semester, *scope_params))
+        if formation_ids is None:
+            # Every conflict of the period's runs, also those without an exam
+            cursor.execute("""
+                DELETE sc FROM schedule_conflicts sc
+                JOIN generation_runs r ON r.id = sc.run_id
+                WHERE r.annee_universitaire = %s AND r.semester = %s
+            """, (annee, semester))
+        else:
+            cursor.execute(f"""
+                DELETE FROM schedule_conflicts
+                WHERE examen_id IN (
+                    SELECT id FROM examens WHERE annee_universitaire = %s AND semester = %s{exam_scope}
+                )
+            """, (annee, semester, *exam_scope_params))
+            # Findings without an exam (TEACHER_DAILY_IMBALANCE) of earlier
+            # regenerations; this run reports its own
+            cursor.execute("""
+                DELETE sc FROM schedule_conflicts sc
+                JOIN generation_runs r ON r.id = sc.run_id
+                WHERE r.engine = 'python-regenerate'
+                  AND r.annee_universitaire = %s AND r.semester = %s
+                  AND sc.examen_id IS NULL AND r.id <> %s
+            """, (annee, semester, run_id))
+
+        if plan.conflicts:
+            cursor.executemany("""
+                INSERT INTO schedule_conflicts
+                (run_id, examen_id, formation_id, enseignant_id, lieu_id, conflict_type, conflict_reason)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, [(run_id, *conflict) for conflict in plan.conflicts])
+
+        placed = [i for i in range(len(snapshot.exams)) if plan.exam_day[i] >= 0]
+        placed_formations = list(dict.fromkeys(snapshot.exams[i][1] for i in placed))
+        if placed_formations:
+            cursor.executemany("""
+                INSERT INTO schedules (formation_id, annee_universitaire, semester, statut, created_by)
+                VALUES (%s, %s, %s, 'GENERE', %s)
+            """, [(formation_id, annee, semester, created_by) for formation_id in placed_formations])
+
+            cursor.execute(f"""
+                SELECT s.formation_id, s.id FROM schedules s
+                WHERE s.annee_universitaire = %s AND s.semester = %s{scope}
+            """, (annee, semester, *scope_params))
+            schedule_ids = dict(cursor.fetchall())
+
+            cursor.executemany("""
+                INSERT INTO schedule_examens (schedule_id, examen_id, date_exam, heure_debut)
+                VALUES (%s, %s, %s, %s)
+            """, [
+                (
+                    schedule_ids[snapshot.exams[i][1]],
+                    snapshot.exams[i][0],
+                    plan.exam_date(plan.exam_day[i]),
+                    format_time(plan.slots[plan.exam_slot[i]][1]),
+                )
+                for i in placed
+            ])
+
+            cursor.execute(f"""
+                SELECT se.examen_id, se.id FROM schedule_examens se
+                JOIN schedules s ON s.id = se.schedule_id
+                WHERE s.annee_universitaire = %s AND s.semester = %s{scope}
+            """, (annee, semester, *scope_params))
+            schedule_exam_ids = dict(cursor.fetchall())
+
+            rooms = []
+            surveillances = []
+            for s in range(len(plan.sit_exam)):
+                exam_id = snapshot.exams[plan.sit_exam[s]][0]
+                if plan.sit_lieu[s] >= 0:
+                    rooms.append((schedule_exam_ids[exam_id], plan.sit_groupe[s], plan.sit_lieu[s]))
+                if plan.sit_teacher[s] >= 0:
+                    surveillances.append((exam_id, plan.sit_teacher[s], plan.sit_groupe[s]))
+
+            inserted += len(placed_formations) + len(placed) + len(rooms) + len(surveillances)
+            if rooms:
+                cursor.executemany("""
+                    INSERT INTO schedule_exam_salles (schedule_exam_id, groupe_id, lieu_id)
+                    VALUES (%s, %s, %s)
+                """, rooms)
+            if surveillances:
+                cursor.executemany("""
+                    INSERT INTO surveillances (examen_id, enseignant_id, groupe_id)
+                    VALUES (%s, %s, %s)
+                """, surveillances)
+
+        # Materialised timetable, as sp_phase4_persist does: the whole period,
+        # or every requested formation (also those left without placements)
+        for formation_id in (formation_ids if formation_ids is not None else [None]):
+            cursor.callproc("sp_refresh_timetable", (annee, semester, formation_id))
+        # Dashboard counters, in the same transaction
+        cursor.callproc("sp_refresh_period_stats", (annee, semester))
+
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return inserted
+
+
+def summarize(conn, snapshot: Snapshot, plan: Plan, run_id: int) -> dict:
+    """Same columns as the summary row of sp_generate_exam_schedule, for the run's conflicts"""
+    placed = [i for i in range(len(snapshot.exams)) if plan.exam_day[i] >= 0]
+
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("""
+        SELECT
+            COUNT(*) AS total_conflicts,
+            COALESCE(SUM(conflict_type = 'STUDENT_OVERLOAD'), 0) AS student_conflicts,
+            COALESCE(SUM(conflict_type = 'TEACHER_OVERLOAD'), 0) AS teacher_conflicts,
+            COALESCE(SUM(conflict_type = 'ROOM_CAPACITY'), 0) AS room_conflicts
+        FROM schedule_conflicts
+        WHERE run_id = %s
+    """, (run_id,))
+    counts = cursor.fetchone()
+    cursor.close()
+
+    return {
+        "run_id": run_id,
+        "exams_scheduled": len(placed),
+        "formations_affected": len({snapshot.exams[i][1] for i in placed}),
+        "days_used": len({plan.exam_day[i] for i in placed}),
+        "total_conflicts": int(counts["total_conflicts"]),
+        "student_conflicts": int(counts["student_conflicts"]),
+        "teacher_conflicts": int(counts["teacher_conflicts"]),
+        "room_conflicts": int(counts["room_conflicts"]),
+        "rooms_scanned": plan.stats.get('rooms_scanned', 0),
+        "wasted_capacity": plan.stats.get('wasted_capacity', 0),
+        **{key: plan.stats[key] for key in OPTIMIZER_STATS if key in plan.stats},
+    }
+
+
+def generate_schedule(conn, annee: str, semester: str, start_date: date, end_date: date,
+                      time_slots, created_by: int, strategy: str = 'greedy',
+                      optimize_ms: Optional[int] = None,
+                      progress: Optional[Callable[[str, int], None]] = None) -> dict:
+    """
+    In-process equivalent of CALL sp_generate_exam_schedule(...).
+    progress(phase, percent) is called as each phase starts.
+    """
+    progress = progress or _no_progress
+    timings = RunTimings()
+    run_id = start_run(conn, annee, semester, 'python', strategy, created_by, timings)
+    with recording_failure(conn, run_id, timings):
+        progress('loading', 0)
+        with timings.phase('loading') as phase:
+            snapshot = load_snapshot(conn, annee, semester)
+            phase.iterations = len(snapshot.exams)
+        plan = build_plan(snapshot, start_date, end_date, time_slots, strategy=strategy, progress=progress,
+                          timings=timings)
+        if optimize_ms:
+            progress('optimizing', 65)
+            with timings.phase('optimizing', plan) as phase:
+                optimize_plan(snapshot, plan, optimize_ms)
+                phase.iterations = plan.stats['moves_tried']
+        progress('persisting', 80)
+        with timings.phase('persisting') as phase:
+            phase.rows_inserted = persist_plan(conn, snapshot, plan, annee, semester, created_by, run_id=run_id)
+        progress('summarizing', 95)
+        result = summarize(conn, snapshot, plan, run_id)
+        finish_run(conn, run_id, timings, result)
+    result['timings'] = timings.to_dict()
+    return result
+
+
+def resolve_formations(conn, formation_ids=(), department_ids=()) -> List[int]:
+    """Formation ids named directly or through their department, in id order"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, department_id FROM formations ORDER BY id")
+    wanted_formations, wanted_departments = set(formation_ids), set(department_ids)
+    resolved = [
+        formation_id for formation_id, dept_id in cursor.fetchall()
+        if formation_id in wanted_formations or dept_id in wanted_departments
+    ]
+    cursor.close()
+    return resolved
+
+
+def regenerate_schedule(conn, annee: str, semester: str, start_date: date, end_date: date,
+                        time_slots, created_by: int, formation_ids: List[int],
+                        strategy: str = 'greedy',
+                        progress: Optional[Callable[[str, int], None]] = None) -> dict:
+    """
+    Rebuild the schedules of some formations only. Rooms and teachers used by
+    every other schedule in the date range stay as they are and are treated as
+    taken, so approved formations are not reset.
+    """
+    progress = progress or _no_progress
+    timings = RunTimings()
+    run_id = start_run(conn, annee, semester, 'python-regenerate', strategy, created_by, timings)
+    with recording_failure(conn, run_id, timings):
+        progress('loading', 0)
+        with timings.phase('loading') as phase:
+            snapshot = load_snapshot(conn, annee, semester, formation_ids)
+            occupancy = load_occupancy(conn, annee, semester, start_date, end_date, formation_ids)
+            phase.iterations = len(snapshot.exams)
+        plan = build_plan(snapshot, start_date, end_date, time_slots, strategy=strategy,
+                          fixed=occupancy, progress=progress, timings=timings)
+        progress('persisting', 80)
+        with timings.phase('persisting') as phase:
+            phase.rows_inserted = persist_plan(conn, snapshot, plan, annee, semester, created_by,
+                                               formation_ids, run_id)
+        progress('summarizing', 95)
+        result = summarize(conn, snapshot, plan, run_id)
+        finish_run(conn, run_id, timings, result)
+    result['timings'] = timings.to_dict()
+    return result
+
+
+# ============================================
+# GENERATION RUNS
+# ============================================
+
+def start_run(conn, annee: str, semester: str, engine: str, strategy: Optional[str],
+              created_by: Optional[int], timings: RunTimings) -> int:
+    """Create the generation_runs row the run's conflicts will point to; returns its id"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO generation_runs
+            (annee_universitaire, semester, engine, strategy, created_by, started_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (annee, semester, engine, strategy, created_by, timings.started_at))
+        run_id = cursor.lastrowid
+        conn.commit()
+    finally:
+        cursor.close()
+    return run_id
+
+
+def finish_run(conn, run_id: int, timings: RunTimings, result: dict) -> None:
+    """Store the run's totals and phases"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE generation_runs
+            SET finished_at = %s, total_ms = %s, exams_scheduled = %s, total_conflicts = %s
+            WHERE id = %s
+        """, (datetime.now(), round(timings.total_ms(), 3), result['exams_scheduled'],
+              result['total_conflicts'], run_id))
+        _insert_phases(cursor, run_id, timings)
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def fail_run(conn, run_id: int, timings: RunTimings, error: Exception) -> None:
+    """
+    Close a run that raised, with the phases it completed. Best effort: the
+    connection may be what failed, and the original error is what the
+    caller needs to see.
+    """
+    cursor = None
+    try:
+        # Drop whatever the failed phase left uncommitted
+        conn.rollback()
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE generation_runs
+            SET finished_at = %s, total_ms = %s, error = %s
+            WHERE id = %s
+        """, (datetime.now(), round(timings.total_ms(), 3), f"{type(error).__name__}: {error}"[:500], run_id))
+        _insert_phases(cursor, run_id, timings)
+        conn.commit()
+    except Exception:
+        logger.exception("generation_run_failure_not_recorded run_id=%s", run_id)
+    finally:
+        if cursor is not None:
+            cursor.close()
+
+
+@contextmanager
+def recording_failure(conn, run_id: Optional[int], timings: RunTimings):
+    """Mark run_id failed (fail_run) if the block raises, then re-raise"""
+    try:
+        yield
+    except Exception as e:
+        if run_id is not None:
+            fail_run(conn, run_id, timings, e)
+        raise
+
+
+def _insert_phases(cursor, run_id: int, timings: RunTimings) -> None:
+    cursor.executemany("""
+        INSERT INTO generation_run_phases
+        (run_id, seq, phase, wall_ms, iterations, rows_inserted, conflicts_logged)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, [
+        (run_id, seq, timing.phase, round(timing.wall_ms, 3), timing.iterations,
+         timing.rows_inserted, timing.conflicts_logged)
+        for seq, timing in enumerate(timings.phases, start=1)
+    ])
+
+
+def prune_runs(conn, keep: int, max_age_days: int) -> int:
+    """Apply the retention policy (sp_prune_generation_runs); returns the number of runs removed"""
+    cursor = conn.cursor()
+    try:
+        cursor.callproc("sp_prune_generation_runs", (keep, max_age_days))
+        pruned = 0
+        for result in cursor.stored_results():
+            pruned = result.fetchone()[0]
+        conn.commit()
+    finally:
+        cursor.close()
+    return pruned
+
+
+def load_run_timings(conn, run_id: int) -> dict:
+    """RunTimings.to_dict() of a stored run, e.g. one sp_generate_exam_schedule recorded"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT total_ms FROM generation_runs WHERE id = %s", (run_id,))
+        row = cursor.fetchone()
+        cursor.execute("""
+            SELECT phase, wall_ms, iterations, rows_inserted, conflicts_logged
+            FROM generation_run_phases WHERE run_id = %s ORDER BY seq
+        """, (run_id,))
+        phases = cursor.fetchall()
+    finally:
+        cursor.close()
+    return {
+        "totalMs": float(row[0]) if row else 0.0,
+        "phases": [
+            PhaseTiming(phase, float(wall_ms), int(iterations), int(rows), int(conflicts)).to_dict()
+            for phase, wall_ms, iterations, rows, conflicts in phases
+        ],
+    }
@@ -0,0 +1,145 @@
+"""
+Row fetching and JSON encoding for the list endpoints.
+
+Handlers used to fetch dict rows, stringify date/time columns in a loop and
+return the dict for FastAPI's jsonable_encoder to walk again. Here rows come
+from plain tuple cursors, and FastJSONResponse encodes the whole payload in
+one pass: date, time, datetime and timedelta values are written as str()
+would (the format the API has always returned). orjson is used when it is
+installed; it is optional, since requirements.txt avoids packages that may
+need a Rust toolchain.
+"""
+
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from time import perf_counter
+from typing import List, Optional
+
+from fastapi.responses import JSONResponse
+
+from instrumentation import record_serialization
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date, time, timedelta)):
+        return str(value)
+    if isinstance(value, Decimal):
+        # SUM()/AVG() columns; same rule as FastAPI's encoder
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.decode()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(content) -> bytes:
+        return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(content) -> bytes:
+        return json.dumps(
+            content, default=_default, ensure_ascii=False, allow_nan=False, separators=(',', ':')
+        ).encode('utf-8')
+
+
+class FastJSONResponse(JSONResponse):
+    """Return this from a handler to skip jsonable_encoder entirely"""
+
+    def render(self, content) -> bytes:
+        started = perf_counter()
+        body = dumps(content)
+        record_serialization(started)
+        return body
+
+
+# ============================================
+# TUPLE CURSOR HELPERS
+# ============================================
+
+def fetch_rows(cursor) -> List[dict]:
+    """All rows of a tuple cursor as dicts keyed by column name"""
+    names = cursor.column_names
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def fetch_row(cursor) -> Optional[dict]:
+    row = cursor.fetchone()
+    return dict(zip(cursor.column_names, row)) if row is not None else None
+
+
+def proc_rows(cursor) -> List[dict]:
+    """Rows of the last result set of a callproc()"""
+    rows = []
+    for result in cursor.stored_results():
+        rows = fetch_rows(result)
+    return rows
+
+
+def proc_row(cursor) -> Optional[dict]:
+    """First row of the last result set of a callproc()"""
+    row = None
+    for result in cursor.stored_results():
+        row = fetch_row(result)
+    return row
+
+
+# ============================================
+# COLUMNAR ENCODING
+# ============================================
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.exam-scheduler.columnar+json"
+
+
+def wants_columnar(format: Optional[str], accept: Optional[str]) -> bool:
+    """?format=columnar, or the columnar media type in the Accept header"""
+    if format is not None:
+        if format not in ('json', 'columnar'):
+            raise ValueError("format must be 'json' or 'columnar'")
+        return format == 'columnar'
+    return bool(accept) and COLUMNAR_MEDIA_TYPE in accept
+
+
+def to_columnar(rows: List[dict]) -> dict:
+    """
+    Rows as {"columns": [...], "values": [...]}, one array per column.
+    A column whose values repeat (strings, dates, times) is
+    dictionary-encoded as {"dict": [distinct values], "codes": [...]},
+    codes indexing dict row by row; numeric columns stay plain arrays.
+    """
+    if not rows:
+        return {"columns": [], "values": []}
+    columns = list(rows[0])
+    values = []
+    for column in columns:
+        cells = [row[column] for row in rows]
+        values.append(_dictionary_encoded(cells))
+    return {"columns": columns, "values": values}
+
+
+def _dictionary_encoded(cells: list):
+    codes_by_value = {}
+    codes = []
+    for cell in cells:
+        if isinstance(cell, (int, float, Decimal)) and not isinstance(cell, bool):
+            return cells
+        code = codes_by_value.get(cell)
+        if code is None:
+            code = codes_by_value[cell] = len(codes_by_value)
+            # Mostly distinct: the dictionary would only add the codes
+            if len(codes_by_value) * 2 > len(cells):
+                return cells
+        codes.append(code)
+    return {"dict": list(codes_by_value), "codes": codes}
+
+
+class ColumnarResponse(FastJSONResponse):
+    media_type = COLUMNAR_MEDIA_TYPE
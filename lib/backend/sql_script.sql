@@ -330,8 +330,57 @@ CREATE TABLE `schedule_exam_salles` (
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 
+-- ============================================
+-- GENERATION RUNS
+-- One row per generation (either engine) and one per phase of it, kept
+-- across periods so generation times can be compared semester to
+-- semester. Written by sp_generate_exam_schedule and by
+-- scheduler.start_run / finish_run; schedule_conflicts rows belong to
+-- the run that logged them. Old runs are removed by
+-- sp_prune_generation_runs.
+-- ============================================
+
+DROP TABLE IF EXISTS generation_run_phases;
+DROP TABLE IF EXISTS generation_runs;
+
+CREATE TABLE `generation_runs` (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    annee_universitaire VARCHAR(20) NOT NULL,
+    semester ENUM('S1', 'S2') NOT NULL,
+    engine VARCHAR(30) NOT NULL,        -- 'sql', 'python', 'python-regenerate', 'validator'
+    strategy VARCHAR(20) NULL,
+    created_by INT NULL,
+    started_at DATETIME(6) NOT NULL,
+    -- NULL while running, or when the process died mid-run
+    finished_at DATETIME(6) NULL,
+    -- Set when the run raised; its phases are those that completed
+    error VARCHAR(500) NULL,
+    total_ms DECIMAL(12, 3) NOT NULL DEFAULT 0,
+    exams_scheduled INT NOT NULL DEFAULT 0,
+    total_conflicts INT NOT NULL DEFAULT 0,
+
+    INDEX idx_generation_runs_period (annee_universitaire, semester, started_at),
+    INDEX idx_generation_runs_started (started_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE `generation_run_phases` (
+    run_id INT NOT NULL,
+    seq TINYINT NOT NULL,
+    phase VARCHAR(40) NOT NULL,         -- 'clearing', 'time_slots', 'rooms', 'surveillance', ...
+    wall_ms DECIMAL(12, 3) NOT NULL,
+    iterations BIGINT NOT NULL DEFAULT 0,
+    rows_inserted INT NOT NULL DEFAULT 0,
+    conflicts_logged INT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (run_id, seq),
+
+    CONSTRAINT fk_run_phase_run FOREIGN KEY (run_id)
+        REFERENCES generation_runs(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 CREATE TABLE schedule_conflicts (
     id INT AUTO_INCREMENT PRIMARY KEY,
+    run_id INT NULL,             -- NULL only when a phase procedure is called on its own
     examen_id INT NULL,
     formation_id INT NULL,
     enseignant_id INT NULL,
@@ -339,7 +388,12 @@ CREATE TABLE schedule_conflicts (
     conflict_type ENUM(
         'STUDENT_OVERLOAD',
         'TEACHER_OVERLOAD',
-        'ROOM_CAPACITY'
+        'ROOM_CAPACITY',
+        'TEACHER_UNAVAILABLE',
+        'TEACHER_CROSS_DEPT',
+        'TEACHER_DAILY_IMBALANCE',
+        'NO_STUDENTS',
+        'ROOM_OVERLAP'
     ) NOT NULL,
     conflict_reason TEXT NOT NULL,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
@@ -362,7 +416,16 @@ CREATE TABLE schedule_conflicts (
     CONSTRAINT `fk_conflict_lieu`
         FOREIGN KEY (`lieu_id`)
         REFERENCES `lieux_examen`(`id`)
-        ON DELETE SET NULL
+        ON DELETE SET NULL,
+
+    CONSTRAINT `fk_conflict_run`
+        FOREIGN KEY (`run_id`)
+        REFERENCES `generation_runs`(`id`)
+        ON DELETE CASCADE,
+
+    -- Summary and dashboard counts per run and type; partial regeneration by exam
+    INDEX idx_conflict_run_type (run_id, conflict_type),
+    INDEX idx_conflict_examen (examen_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Add this after schedule_conflicts table creation
@@ -393,6 +456,114 @@ CREATE TABLE `schedule_approvals` (
     INDEX idx_approval_schedule (schedule_id, approval_level)
     
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ============================================
+-- MATERIALISED TIMETABLE
+-- One row per (schedule_exam, groupe), already joined, so the exam
+-- listing procedures read a single index range instead of 11 tables.
+-- Rebuilt by sp_refresh_timetable (phase 4 / python engine persist),
+-- statut kept in sync by the approval procedures, rows removed with
+-- their schedule.
+-- ============================================
+
+DROP TABLE IF EXISTS timetable_rows;
+
+CREATE TABLE `timetable_rows` (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    schedule_id INT NOT NULL,
+    schedule_exam_id INT NOT NULL,
+    examen_id INT NOT NULL,
+    annee_universitaire VARCHAR(20) NOT NULL,
+    semester ENUM('S1', 'S2') NOT NULL,
+    statut ENUM('BROUILLON', 'GENERE', 'VALIDE_DEPARTEMENT', 'VALIDE_DOYEN', 'PUBLIE') NOT NULL,
+    formation_id INT NOT NULL,
+    department_id INT NOT NULL,
+    groupe_id INT NULL,          -- NULL when the exam has no room allocation
+    lieu_id INT NULL,
+    enseignant_id INT NULL,
+
+    date_exam DATE NOT NULL,
+    heure_debut TIME NOT NULL,
+    matiere VARCHAR(150) NOT NULL,
+    matiere_code VARCHAR(50) NOT NULL,
+    duree_minutes INT NOT NULL,
+    formation VARCHAR(150) NOT NULL,
+    formation_code VARCHAR(50) NOT NULL,
+    niveau ENUM('L1', 'L2', 'L3', 'M1', 'M2') NOT NULL,
+    department VARCHAR(150) NOT NULL,
+    groupe VARCHAR(50) NULL,
+    salle VARCHAR(50) NULL,
+    salle_capacite INT NULL,
+    surveillant VARCHAR(201) NULL,
+
+    CONSTRAINT fk_timetable_schedule FOREIGN KEY (schedule_id)
+        REFERENCES schedules(id) ON DELETE CASCADE,
+    CONSTRAINT fk_timetable_schedule_exam FOREIGN KEY (schedule_exam_id)
+        REFERENCES schedule_examens(id) ON DELETE CASCADE,
+
+    -- Listing order; the primary key completes the keyset (see pagination.py)
+    INDEX idx_timetable_period (annee_universitaire, semester, statut, date_exam, heure_debut, schedule_exam_id),
+    INDEX idx_timetable_period_all (annee_universitaire, semester, date_exam, heure_debut, schedule_exam_id),
+    INDEX idx_timetable_formation (formation_id, annee_universitaire, semester, statut, date_exam, heure_debut),
+    INDEX idx_timetable_groupe (groupe_id, annee_universitaire, semester, statut),
+    INDEX idx_timetable_teacher (enseignant_id, annee_universitaire, semester, statut, date_exam, heure_debut),
+    INDEX idx_timetable_schedule (schedule_id, department_id),
+    INDEX idx_timetable_schedule_exam (schedule_exam_id, groupe_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- ============================================
+-- DASHBOARD COUNTERS
+-- One row per (period, department) and per (period, department,
+-- conflict type), so the dashboard procedures read O(departments) rows.
+-- Recomputed for a period by sp_refresh_period_stats inside every write
+-- that changes them: phase 4 / python engine persist, clearing
+-- (sp_clear_schedules), validation (validator.store_conflicts) and run
+-- retention (sp_prune_generation_runs).
+-- ============================================
+
+DROP TABLE IF EXISTS period_department_stats;
+
+CREATE TABLE `period_department_stats` (
+    annee_universitaire VARCHAR(20) NOT NULL,
+    semester ENUM('S1', 'S2') NOT NULL,
+    department_id INT NOT NULL,
+    total_exams INT NOT NULL DEFAULT 0,
+    generated_exams INT NOT NULL DEFAULT 0,
+    conflicts INT NOT NULL DEFAULT 0,
+    formations_with_exams INT NOT NULL DEFAULT 0,
+    formations_scheduled INT NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (annee_universitaire, semester, department_id),
+
+    CONSTRAINT fk_period_stats_department FOREIGN KEY (department_id)
+        REFERENCES departements(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+DROP TABLE IF EXISTS period_conflict_stats;
+
+CREATE TABLE `period_conflict_stats` (
+    annee_universitaire VARCHAR(20) NOT NULL,
+    semester ENUM('S1', 'S2') NOT NULL,
+    department_id INT NOT NULL,
+    conflict_type ENUM(
+        'STUDENT_OVERLOAD',
+        'TEACHER_OVERLOAD',
+        'ROOM_CAPACITY',
+        'TEACHER_UNAVAILABLE',
+        'TEACHER_CROSS_DEPT',
+        'TEACHER_DAILY_IMBALANCE',
+        'NO_STUDENTS',
+        'ROOM_OVERLAP'
+    ) NOT NULL,
+    conflicts INT NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (annee_universitaire, semester, department_id, conflict_type),
+
+    CONSTRAINT fk_conflict_stats_department FOREIGN KEY (department_id)
+        REFERENCES departements(id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- ============================================
 -- INSERT DATA
 -- ============================================
@@ -963,7 +1134,10 @@ BEGIN
         date_exam DATE,
         heure_debut TIME,
         heure_fin TIME,
-        slot_label VARCHAR(100)
+        slot_label VARCHAR(100),
+        INDEX idx_form_date (formation_id, date_exam),
+        INDEX idx_date_time (date_exam, heure_debut),
+        INDEX idx_exam (exam_id)
     );
 
     OPEN cur;
@@ -976,6 +1150,8 @@ BEGIN
         SET @exam_placed = FALSE;
 
         date_loop: WHILE v_date <= p_end AND @exam_placed = FALSE DO
+            -- Loop count read by sp_generate_exam_schedule (days tried)
+            SET @gen_iterations = @gen_iterations + 1;
             
             -- CHECK: Does this formation already have an exam today?
             -- (Students from same formation can only have 1 exam per day)
@@ -1014,9 +1190,9 @@ BEGIN
         
         IF @exam_placed = FALSE THEN
             INSERT INTO schedule_conflicts
-            (examen_id, formation_id, conflict_type, conflict_reason)
+            (run_id, examen_id, formation_id, conflict_type, conflict_reason)
             VALUES (
-                v_exam, v_form, 'STUDENT_OVERLOAD',
+                @gen_run_id, v_exam, v_form, 'STUDENT_OVERLOAD',
                 'No dates available in range'
             );
         END IF;
@@ -1072,28 +1248,47 @@ BEGIN
     DECLARE cur CURSOR FOR
         SELECT 
             ts.exam_id,
-            g.id AS groupe_id,
+            gs.groupe_id,
             ts.formation_id,
             f.department_id,
             ts.date_exam,
             ts.heure_debut,
-            (SELECT COUNT(*) FROM etudiants e WHERE e.groupe_id = g.id) AS student_count
+            gs.student_count
         FROM tmp_slots ts
         JOIN formations f ON f.id = ts.formation_id
-        JOIN groupes g ON g.formation_id = ts.formation_id
-        WHERE (SELECT COUNT(*) FROM etudiants e WHERE e.groupe_id = g.id) > 0  -- ✅ SKIP EMPTY GROUPS
-        ORDER BY ts.date_exam, ts.heure_debut, ts.exam_id;
+        JOIN tmp_group_sizes gs ON gs.formation_id = ts.formation_id
+        WHERE gs.student_count > 0  -- ✅ SKIP EMPTY GROUPS
+        ORDER BY ts.date_exam, ts.heure_debut, ts.exam_id, gs.groupe_id;
     
     DECLARE CONTINUE HANDLER FOR NOT FOUND SET done = 1;
     
     DROP TEMPORARY TABLE IF EXISTS tmp_room_alloc;
+    DROP TEMPORARY TABLE IF EXISTS tmp_group_sizes;
+
+    -- Count students once per group instead of twice per cursor row
+    CREATE TEMPORARY TABLE tmp_group_sizes (
+        groupe_id INT PRIMARY KEY,
+        formation_id INT,
+        student_count INT,
+        INDEX idx_formation (formation_id)
+    );
+
+    INSERT INTO tmp_group_sizes (groupe_id, formation_id, student_count)
+    SELECT g.id, g.formation_id, COUNT(e.id)
+    FROM groupes g
+    LEFT JOIN etudiants e ON e.groupe_id = g.id
+    GROUP BY g.id, g.formation_id;
 
+    -- date_exam/heure_debut are copied in so the free-room check below is a
+    -- single index lookup instead of a join back to tmp_slots
     CREATE TEMPORARY TABLE tmp_room_alloc (
         exam_id INT,
         groupe_id INT,
         lieu_id INT,
+        date_exam DATE,
+        heure_debut TIME,
         INDEX idx_exam (exam_id),
-        INDEX idx_room_time (lieu_id, exam_id)
+        INDEX idx_room_time (date_exam, heure_debut, lieu_id)
     );
 
     -- ✅ LOG CONFLICTS FOR FORMATIONS WITH 0 STUDENTS
@@ -1102,8 +1297,9 @@ BEGIN
     CREATE TEMPORARY TABLE tmp_logged_formations (formation_id INT PRIMARY KEY);
     
     -- Insert conflicts (will naturally deduplicate via primary key)
-    INSERT IGNORE INTO schedule_conflicts (examen_id, formation_id, conflict_type, conflict_reason)
+    INSERT IGNORE INTO schedule_conflicts (run_id, examen_id, formation_id, conflict_type, conflict_reason)
     SELECT 
+        @gen_run_id,
         MIN(ts.exam_id),
         f.id,
         'NO_STUDENTS',
@@ -1124,6 +1320,7 @@ BEGIN
     room_loop: LOOP
         FETCH cur INTO v_exam_id, v_groupe_id, v_formation_id, v_dept_id, v_date, v_heure, v_student_count;
         IF done = 1 THEN LEAVE room_loop; END IF;
+        SET @gen_iterations = @gen_iterations + 1;
 
         SET v_room_id = NULL;
 
@@ -1137,12 +1334,11 @@ BEGIN
           AND NOT EXISTS (
               SELECT 1 
               FROM tmp_room_alloc tra
-              JOIN tmp_slots ts2 ON ts2.exam_id = tra.exam_id
-              WHERE tra.lieu_id = l.id
-                AND ts2.date_exam = v_date
-                AND ts2.heure_debut = v_heure
+              WHERE tra.date_exam = v_date
+                AND tra.heure_debut = v_heure
+                AND tra.lieu_id = l.id
           )
-        ORDER BY l.capacite ASC
+        ORDER BY l.capacite ASC, l.id ASC
         LIMIT 1;
 
         -- STRATEGY 2: If no same-dept room, use ANY available room
@@ -1155,22 +1351,22 @@ BEGIN
               AND NOT EXISTS (
                   SELECT 1 
                   FROM tmp_room_alloc tra
-                  JOIN tmp_slots ts2 ON ts2.exam_id = tra.exam_id
-                  WHERE tra.lieu_id = l.id
-                    AND ts2.date_exam = v_date
-                    AND ts2.heure_debut = v_heure
+                  WHERE tra.date_exam = v_date
+                    AND tra.heure_debut = v_heure
+                    AND tra.lieu_id = l.id
               )
-            ORDER BY l.capacite ASC
+            ORDER BY l.capacite ASC, l.id ASC
             LIMIT 1;
         END IF;
 
         -- If found, assign it
         IF v_room_id IS NOT NULL THEN
-            INSERT INTO tmp_room_alloc (exam_id, groupe_id, lieu_id)
-            VALUES (v_exam_id, v_groupe_id, v_room_id);
+            INSERT INTO tmp_room_alloc (exam_id, groupe_id, lieu_id, date_exam, heure_debut)
+            VALUES (v_exam_id, v_groupe_id, v_room_id, v_date, v_heure);
         ELSE
-            INSERT INTO schedule_conflicts (examen_id, formation_id, conflict_type, conflict_reason)
+            INSERT INTO schedule_conflicts (run_id, examen_id, formation_id, conflict_type, conflict_reason)
             VALUES (
+                @gen_run_id,
                 v_exam_id,
                 v_formation_id,
                 'ROOM_CAPACITY',
@@ -1181,6 +1377,7 @@ BEGIN
     END LOOP room_loop;
 
     CLOSE cur;
+    DROP TEMPORARY TABLE IF EXISTS tmp_group_sizes;
 END$$
 
 DELIMITER ;
@@ -1204,7 +1401,6 @@ BEGIN
     DECLARE v_teacher_id INT;
     DECLARE v_teacher_dept INT;
     DECLARE v_current_count INT;
-    DECLARE v_min_workload INT;
     
     DECLARE cur CURSOR FOR
         SELECT 
@@ -1254,14 +1450,10 @@ BEGIN
     assign_loop: LOOP
         FETCH cur INTO v_exam_id, v_form_id, v_date_exam, v_heure_debut, v_dept_id, v_groupe_id;
         IF done = 1 THEN LEAVE assign_loop; END IF;
+        SET @gen_iterations = @gen_iterations + 1;
 
         SET v_teacher_id = NULL;
 
-        -- ✅ FIX #2: Get minimum workload FOR THIS DAY only
-        SELECT MIN(surveillances_today) INTO v_min_workload
-        FROM tmp_teacher_load
-        WHERE date_exam = v_date_exam;
-
         -- ✅ FIX #3: Don't require EXACT minimum, just prefer it
         -- STRATEGY 1: Same department teacher
         SELECT e.id
@@ -1309,9 +1501,9 @@ BEGIN
             -- Log cross-department assignment
             IF v_teacher_id IS NOT NULL AND v_teacher_dept != v_dept_id THEN
                 INSERT INTO schedule_conflicts
-                (examen_id, enseignant_id, conflict_type, conflict_reason)
+                (run_id, examen_id, enseignant_id, conflict_type, conflict_reason)
                 VALUES (
-                    v_exam_id, v_teacher_id, 'TEACHER_CROSS_DEPT',
+                    @gen_run_id, v_exam_id, v_teacher_id, 'TEACHER_CROSS_DEPT',
                     CONCAT('Teacher from dept ', v_teacher_dept, ' helping dept ', v_dept_id)
                 );
             END IF;
@@ -1330,9 +1522,9 @@ BEGIN
         ELSE
             -- CRITICAL: No teacher available
             INSERT INTO schedule_conflicts
-            (examen_id, formation_id, conflict_type, conflict_reason)
+            (run_id, examen_id, formation_id, conflict_type, conflict_reason)
             VALUES (
-                v_exam_id, v_form_id, 'TEACHER_UNAVAILABLE',
+                @gen_run_id, v_exam_id, v_form_id, 'TEACHER_UNAVAILABLE',
                 CONCAT('CRITICAL: No teacher available at ', v_date_exam, ' ', v_heure_debut)
             );
         END IF;
@@ -1342,8 +1534,9 @@ BEGIN
     CLOSE cur;
     
     -- Check daily balance
-    INSERT INTO schedule_conflicts (conflict_type, conflict_reason)
+    INSERT INTO schedule_conflicts (run_id, conflict_type, conflict_reason)
     SELECT 
+        @gen_run_id,
         'TEACHER_DAILY_IMBALANCE',
         CONCAT('Date ', date_exam, ': workload gap ', 
                MIN(surveillances_today), ' to ', MAX(surveillances_today))
@@ -1410,6 +1603,135 @@ DELIMITER ;
 
 -- Step 6: Add foreign key for groupe_id
 
+-- ============================================
+-- REFRESH MATERIALISED TIMETABLE
+-- Rebuilds the timetable_rows of a year/semester, or of one formation
+-- of it when p_formation_id is not NULL. Runs inside the caller's
+-- transaction. To backfill an existing database, call it once per
+-- period with p_formation_id = NULL.
+-- ============================================
+
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS sp_refresh_timetable$$
+
+CREATE PROCEDURE sp_refresh_timetable(
+    IN p_annee VARCHAR(20),
+    IN p_semester ENUM('S1','S2'),
+    IN p_formation_id INT
+)
+BEGIN
+    DELETE FROM timetable_rows
+    WHERE annee_universitaire = p_annee
+      AND semester = p_semester
+      AND (p_formation_id IS NULL OR formation_id = p_formation_id);
+
+    -- (examen_id, groupe_id) is the surveillances key: at most one teacher per row
+    INSERT INTO timetable_rows (
+        schedule_id, schedule_exam_id, examen_id, annee_universitaire, semester, statut,
+        formation_id, department_id, groupe_id, lieu_id, enseignant_id,
+        date_exam, heure_debut, matiere, matiere_code, duree_minutes,
+        formation, formation_code, niveau, department, groupe, salle, salle_capacite, surveillant
+    )
+    SELECT
+        s.id, se.id, e.id, s.annee_universitaire, s.semester, s.statut,
+        f.id, d.id, ses.groupe_id, ses.lieu_id, surv.enseignant_id,
+        se.date_exam, se.heure_debut, m.nom, m.code, e.duree_minutes,
+        f.nom, f.code, f.niveau, d.nom, g.nom, l.nom, l.capacite,
+        CONCAT(ens.nom, ' ', ens.prenom)
+    FROM schedule_examens se
+    JOIN schedules s ON s.id = se.schedule_id
+    JOIN examens e ON e.id = se.examen_id
+    JOIN matieres m ON m.id = e.matiere_id
+    JOIN formations f ON f.id = e.formation_id
+    JOIN departements d ON d.id = f.department_id
+    LEFT JOIN schedule_exam_salles ses ON ses.schedule_exam_id = se.id
+    LEFT JOIN groupes g ON g.id = ses.groupe_id
+    LEFT JOIN lieux_examen l ON l.id = ses.lieu_id
+    LEFT JOIN surveillances surv ON surv.examen_id = e.id AND surv.groupe_id = ses.groupe_id
+    LEFT JOIN enseignants ens ON ens.id = surv.enseignant_id
+    WHERE s.annee_universitaire = p_annee
+      AND s.semester = p_semester
+      AND (p_formation_id IS NULL OR s.formation_id = p_formation_id);
+END$$
+
+DELIMITER ;
+
+-- ============================================
+-- DASHBOARD COUNTERS REFRESH
+-- Recomputes one period's counters with grouped scans (no correlated
+-- subqueries). Callers run it in the transaction of the write that
+-- changed the period; NULLs refresh every period that has exams.
+-- ============================================
+
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS sp_refresh_period_stats$$
+
+CREATE PROCEDURE sp_refresh_period_stats(
+    IN p_annee VARCHAR(20),
+    IN p_semester ENUM('S1','S2')
+)
+BEGIN
+    DELETE FROM period_department_stats
+    WHERE (p_annee IS NULL OR annee_universitaire = p_annee)
+      AND (p_semester IS NULL OR semester = p_semester);
+
+    DELETE FROM period_conflict_stats
+    WHERE (p_annee IS NULL OR annee_universitaire = p_annee)
+      AND (p_semester IS NULL OR semester = p_semester);
+
+    INSERT INTO period_department_stats (
+        annee_universitaire, semester, department_id, total_exams, generated_exams,
+        conflicts, formations_with_exams, formations_scheduled
+    )
+    SELECT
+        e.annee_universitaire,
+        e.semester,
+        f.department_id,
+        COUNT(*),
+        SUM(gen.examen_id IS NOT NULL),
+        COALESCE(SUM(conf.conflicts), 0),
+        COUNT(DISTINCT e.formation_id),
+        COUNT(DISTINCT CASE WHEN sched.formation_id IS NOT NULL THEN e.formation_id END)
+    FROM examens e
+    JOIN formations f ON f.id = e.formation_id
+    LEFT JOIN (
+        SELECT DISTINCT examen_id FROM schedule_examens
+    ) gen ON gen.examen_id = e.id
+    LEFT JOIN (
+        SELECT sc.examen_id, COUNT(*) AS conflicts
+        FROM generation_runs r
+        JOIN schedule_conflicts sc ON sc.run_id = r.id
+        WHERE sc.examen_id IS NOT NULL
+          AND (p_annee IS NULL OR r.annee_universitaire = p_annee)
+          AND (p_semester IS NULL OR r.semester = p_semester)
+        GROUP BY sc.examen_id
+    ) conf ON conf.examen_id = e.id
+    LEFT JOIN (
+        SELECT DISTINCT formation_id, annee_universitaire, semester FROM schedules
+    ) sched ON sched.formation_id = e.formation_id
+           AND sched.annee_universitaire = e.annee_universitaire
+           AND sched.semester = e.semester
+    WHERE (p_annee IS NULL OR e.annee_universitaire = p_annee)
+      AND (p_semester IS NULL OR e.semester = p_semester)
+    GROUP BY e.annee_universitaire, e.semester, f.department_id;
+
+    INSERT INTO period_conflict_stats (
+        annee_universitaire, semester, department_id, conflict_type, conflicts
+    )
+    SELECT r.annee_universitaire, r.semester, f.department_id, sc.conflict_type, COUNT(*)
+    FROM generation_runs r
+    JOIN schedule_conflicts sc ON sc.run_id = r.id
+    JOIN examens e ON e.id = sc.examen_id
+    JOIN formations f ON f.id = e.formation_id
+    WHERE (p_annee IS NULL OR r.annee_universitaire = p_annee)
+      AND (p_semester IS NULL OR r.semester = p_semester)
+    GROUP BY r.annee_universitaire, r.semester, f.department_id, sc.conflict_type;
+END$$
+
+DELIMITER ;
+
 -- ============================================
 -- FIX: Phase 4 to store surveillances per group
 -- ============================================
@@ -1457,6 +1779,9 @@ BEGIN
     SELECT exam_id, enseignant_id, groupe_id
     FROM tmp_surv;
 
+    CALL sp_refresh_timetable(p_annee, p_semester, NULL);
+    CALL sp_refresh_period_stats(p_annee, p_semester);
+
     COMMIT;
 END$$
 
@@ -1492,39 +1817,27 @@ CREATE PROCEDURE sp_get_all_exam_details(
 )
 BEGIN
     SELECT 
-        se.date_exam,
-        se.heure_debut,
-        m.nom AS matiere,
-        m.code AS matiere_code,
-        e.duree_minutes,
-        f.nom AS formation,
-        f.code AS formation_code,
-        f.niveau AS niveau,
-        d.nom AS department,
-        g.nom AS groupe,
-        l.nom AS salle,
-        l.capacite AS salle_capacite,
-        GROUP_CONCAT(CONCAT(ens.nom, ' ', ens.prenom) ORDER BY ens.nom SEPARATOR ', ') AS surveillant,
-        s.id AS schedule_id,
-        se.id AS schedule_exam_id,
-        ses.groupe_id,
-        ses.lieu_id
-    FROM schedule_examens se
-    JOIN schedules s ON s.id = se.schedule_id
-    JOIN examens e ON e.id = se.examen_id
-    JOIN matieres m ON m.id = e.matiere_id
-    JOIN formations f ON f.id = e.formation_id
-    JOIN departements d ON d.id = f.department_id
-    LEFT JOIN schedule_exam_salles ses ON ses.schedule_exam_id = se.id
-    LEFT JOIN groupes g ON g.id = ses.groupe_id
-    LEFT JOIN lieux_examen l ON l.id = ses.lieu_id
-    LEFT JOIN surveillances surv ON surv.examen_id = e.id AND surv.groupe_id = ses.groupe_id
-    LEFT JOIN enseignants ens ON ens.id = surv.enseignant_id
-    WHERE s.annee_universitaire = p_annee
-      AND s.semester = p_semester
-    GROUP BY se.id, se.date_exam, se.heure_debut, m.nom, m.code, e.duree_minutes, 
-             f.nom, f.code, d.nom, g.nom, l.nom, l.capacite, s.id, se.id, ses.groupe_id, ses.lieu_id
-    ORDER BY se.date_exam, se.heure_debut, f.nom, g.nom;
+        date_exam,
+        heure_debut,
+        matiere,
+        matiere_code,
+        duree_minutes,
+        formation,
+        formation_code,
+        niveau,
+        department,
+        groupe,
+        salle,
+        salle_capacite,
+        surveillant,
+        schedule_id,
+        schedule_exam_id,
+        groupe_id,
+        lieu_id
+    FROM timetable_rows
+    WHERE annee_universitaire = p_annee
+      AND semester = p_semester
+    ORDER BY date_exam, heure_debut, formation, groupe;
 END$$
 
 DELIMITER ;
@@ -1544,40 +1857,28 @@ CREATE PROCEDURE sp_get_published_exam_details(
 )
 BEGIN
     SELECT 
-        se.date_exam,
-        se.heure_debut,
-        m.nom AS matiere,
-        m.code AS matiere_code,
-        e.duree_minutes,
-        f.nom AS formation,
-        f.code AS formation_code,
-        f.niveau AS niveau,
-        d.nom AS department,
-        g.nom AS groupe,
-        l.nom AS salle,
-        l.capacite AS salle_capacite,
-        GROUP_CONCAT(CONCAT(ens.nom, ' ', ens.prenom) ORDER BY ens.nom SEPARATOR ', ') AS surveillant,
-        s.id AS schedule_id,
-        se.id AS schedule_exam_id,
-        ses.groupe_id,
-        ses.lieu_id
-    FROM schedule_examens se
-    JOIN schedules s ON s.id = se.schedule_id
-    JOIN examens e ON e.id = se.examen_id
-    JOIN matieres m ON m.id = e.matiere_id
-    JOIN formations f ON f.id = e.formation_id
-    JOIN departements d ON d.id = f.department_id
-    LEFT JOIN schedule_exam_salles ses ON ses.schedule_exam_id = se.id
-    LEFT JOIN groupes g ON g.id = ses.groupe_id
-    LEFT JOIN lieux_examen l ON l.id = ses.lieu_id
-    LEFT JOIN surveillances surv ON surv.examen_id = e.id AND surv.groupe_id = ses.groupe_id
-    LEFT JOIN enseignants ens ON ens.id = surv.enseignant_id
-    WHERE s.annee_universitaire = p_annee
-      AND s.semester = p_semester
-      AND s.statut = 'PUBLIE'  -- ✅ Only show published exams (approved by Doyen)
-    GROUP BY se.id, se.date_exam, se.heure_debut, m.nom, m.code, e.duree_minutes, 
-             f.nom, f.code, d.nom, g.nom, l.nom, l.capacite, s.id, se.id, ses.groupe_id, ses.lieu_id
-    ORDER BY se.date_exam, se.heure_debut, f.nom, g.nom;
+        date_exam,
+        heure_debut,
+        matiere,
+        matiere_code,
+        duree_minutes,
+        formation,
+        formation_code,
+        niveau,
+        department,
+        groupe,
+        salle,
+        salle_capacite,
+        surveillant,
+        schedule_id,
+        schedule_exam_id,
+        groupe_id,
+        lieu_id
+    FROM timetable_rows
+    WHERE annee_universitaire = p_annee
+      AND semester = p_semester
+      AND statut = 'PUBLIE'  -- ✅ Only show published exams (approved by Doyen)
+    ORDER BY date_exam, heure_debut, formation, groupe;
 END$$
 
 DELIMITER ;
@@ -1598,44 +1899,32 @@ CREATE PROCEDURE sp_get_student_exams(
 )
 BEGIN
     SELECT 
-        se.date_exam,
-        se.heure_debut,
-        m.nom AS matiere,
-        m.code AS matiere_code,
-        e.duree_minutes,
-        f.nom AS formation,
-        f.code AS formation_code,
-        f.niveau AS niveau,
-        d.nom AS department,
-        g.nom AS groupe,
-        g.id AS groupe_id,
-        l.nom AS salle,
-        l.capacite AS salle_capacite,
-        GROUP_CONCAT(CONCAT(ens.nom, ' ', ens.prenom) ORDER BY ens.nom SEPARATOR ', ') AS surveillant,
-        s.id AS schedule_id,
-        se.id AS schedule_exam_id,
-        ses.groupe_id AS exam_groupe_id,
-        ses.lieu_id,
-        e.formation_id
-    FROM schedule_examens se
-    JOIN schedules s ON s.id = se.schedule_id
-    JOIN examens e ON e.id = se.examen_id
-    JOIN matieres m ON m.id = e.matiere_id
-    JOIN formations f ON f.id = e.formation_id
-    JOIN departements d ON d.id = f.department_id
-    LEFT JOIN schedule_exam_salles ses ON ses.schedule_exam_id = se.id
-    LEFT JOIN groupes g ON g.id = ses.groupe_id
-    LEFT JOIN lieux_examen l ON l.id = ses.lieu_id
-    LEFT JOIN surveillances surv ON surv.examen_id = e.id AND surv.groupe_id = ses.groupe_id
-    LEFT JOIN enseignants ens ON ens.id = surv.enseignant_id
-    WHERE s.annee_universitaire = p_annee
-      AND s.semester = p_semester
-      AND s.statut = 'PUBLIE'  -- ✅ Only published exams
-      AND e.formation_id = p_formation_id  -- ✅ CRITICAL: Filter by student's formation
+        date_exam,
+        heure_debut,
+        matiere,
+        matiere_code,
+        duree_minutes,
+        formation,
+        formation_code,
+        niveau,
+        department,
+        groupe,
+        groupe_id,
+        salle,
+        salle_capacite,
+        surveillant,
+        schedule_id,
+        schedule_exam_id,
+        groupe_id AS exam_groupe_id,
+        lieu_id,
+        formation_id
+    FROM timetable_rows
+    WHERE formation_id = p_formation_id  -- ✅ CRITICAL: Filter by student's formation
+      AND annee_universitaire = p_annee
+      AND semester = p_semester
+      AND statut = 'PUBLIE'  -- ✅ Only published exams
       -- Note: groupe_id filtering is optional - if NULL, show all exams for the formation
-    GROUP BY se.id, se.date_exam, se.heure_debut, m.nom, m.code, e.duree_minutes, 
-             f.nom, f.code, d.nom, g.nom, g.id, l.nom, l.capacite, s.id, se.id, ses.groupe_id, ses.lieu_id, e.formation_id
-    ORDER BY se.date_exam, se.heure_debut, f.nom, g.nom;
+    ORDER BY date_exam, heure_debut, formation, groupe;
 END$$
 
 DELIMITER ;
@@ -1655,42 +1944,29 @@ CREATE PROCEDURE sp_get_teacher_exams(
 )
 BEGIN
     SELECT 
-        se.date_exam,
-        se.heure_debut,
-        m.nom AS matiere,
-        m.code AS matiere_code,
-        e.duree_minutes,
-        f.nom AS formation,
-        f.code AS formation_code,
-        f.niveau AS niveau,
-        d.nom AS department,
-        g.nom AS groupe,
-        l.nom AS salle,
-        l.capacite AS salle_capacite,
-        CONCAT(ens.nom, ' ', ens.prenom) AS surveillant,
-        s.id AS schedule_id,
-        se.id AS schedule_exam_id,
-        ses.groupe_id,
-        ses.lieu_id
-    FROM schedule_examens se
-    JOIN schedules s ON s.id = se.schedule_id
-    JOIN examens e ON e.id = se.examen_id
-    JOIN matieres m ON m.id = e.matiere_id
-    JOIN formations f ON f.id = e.formation_id
-    JOIN departements d ON d.id = f.department_id
-    LEFT JOIN schedule_exam_salles ses ON ses.schedule_exam_id = se.id
-    LEFT JOIN groupes g ON g.id = ses.groupe_id
-    LEFT JOIN lieux_examen l ON l.id = ses.lieu_id
-    INNER JOIN surveillances surv ON surv.examen_id = e.id AND surv.groupe_id = ses.groupe_id
-    INNER JOIN enseignants ens ON ens.id = surv.enseignant_id
-    WHERE s.annee_universitaire = p_annee
-      AND s.semester = p_semester
-      AND s.statut = 'PUBLIE'  -- ✅ Only published exams
-      AND surv.enseignant_id = p_teacher_id  -- ✅ Filter by teacher's assignments
-    GROUP BY se.id, se.date_exam, se.heure_debut, m.nom, m.code, e.duree_minutes, 
-             f.nom, f.code, d.nom, g.nom, l.nom, l.capacite, s.id, se.id, ses.groupe_id, ses.lieu_id,
-             ens.nom, ens.prenom
-    ORDER BY se.date_exam, se.heure_debut, f.nom, g.nom;
+        date_exam,
+        heure_debut,
+        matiere,
+        matiere_code,
+        duree_minutes,
+        formation,
+        formation_code,
+        niveau,
+        department,
+        groupe,
+        salle,
+        salle_capacite,
+        surveillant,
+        schedule_id,
+        schedule_exam_id,
+        groupe_id,
+        lieu_id
+    FROM timetable_rows
+    WHERE enseignant_id = p_teacher_id  -- ✅ Filter by teacher's assignments
+      AND annee_universitaire = p_annee
+      AND semester = p_semester
+      AND statut = 'PUBLIE'  -- ✅ Only published exams
+    ORDER BY date_exam, heure_debut, formation, groupe;
 END$$
 
 DELIMITER ;
@@ -1717,6 +1993,31 @@ DELIMITER ;
 
 DELIMITER $$
 
+DROP PROCEDURE IF EXISTS sp_record_run_phase$$
+
+-- One generation_run_phases row: wall time since p_started, the loop
+-- iterations the phase counted in @gen_iterations, and the conflicts
+-- the run logged since it had p_conflicts_before
+CREATE PROCEDURE sp_record_run_phase(
+    IN p_run_id INT,
+    IN p_seq INT,
+    IN p_phase VARCHAR(40),
+    IN p_started DATETIME(6),
+    IN p_rows INT,
+    IN p_conflicts_before INT
+)
+BEGIN
+    INSERT INTO generation_run_phases
+        (run_id, seq, phase, wall_ms, iterations, rows_inserted, conflicts_logged)
+    VALUES (
+        p_run_id, p_seq, p_phase,
+        TIMESTAMPDIFF(MICROSECOND, p_started, SYSDATE(6)) / 1000,
+        COALESCE(@gen_iterations, 0),
+        p_rows,
+        (SELECT COUNT(*) FROM schedule_conflicts WHERE run_id = p_run_id) - p_conflicts_before
+    );
+END$$
+
 DROP PROCEDURE IF EXISTS sp_generate_exam_schedule$$
 
 CREATE PROCEDURE sp_generate_exam_schedule(
@@ -1729,6 +2030,28 @@ CREATE PROCEDURE sp_generate_exam_schedule(
 )
 BEGIN
     DECLARE v_schedule_exists INT DEFAULT 0;
+    DECLARE v_run_id INT;
+    DECLARE v_phase_started DATETIME(6);
+    DECLARE v_conflicts INT;
+    DECLARE v_rows INT;
+    
+    -- SYSDATE, not NOW: NOW() is frozen for the whole procedure call
+    INSERT INTO generation_runs (annee_universitaire, semester, engine, created_by, started_at)
+    VALUES (p_annee, p_semester, 'sql', p_creator, SYSDATE(6));
+    SET v_run_id = LAST_INSERT_ID();
+    -- Every conflict the phases log belongs to this run
+    SET @gen_run_id = v_run_id;
+    
+    SET v_phase_started = SYSDATE(6);
+    SET @gen_iterations = 0;
+    SET v_conflicts = 0;
+    
+    -- The period's previous conflicts, including those without an exam
+    -- (TEACHER_DAILY_IMBALANCE), go with the previous runs' results
+    DELETE sc FROM schedule_conflicts sc
+    JOIN generation_runs r ON r.id = sc.run_id
+    WHERE r.annee_universitaire = p_annee
+      AND r.semester = p_semester;
     
     -- ✅ CHECK: Does schedule already exist for this year/semester?
     SELECT COUNT(*) INTO v_schedule_exists
@@ -1755,35 +2078,154 @@ BEGIN
         
         DELETE FROM schedules
         WHERE annee_universitaire = p_annee AND semester = p_semester;
-        
-        DELETE FROM schedule_conflicts
-        WHERE examen_id IN (
-            SELECT id FROM examens 
-            WHERE annee_universitaire = p_annee AND semester = p_semester
-        );
     END IF;
+    CALL sp_record_run_phase(v_run_id, 1, 'clearing', v_phase_started, 0, v_conflicts);
     
     -- Phase 1: Plan time slots
+    SET v_phase_started = SYSDATE(6);
+    SET @gen_iterations = 0;
+    SELECT COUNT(*) INTO v_conflicts FROM schedule_conflicts WHERE run_id = v_run_id;
     CALL sp_phase1_plan_time_slots(p_annee, p_semester, p_start, p_end, p_time_slots);
+    SELECT COUNT(*) INTO v_rows FROM tmp_slots;
+    CALL sp_record_run_phase(v_run_id, 2, 'time_slots', v_phase_started, v_rows, v_conflicts);
     
     -- Phase 2: Allocate rooms
+    SET v_phase_started = SYSDATE(6);
+    SET @gen_iterations = 0;
+    SELECT COUNT(*) INTO v_conflicts FROM schedule_conflicts WHERE run_id = v_run_id;
     CALL sp_phase2_allocate_rooms();
+    SELECT COUNT(*) INTO v_rows FROM tmp_room_alloc;
+    CALL sp_record_run_phase(v_run_id, 3, 'rooms', v_phase_started, v_rows, v_conflicts);
     
     -- Phase 3: Assign surveillance
+    SET v_phase_started = SYSDATE(6);
+    SET @gen_iterations = 0;
+    SELECT COUNT(*) INTO v_conflicts FROM schedule_conflicts WHERE run_id = v_run_id;
     CALL sp_phase3_assign_surveillance(3);
+    SELECT COUNT(*) INTO v_rows FROM tmp_surv;
+    CALL sp_record_run_phase(v_run_id, 4, 'surveillance', v_phase_started, v_rows, v_conflicts);
     
     -- Phase 4: Persist to database
+    SET v_phase_started = SYSDATE(6);
+    SET @gen_iterations = 0;
+    SELECT COUNT(*) INTO v_conflicts FROM schedule_conflicts WHERE run_id = v_run_id;
     CALL sp_phase4_persist(p_annee, p_semester, p_creator);
+    -- schedules, schedule_examens, schedule_exam_salles and surveillances rows
+    SELECT
+        (SELECT COUNT(DISTINCT formation_id) FROM tmp_slots)
+        + (SELECT COUNT(*) FROM tmp_slots)
+        + (SELECT COUNT(*) FROM tmp_room_alloc)
+        + (SELECT COUNT(*) FROM tmp_surv)
+    INTO v_rows;
+    CALL sp_record_run_phase(v_run_id, 5, 'persisting', v_phase_started, v_rows, v_conflicts);
+    
+    UPDATE generation_runs
+    SET finished_at = SYSDATE(6),
+        total_ms = TIMESTAMPDIFF(MICROSECOND, started_at, SYSDATE(6)) / 1000,
+        exams_scheduled = (SELECT COUNT(*) FROM tmp_slots),
+        total_conflicts = (SELECT COUNT(*) FROM schedule_conflicts WHERE run_id = v_run_id)
+    WHERE id = v_run_id;
+    SET @gen_run_id = NULL;
+    -- Phase 4 committed the schedule; this commits the run's timings
+    COMMIT;
     
-    -- Return summary
+    -- Return summary (this run's conflicts: idx_conflict_run_type lookups)
     SELECT 
         (SELECT COUNT(*) FROM tmp_slots) AS exams_scheduled,
         (SELECT COUNT(DISTINCT formation_id) FROM tmp_slots) AS formations_affected,
         (SELECT COUNT(DISTINCT date_exam) FROM tmp_slots) AS days_used,
-        (SELECT COUNT(*) FROM schedule_conflicts) AS total_conflicts,
-        (SELECT COUNT(*) FROM schedule_conflicts WHERE conflict_type = 'STUDENT_OVERLOAD') AS student_conflicts,
-        (SELECT COUNT(*) FROM schedule_conflicts WHERE conflict_type = 'TEACHER_OVERLOAD') AS teacher_conflicts,
-        (SELECT COUNT(*) FROM schedule_conflicts WHERE conflict_type = 'ROOM_CAPACITY') AS room_conflicts;
+        (SELECT COUNT(*) FROM schedule_conflicts WHERE run_id = v_run_id) AS total_conflicts,
+        (SELECT COUNT(*) FROM schedule_conflicts WHERE run_id = v_run_id AND conflict_type = 'STUDENT_OVERLOAD') AS student_conflicts,
+        (SELECT COUNT(*) FROM schedule_conflicts WHERE run_id = v_run_id AND conflict_type = 'TEACHER_OVERLOAD') AS teacher_conflicts,
+        (SELECT COUNT(*) FROM schedule_conflicts WHERE run_id = v_run_id AND conflict_type = 'ROOM_CAPACITY') AS room_conflicts,
+        v_run_id AS run_id;
+END$$
+
+DROP PROCEDURE IF EXISTS sp_prune_generation_runs$$
+
+-- Retention: drops runs (their phases and conflicts cascade) that are
+-- older than p_max_age_days or not among the newest p_keep runs of their
+-- period. Runs from the period's latest full generation on are always
+-- kept, since their conflicts are still current; a period that never had
+-- a full generation (only regenerations or validations) has no such
+-- protected runs, and the limits apply to all of them. The counters of
+-- every period that lost runs are refreshed, as their conflicts went too.
+CREATE PROCEDURE sp_prune_generation_runs(
+    IN p_keep INT,
+    IN p_max_age_days INT
+)
+BEGIN
+    DECLARE v_pruned INT DEFAULT 0;
+    DECLARE v_done INT DEFAULT 0;
+    DECLARE v_annee VARCHAR(20);
+    DECLARE v_semester ENUM('S1','S2');
+    DECLARE cur_periods CURSOR FOR
+        SELECT DISTINCT annee_universitaire, semester FROM tmp_pruned_runs;
+    DECLARE CONTINUE HANDLER FOR NOT FOUND SET v_done = 1;
+
+    DROP TEMPORARY TABLE IF EXISTS tmp_pruned_runs;
+    CREATE TEMPORARY TABLE tmp_pruned_runs AS
+    SELECT id, annee_universitaire, semester FROM (
+        SELECT
+            id,
+            annee_universitaire,
+            semester,
+            started_at,
+            ROW_NUMBER() OVER (
+                PARTITION BY annee_universitaire, semester ORDER BY started_at DESC, id DESC
+            ) AS recency,
+            MAX(CASE WHEN engine IN ('sql', 'python') THEN started_at END) OVER (
+                PARTITION BY annee_universitaire, semester
+            ) AS last_full
+        FROM generation_runs
+    ) ranked
+    WHERE (last_full IS NULL OR started_at < last_full)
+      AND (recency > p_keep OR started_at < NOW() - INTERVAL p_max_age_days DAY);
+
+    DELETE r FROM generation_runs r
+    JOIN tmp_pruned_runs expired ON expired.id = r.id;
+    SET v_pruned = ROW_COUNT();
+
+    OPEN cur_periods;
+    period_loop: LOOP
+        FETCH cur_periods INTO v_annee, v_semester;
+        IF v_done THEN
+            LEAVE period_loop;
+        END IF;
+        CALL sp_refresh_period_stats(v_annee, v_semester);
+    END LOOP;
+    CLOSE cur_periods;
+
+    DROP TEMPORARY TABLE IF EXISTS tmp_pruned_runs;
+
+    SELECT v_pruned AS runs_pruned;
+END$$
+
+DROP PROCEDURE IF EXISTS sp_get_schedule_conflicts$$
+
+-- Conflicts of a period, newest first, read through its runs
+CREATE PROCEDURE sp_get_schedule_conflicts(
+    IN p_annee VARCHAR(20),
+    IN p_semester ENUM('S1','S2')
+)
+BEGIN
+    SELECT
+        sc.*,
+        e.formation_id,
+        m.nom AS matiere_nom,
+        f.nom AS formation_nom,
+        ens.nom AS enseignant_nom,
+        l.nom AS lieu_nom
+    FROM generation_runs r
+    JOIN schedule_conflicts sc ON sc.run_id = r.id
+    LEFT JOIN examens e ON e.id = sc.examen_id
+    LEFT JOIN matieres m ON m.id = e.matiere_id
+    LEFT JOIN formations f ON f.id = COALESCE(e.formation_id, sc.formation_id)
+    LEFT JOIN enseignants ens ON ens.id = sc.enseignant_id
+    LEFT JOIN lieux_examen l ON l.id = sc.lieu_id
+    WHERE r.annee_universitaire = p_annee
+      AND r.semester = p_semester
+    ORDER BY sc.created_at DESC, sc.id DESC;
 END$$
 
 DELIMITER ;
@@ -1802,65 +2244,28 @@ CREATE PROCEDURE sp_get_dashboard_stats(
     IN p_semester ENUM('S1','S2')
 )
 BEGIN
-    -- Get overall statistics
-    SELECT 
-        -- Total exams
-        (SELECT COUNT(*) 
-         FROM examens 
-         WHERE annee_universitaire = p_annee AND semester = p_semester) as total_exams_target,
-        
-        -- Exams with schedules (generated)
-        (SELECT COUNT(DISTINCT se.examen_id)
-         FROM schedule_examens se
-         JOIN schedules s ON s.id = se.schedule_id
-         WHERE s.annee_universitaire = p_annee AND s.semester = p_semester) as total_exams_generated,
-        
-        -- Total conflicts
-        (SELECT COUNT(*) 
-         FROM schedule_conflicts sc
-         WHERE sc.examen_id IN (
-             SELECT id FROM examens WHERE annee_universitaire = p_annee AND semester = p_semester
-         )) as total_conflicts,
-        
-        -- Critical conflicts (no room, no teacher)
-        (SELECT COUNT(*) 
-         FROM schedule_conflicts sc
-         WHERE sc.conflict_type IN ('ROOM_CAPACITY', 'TEACHER_UNAVAILABLE')
-         AND sc.examen_id IN (
-             SELECT id FROM examens WHERE annee_universitaire = p_annee AND semester = p_semester
-         )) as critical_conflicts,
-        
-        -- Medium conflicts (cross-dept, imbalance)
-        (SELECT COUNT(*) 
-         FROM schedule_conflicts sc
-         WHERE sc.conflict_type IN ('TEACHER_CROSS_DEPT', 'TEACHER_DAILY_IMBALANCE')
-         AND sc.examen_id IN (
-             SELECT id FROM examens WHERE annee_universitaire = p_annee AND semester = p_semester
-         )) as medium_conflicts,
-        
-        -- Low conflicts (empty groups)
-        (SELECT COUNT(*) 
-         FROM schedule_conflicts sc
-         WHERE sc.conflict_type = 'NO_STUDENTS'
-         AND sc.examen_id IN (
-             SELECT id FROM examens WHERE annee_universitaire = p_annee AND semester = p_semester
-         )) as low_conflicts,
-        
-        -- Pending actions (formations without complete schedules)
-        (SELECT COUNT(DISTINCT f.id)
-         FROM formations f
-         WHERE EXISTS (
-             SELECT 1 FROM examens e 
-             WHERE e.formation_id = f.id 
-             AND e.annee_universitaire = p_annee 
-             AND e.semester = p_semester
-         )
-         AND NOT EXISTS (
-             SELECT 1 FROM schedules s 
-             WHERE s.formation_id = f.id 
-             AND s.annee_universitaire = p_annee 
-             AND s.semester = p_semester
-         )) as pending_formations;
+    -- Sums of the period's per-department counters
+    -- (kept by sp_refresh_period_stats)
+    SELECT
+        COALESCE(SUM(ds.total_exams), 0) as total_exams_target,
+        COALESCE(SUM(ds.generated_exams), 0) as total_exams_generated,
+        COALESCE(SUM(ds.conflicts), 0) as total_conflicts,
+        COALESCE((SELECT SUM(cs.conflicts)
+         FROM period_conflict_stats cs
+         WHERE cs.annee_universitaire = p_annee AND cs.semester = p_semester
+           AND cs.conflict_type IN ('ROOM_CAPACITY', 'TEACHER_UNAVAILABLE')), 0) as critical_conflicts,
+        COALESCE((SELECT SUM(cs.conflicts)
+         FROM period_conflict_stats cs
+         WHERE cs.annee_universitaire = p_annee AND cs.semester = p_semester
+           AND cs.conflict_type IN ('TEACHER_CROSS_DEPT', 'TEACHER_DAILY_IMBALANCE')), 0) as medium_conflicts,
+        COALESCE((SELECT SUM(cs.conflicts)
+         FROM period_conflict_stats cs
+         WHERE cs.annee_universitaire = p_annee AND cs.semester = p_semester
+           AND cs.conflict_type = 'NO_STUDENTS'), 0) as low_conflicts,
+        -- Formations with exams but no schedule yet
+        COALESCE(SUM(ds.formations_with_exams - ds.formations_scheduled), 0) as pending_formations
+    FROM period_department_stats ds
+    WHERE ds.annee_universitaire = p_annee AND ds.semester = p_semester;
 END$$
 
 DELIMITER ;
@@ -1882,49 +2287,28 @@ BEGIN
     SELECT 
         d.id as department_id,
         d.nom as department_name,
-        
-        -- Total exams for this department
-        COUNT(DISTINCT e.id) as total_exams,
-        
-        -- Generated exams (with schedules)
-        COUNT(DISTINCT CASE 
-            WHEN se.id IS NOT NULL THEN e.id 
-        END) as generated_exams,
-        
-        -- Conflicts for this department
-        COUNT(DISTINCT CASE 
-            WHEN sc.id IS NOT NULL THEN sc.id 
-        END) as conflicts,
+        ds.total_exams,
+        ds.generated_exams,
+        ds.conflicts,
         
         -- Status
         CASE 
-            WHEN COUNT(DISTINCT e.id) = 0 THEN 'No Exams'
-            WHEN COUNT(DISTINCT se.id) = COUNT(DISTINCT e.id) AND COUNT(DISTINCT sc.id) = 0 
+            WHEN ds.total_exams = 0 THEN 'No Exams'
+            WHEN ds.generated_exams = ds.total_exams AND ds.conflicts = 0 
                 THEN 'Completed'
-            WHEN COUNT(DISTINCT se.id) > 0 
+            WHEN ds.generated_exams > 0 
                 THEN 'In Progress'
             ELSE 'Pending'
         END as status,
         
         -- Completion percentage
-        ROUND(
-            (COUNT(DISTINCT CASE WHEN se.id IS NOT NULL THEN e.id END) * 100.0) / 
-            NULLIF(COUNT(DISTINCT e.id), 0),
-            1
-        ) as completion_percentage
+        ROUND(ds.generated_exams * 100.0 / NULLIF(ds.total_exams, 0), 1) as completion_percentage
         
-    FROM departements d
-    LEFT JOIN formations f ON f.department_id = d.id
-    LEFT JOIN examens e ON e.formation_id = f.id 
-        AND e.annee_universitaire = p_annee 
-        AND e.semester = p_semester
-    LEFT JOIN schedule_examens se ON se.examen_id = e.id
-    LEFT JOIN schedules s ON s.id = se.schedule_id 
-        AND s.annee_universitaire = p_annee 
-        AND s.semester = p_semester
-    LEFT JOIN schedule_conflicts sc ON sc.examen_id = e.id
-    GROUP BY d.id, d.nom
-    HAVING total_exams > 0
+    FROM period_department_stats ds
+    JOIN departements d ON d.id = ds.department_id
+    WHERE ds.annee_universitaire = p_annee
+      AND ds.semester = p_semester
+      AND ds.total_exams > 0
     ORDER BY d.nom;
 END$$
 
@@ -1945,22 +2329,19 @@ CREATE PROCEDURE sp_get_conflicts_by_type(
 )
 BEGIN
     SELECT 
-        CASE sc.conflict_type
+        CASE cs.conflict_type
             WHEN 'STUDENT_OVERLOAD' THEN 'Student Overload'
             WHEN 'TEACHER_UNAVAILABLE' THEN 'Teacher Unavailable'
             WHEN 'TEACHER_CROSS_DEPT' THEN 'Cross-Department Teacher'
             WHEN 'ROOM_CAPACITY' THEN 'Room Capacity'
             WHEN 'NO_STUDENTS' THEN 'No Students'
             WHEN 'TEACHER_DAILY_IMBALANCE' THEN 'Teacher Imbalance'
-            ELSE sc.conflict_type
+            ELSE cs.conflict_type
         END as conflict_name,
-        COUNT(*) as count
-    FROM schedule_conflicts sc
-    WHERE sc.examen_id IN (
-        SELECT id FROM examens 
-        WHERE annee_universitaire = p_annee AND semester = p_semester
-    )
-    GROUP BY sc.conflict_type
+        SUM(cs.conflicts) as count
+    FROM period_conflict_stats cs
+    WHERE cs.annee_universitaire = p_annee AND cs.semester = p_semester
+    GROUP BY cs.conflict_type
     ORDER BY count DESC;
 END$$
 
@@ -2012,11 +2393,12 @@ BEGIN
                 THEN 'red'
             ELSE 'orange'
         END as color
-    FROM schedule_conflicts sc
+    FROM generation_runs r
+    JOIN schedule_conflicts sc ON sc.run_id = r.id
     JOIN examens e ON e.id = sc.examen_id
     JOIN formations f ON f.id = e.formation_id
     JOIN departements d ON d.id = f.department_id
-    WHERE e.annee_universitaire = p_annee AND e.semester = p_semester
+    WHERE r.annee_universitaire = p_annee AND r.semester = p_semester
     ORDER BY sc.created_at DESC
     LIMIT p_limit)
     
@@ -2097,42 +2479,29 @@ BEGIN
     -- This ensures we only get exams for formations in this department
     
     SELECT 
-        se.id AS schedule_exam_id,
-        se.date_exam,
-        se.heure_debut,
-        m.nom AS matiere,
-        m.code AS matiere_code,
-        e.duree_minutes,
-        f.nom AS formation,
-        f.code AS formation_code,
-        f.niveau AS niveau,
-        d.nom AS department,
-        d.id AS department_id,
-        g.nom AS groupe,
-        l.nom AS salle,
-        l.capacite AS salle_capacite,
-        GROUP_CONCAT(DISTINCT CONCAT(ens.nom, ' ', ens.prenom) ORDER BY ens.nom SEPARATOR ', ') AS surveillant,
-        s.id AS schedule_id,
-        ses.groupe_id,
-        ses.lieu_id,
-        (SELECT COUNT(*) FROM etudiants et WHERE et.groupe_id = g.id) AS student_count
-    FROM schedule_examens se
-    JOIN schedules s ON s.id = se.schedule_id
-    JOIN examens e ON e.id = se.examen_id
-    JOIN matieres m ON m.id = e.matiere_id
-    JOIN formations f ON f.id = e.formation_id
-    JOIN departements d ON d.id = f.department_id
-    LEFT JOIN schedule_exam_salles ses ON ses.schedule_exam_id = se.id
-    LEFT JOIN groupes g ON g.id = ses.groupe_id
-    LEFT JOIN lieux_examen l ON l.id = ses.lieu_id
-    LEFT JOIN surveillances surv ON surv.examen_id = e.id AND surv.groupe_id = ses.groupe_id
-    LEFT JOIN enseignants ens ON ens.id = surv.enseignant_id
-    WHERE s.id = p_schedule_id
-      AND f.department_id = p_department_id  -- ✅✅✅ CRITICAL FILTER: Only this department's formations
-    GROUP BY se.id, se.date_exam, se.heure_debut, m.nom, m.code, e.duree_minutes, 
-             f.nom, f.code, f.niveau, d.nom, d.id, g.nom, l.nom, l.capacite, 
-             s.id, ses.groupe_id, ses.lieu_id
-    ORDER BY se.date_exam, se.heure_debut, f.nom, g.nom;
+        tr.schedule_exam_id,
+        tr.date_exam,
+        tr.heure_debut,
+        tr.matiere,
+        tr.matiere_code,
+        tr.duree_minutes,
+        tr.formation,
+        tr.formation_code,
+        tr.niveau,
+        tr.department,
+        tr.department_id,
+        tr.groupe,
+        tr.salle,
+        tr.salle_capacite,
+        tr.surveillant,
+        tr.schedule_id,
+        tr.groupe_id,
+        tr.lieu_id,
+        (SELECT COUNT(*) FROM etudiants et WHERE et.groupe_id = tr.groupe_id) AS student_count
+    FROM timetable_rows tr
+    WHERE tr.schedule_id = p_schedule_id
+      AND tr.department_id = p_department_id  -- ✅✅✅ CRITICAL FILTER: Only this department's formations
+    ORDER BY tr.date_exam, tr.heure_debut, tr.formation, tr.groupe;
 END$$
 
 DELIMITER ;
@@ -2214,13 +2583,24 @@ CREATE PROCEDURE sp_clear_schedules(
     IN p_semester ENUM('S1','S2')
 )
 BEGIN
+    DELETE FROM timetable_rows
+    WHERE annee_universitaire = p_annee
+      AND semester = p_semester;
+    
     -- This will cascade delete schedule_examens and schedule_exam_salles
     DELETE FROM schedules
     WHERE annee_universitaire = p_annee
       AND semester = p_semester;
       
-    -- Clear conflicts
-    DELETE FROM schedule_conflicts;
+    -- Conflicts of the period's runs, and those logged outside any run
+    -- (phase procedures called on their own), which have no period
+    DELETE sc FROM schedule_conflicts sc
+    JOIN generation_runs r ON r.id = sc.run_id
+    WHERE r.annee_universitaire = p_annee
+      AND r.semester = p_semester;
+    DELETE FROM schedule_conflicts WHERE run_id IS NULL;
+    
+    CALL sp_refresh_period_stats(p_annee, p_semester);
     
     SELECT 'Schedules cleared successfully' AS message;
 END$$
@@ -2416,6 +2796,10 @@ BEGIN
                 SET statut = 'VALIDE_DEPARTEMENT'
                 WHERE id = p_schedule_id;
                 
+                UPDATE timetable_rows
+                SET statut = 'VALIDE_DEPARTEMENT'
+                WHERE schedule_id = p_schedule_id;
+                
                 INSERT INTO schedule_approvals 
                 (schedule_id, approval_level, approver_id, action, comment)
                 VALUES 
@@ -2430,6 +2814,10 @@ BEGIN
                 SET statut = 'BROUILLON'
                 WHERE id = p_schedule_id;
                 
+                UPDATE timetable_rows
+                SET statut = 'BROUILLON'
+                WHERE schedule_id = p_schedule_id;
+                
                 INSERT INTO schedule_approvals 
                 (schedule_id, approval_level, approver_id, action, comment)
                 VALUES 
@@ -2500,6 +2888,10 @@ BEGIN
                 SET statut = 'PUBLIE'
                 WHERE id = p_schedule_id;
                 
+                UPDATE timetable_rows
+                SET statut = 'PUBLIE'
+                WHERE schedule_id = p_schedule_id;
+                
                 INSERT INTO schedule_approvals 
                 (schedule_id, approval_level, approver_id, action, comment)
                 VALUES 
@@ -2514,6 +2906,10 @@ BEGIN
                 SET statut = 'GENERE'
                 WHERE id = p_schedule_id;
                 
+                UPDATE timetable_rows
+                SET statut = 'GENERE'
+                WHERE schedule_id = p_schedule_id;
+                
                 INSERT INTO schedule_approvals 
                 (schedule_id, approval_level, approver_id, action, comment)
                 VALUES 
@@ -2628,6 +3024,9 @@ END$$
 
 DELIMITER ;
 
+-- Dashboard counters for the exams inserted above
+CALL sp_refresh_period_stats(NULL, NULL);
+
 -- ============================================
 -- VERIFICATION
 -- ============================================
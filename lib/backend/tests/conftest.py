@@ -0,0 +1,132 @@
+"""
+Shared fixtures. The backend modules use flat imports (import scheduler),
+so the tests run with lib/backend on sys.path:
+
+    cd lib/backend && python -m pytest -q tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeCursor:
+    """
+    Tuple cursor answering a statement with the connection's answer for
+    the first fragment it contains, else with the next scripted result:
+    a (column_names, rows) pair, or None for statements without rows
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.column_names = ()
+        self._rows = []
+        self.lastrowid = None
+
+    def execute(self, operation, params=()):
+        self.conn.statements.append((" ".join(operation.split()), params))
+        # autocommit is off, so any statement opens a transaction
+        self.conn.in_transaction = True
+        result = self.conn.answer(operation)
+        if result is not None:
+            self.column_names, self._rows = result
+        else:
+            self.column_names, self._rows = (), []
+        self.conn.last_insert_id += 1
+        self.lastrowid = self.conn.last_insert_id
+
+    def executemany(self, operation, seq_params):
+        self.conn.statements.append((" ".join(operation.split()), list(seq_params)))
+
+    def callproc(self, procname, args=()):
+        self.conn.statements.append((procname, tuple(args)))
+        self._procedure = procname
+
+    def stored_results(self):
+        rows = self.conn.procedures.get(getattr(self, "_procedure", None))
+        return iter([FakeResult(rows)] if rows is not None else [])
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+    def close(self):
+        pass
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = list(rows)
+
+    def fetchall(self):
+        rows, self._rows = self._rows, []
+        return rows
+
+    def fetchone(self):
+        return self._rows.pop(0) if self._rows else None
+
+
+class FakeConnection:
+    """Records statements and transaction calls; results are consumed in order"""
+
+    def __init__(self, results=None, answers=None, procedures=None):
+        self.results = list(results or [])
+        self.answers = dict(answers or {})
+        # procedure name -> rows of its last result set
+        self.procedures = dict(procedures or {})
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.in_transaction = False
+        self.last_insert_id = 0
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self)
+
+    def answer(self, operation):
+        for fragment, result in self.answers.items():
+            if fragment in operation:
+                return result
+        return self.results.pop(0) if self.results else None
+
+    def calls(self, name):
+        """Arguments of every statement or procedure call starting with name"""
+        return [params for statement, params in self.statements if statement.startswith(name)]
+
+    def start_transaction(self):
+        if self.in_transaction:
+            # mysql.connector refuses to nest transactions
+            raise RuntimeError("Transaction already in progress")
+        self.in_transaction = True
+
+    def commit(self):
+        self.commits += 1
+        self.in_transaction = False
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+
+class FakePool:
+    """Stands in for app.db_pool, lending the same connection to every request"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def acquire(self):
+        return self.conn
+
+    def release(self, connection):
+        pass
+
+
+@pytest.fixture
+def fake_conn():
+    return FakeConnection()
@@ -0,0 +1,79 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+import app as backend
+import scheduler
+from conftest import FakeConnection, FakePool
+from jobs import JobManager
+
+
+def generate_request(**overrides):
+    return {
+        "annee_universitaire": "2024-2025",
+        "semester": "S1",
+        "start_date": "2025-01-12",
+        "end_date": "2025-02-02",
+        "time_slots": [{"label": "Matin", "start": "08:30", "end": "10:30"}],
+        "created_by": 1,
+        **overrides,
+    }
+
+
+def test_compare_runs_python_only_variants_without_engine(monkeypatch):
+    monkeypatch.setattr(backend, "db_pool", FakePool(FakeConnection()))
+    snapshot = scheduler.Snapshot(exams=[], formations={}, groups={}, rooms=[], teachers=[])
+    monkeypatch.setattr(scheduler, "load_snapshot", lambda conn, annee, semester: snapshot)
+    seen = []
+
+    def dry_run_variants(snapshot, variants, workers):
+        seen.extend(variants)
+        return [{"exams_scheduled": 0, "formations_affected": 0, "days_used": 0,
+                 "total_conflicts": 0, "conflicts_by_type": {}} for _ in variants]
+
+    monkeypatch.setattr(scheduler, "dry_run_variants", dry_run_variants)
+
+    response = TestClient(backend.app).post("/api/generate-schedule/compare", json={"variants": [
+        generate_request(strategy="dsatur"),
+        generate_request(optimize_ms=500),
+    ]})
+
+    assert response.status_code == 200, response.text
+    assert [(strategy, optimize_ms) for *_, strategy, optimize_ms in seen] == [("dsatur", None), ("greedy", 500)]
+
+
+def test_clear_schedules_commits_the_cleared_period(monkeypatch):
+    conn = FakeConnection(procedures={"sp_clear_schedules": [{"message": "Schedules cleared successfully"}]})
+    monkeypatch.setattr(backend, "db_pool", FakePool(conn))
+
+    response = TestClient(backend.app).post("/api/clear-schedules", json={
+        "annee_universitaire": "2024-2025", "semester": "S1",
+    })
+
+    assert response.status_code == 200, response.text
+    assert conn.calls("sp_clear_schedules") == [("2024-2025", "S1")]
+    # The counters refresh inside the procedure only lands with the commit
+    assert conn.commits == 1
+
+
+def test_sync_generation_shares_the_period_slot_with_jobs(monkeypatch):
+    jobs = JobManager(max_workers=1)
+    monkeypatch.setattr(backend, "generation_jobs", jobs)
+    monkeypatch.setattr(backend, "run_generation",
+                        lambda request, start_date, end_date, progress=None: {"runId": 7})
+    client = TestClient(backend.app)
+    release = threading.Event()
+    queued = jobs.submit(("2024-2025", "S1"), lambda progress: release.wait(5))
+
+    response = client.post("/api/generate-schedule", json=generate_request())
+    assert response.status_code == 409, response.text
+    assert queued.id in response.json()["detail"]
+
+    release.set()
+    while jobs.get(queued.id).status != 'DONE':
+        release.wait(0.01)
+    # Another period was never blocked, and the slot is free again once the job ends
+    assert client.post("/api/generate-schedule", json=generate_request(semester="S2")).status_code == 200
+    response = client.post("/api/generate-schedule", json=generate_request())
+    assert response.status_code == 200, response.text
+    assert response.json()["result"]["runId"] == 7
@@ -0,0 +1,50 @@
+from datetime import date
+
+import app as backend
+import metrics
+import scheduler
+from conftest import FakeConnection, FakePool
+
+
+def phase_series(annee):
+    return {
+        labels: counts for labels, (counts, _total) in metrics.generator_phases._series.items()
+        if labels[2] == annee
+    }
+
+
+def test_phase_timer_records_stored_phases():
+    timer = metrics.PhaseTimer('sql', '1999-2000', 'S1')
+
+    timer.record({"totalMs": 1500.0, "phases": [
+        {"phase": "time_slots", "wallMs": 1200.0},
+        {"phase": "rooms", "wallMs": 300.0},
+    ]})
+
+    series = phase_series('1999-2000')
+    assert set(series) == {('time_slots', 'sql', '1999-2000', 'S1'), ('rooms', 'sql', '1999-2000', 'S1')}
+    assert metrics.generator_phases._series[('time_slots', 'sql', '1999-2000', 'S1')][1] == [1.2]
+
+
+def test_sql_generation_observes_each_procedure_phase(monkeypatch):
+    conn = FakeConnection(procedures={
+        "sp_generate_exam_schedule": [{"run_id": 4, "exams_scheduled": 10, "total_conflicts": 0}],
+    })
+    monkeypatch.setattr(backend, "db_pool", FakePool(conn))
+    monkeypatch.setattr(scheduler, "prune_runs", lambda conn, keep, max_age_days: 0)
+    monkeypatch.setattr(scheduler, "load_run_timings", lambda conn, run_id: {"totalMs": 60.0, "phases": [
+        {"phase": phase, "wallMs": 10.0, "iterations": 0, "rowsInserted": 0, "conflictsLogged": 0}
+        for phase in ("clearing", "time_slots", "rooms", "surveillance", "persisting")
+    ]})
+    request = backend.GenerateScheduleRequest(
+        annee_universitaire="1998-1999", semester="S1", start_date="2025-01-12", end_date="2025-02-02",
+        time_slots=[{"label": "Matin", "start": "08:30", "end": "10:30"}], created_by=1,
+    )
+    progress = []
+
+    backend.run_generation(request, date(2025, 1, 12), date(2025, 2, 2), progress=lambda phase, percent: progress.append(phase))
+
+    assert progress == ['sp_generate_exam_schedule']
+    assert sorted(phase for phase, *_ in phase_series('1998-1999')) == [
+        'clearing', 'persisting', 'rooms', 'surveillance', 'time_slots'
+    ]
@@ -0,0 +1,473 @@
+from datetime import date
+
+import scheduler
+from conftest import FakeConnection
+
+
+ANNEE, SEMESTER = "2024-2025", "S1"
+TIME_SLOTS = [("Matin", "08:30", "10:30"), ("Midi", "11:00", "13:00")]
+
+
+def snapshot():
+    return scheduler.Snapshot(
+        exams=[(100, 1, 90), (101, 1, 90)],
+        formations={1: ("Formation 1", 1)},
+        groups={1: [(11, 25)]},
+        rooms=[(5, 40, 1)],
+        teachers=[(7, 1), (8, 1)],
+    )
+
+
+def persist_conn():
+    return FakeConnection(answers={
+        "SELECT s.formation_id, s.id": (("formation_id", "id"), [(1, 10)]),
+        "SELECT se.examen_id, se.id": (("examen_id", "id"), [(100, 1000), (101, 1001)]),
+    })
+
+
+def build(snap):
+    return scheduler.build_plan(snap, date(2025, 1, 12), date(2025, 1, 26), TIME_SLOTS)
+
+
+def test_full_persist_refreshes_the_period_timetable_once():
+    snap = snapshot()
+    conn = persist_conn()
+
+    scheduler.persist_plan(conn, snap, build(snap), ANNEE, SEMESTER, 1, run_id=3)
+
+    assert conn.calls("sp_refresh_timetable") == [(ANNEE, SEMESTER, None)]
+    assert conn.commits == 1
+
+
+def test_partial_persist_refreshes_every_requested_formation():
+    snap = snapshot()
+    conn = persist_conn()
+
+    # Formation 2 has nothing left to place, but its old rows were deleted
+    scheduler.persist_plan(conn, snap, build(snap), ANNEE, SEMESTER, 1, formation_ids=[1, 2], run_id=3)
+
+    assert conn.calls("sp_refresh_timetable") == [(ANNEE, SEMESTER, 1), (ANNEE, SEMESTER, 2)]
+    schedules = conn.calls("INSERT INTO schedules")
+    assert schedules == [[(1, ANNEE, SEMESTER, 1)]]
+
+
+def test_partial_persist_replaces_earlier_regeneration_findings_without_exam():
+    snap = snapshot()
+    conn = persist_conn()
+
+    scheduler.persist_plan(conn, snap, build(snap), ANNEE, SEMESTER, 1, formation_ids=[1], run_id=3)
+
+    deletes = [(statement, params) for statement, params in conn.statements
+               if statement.startswith("DELETE sc FROM schedule_conflicts")]
+    assert len(deletes) == 1
+    statement, params = deletes[0]
+    assert "sc.examen_id IS NULL" in statement and "'python-regenerate'" in statement
+    assert params == (ANNEE, SEMESTER, 3)
+
+
+def test_persist_after_reads_on_the_same_connection():
+    snap = snapshot()
+    conn = persist_conn()
+    conn.cursor().execute("SELECT id, formation_id, duree_minutes FROM examens")
+
+    scheduler.persist_plan(conn, snap, build(snap), ANNEE, SEMESTER, 1, run_id=3)
+
+    assert conn.calls("sp_refresh_period_stats") == [(ANNEE, SEMESTER)]
+    assert not conn.in_transaction
+
+
+def test_run_timings_records_phases_in_order():
+    timings = scheduler.RunTimings()
+    plan = scheduler.Plan(start_date=date(2025, 1, 12), day_count=1, slots=[])
+
+    with timings.phase('loading') as phase:
+        phase.iterations = 4
+    with timings.phase('rooms', plan) as phase:
+        plan.conflicts.append((1, 1, None, None, 'ROOM_CAPACITY', 'No room'))
+        phase.rows_inserted = 3
+
+    report = timings.to_dict()
+    assert [timing["phase"] for timing in report["phases"]] == ['loading', 'rooms']
+    assert report["phases"][0]["iterations"] == 4
+    assert report["phases"][1]["rowsInserted"] == 3
+    assert report["phases"][1]["conflictsLogged"] == 1
+    assert report["totalMs"] >= sum(timing["wallMs"] for timing in report["phases"])
+
+
+def test_run_timings_records_a_failed_phase():
+    timings = scheduler.RunTimings()
+
+    try:
+        with timings.phase('persisting'):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+
+    assert [timing.phase for timing in timings.phases] == ['persisting']
+
+
+def test_finish_run_stores_totals_and_phases():
+    conn = FakeConnection()
+    timings = scheduler.RunTimings()
+    with timings.phase('time_slots') as phase:
+        phase.iterations = 12
+    with timings.phase('persisting') as phase:
+        phase.rows_inserted = 40
+
+    scheduler.finish_run(conn, 9, timings, {"exams_scheduled": 12, "total_conflicts": 2})
+
+    [(finished_at, total_ms, exams, conflicts, run_id)] = conn.calls("UPDATE generation_runs")
+    assert (exams, conflicts, run_id) == (12, 2, 9) and total_ms >= 0
+    assert finished_at >= timings.started_at
+    [phases] = conn.calls("INSERT INTO generation_run_phases")
+    assert [(run, seq, phase, iterations, rows) for run, seq, phase, _ms, iterations, rows, _c in phases] == [
+        (9, 1, 'time_slots', 12, 0),
+        (9, 2, 'persisting', 0, 40),
+    ]
+    assert conn.commits == 1
+
+
+def test_start_run_commits_the_run_row():
+    conn = FakeConnection()
+    timings = scheduler.RunTimings()
+
+    run_id = scheduler.start_run(conn, ANNEE, SEMESTER, 'python', 'greedy', 1, timings)
+
+    assert run_id == conn.last_insert_id
+    assert conn.calls("INSERT INTO generation_runs") == [
+        (ANNEE, SEMESTER, 'python', 'greedy', 1, timings.started_at)
+    ]
+    assert conn.commits == 1
+
+
+# ---------- local search ----------
+
+def crowded_snapshot():
+    """Three formations sharing one day's slots, few rooms and teachers of other departments"""
+    return scheduler.Snapshot(
+        exams=[(100 + f, f, 90) for f in range(1, 7)],
+        formations={f: (f"Formation {f}", 1 + f % 2) for f in range(1, 7)},
+        groups={f: [(10 * f + g, 20 + 5 * g) for g in range(2)] for f in range(1, 7)},
+        rooms=[(1, 60, 1), (2, 30, 2), (3, 25, None)],
+        teachers=[(7, 1), (8, 2), (9, None), (10, 2)],
+    )
+
+
+def test_optimize_skips_a_sitting_no_room_can_take():
+    # 50 students, one room of 40 and nobody to move out of it
+    snap = scheduler.Snapshot(
+        exams=[(1, 1, 90)], formations={1: ("Formation 1", 1)}, groups={1: [(11, 50)]},
+        rooms=[(5, 40, 1)], teachers=[(7, 1)],
+    )
+    plan = build(snap)
+
+    scheduler.optimize_plan(snap, plan, 50)
+
+    assert plan.sit_lieu[0] == -1
+    assert [conflict[4] for conflict in plan.conflicts] == ['ROOM_CAPACITY']
+
+
+def test_optimize_never_raises_the_objective_and_keeps_it_consistent():
+    for seed in range(5):
+        snap = crowded_snapshot()
+        plan = scheduler.build_plan(snap, date(2025, 1, 12), date(2025, 1, 13), TIME_SLOTS)
+
+        scheduler.optimize_plan(snap, plan, 30, seed=seed)
+
+        assert plan.stats['objective_after'] <= plan.stats['objective_before']
+        # The tracked objective matches a recount of the final assignment
+        assert scheduler.LocalSearch(snap, plan, scheduler.MAX_SURVEILLANCES_PER_DAY).objective == \
+            plan.stats['objective_after']
+
+
+def test_optimize_stops_at_its_budget():
+    snap = crowded_snapshot()
+    plan = scheduler.build_plan(snap, date(2025, 1, 12), date(2025, 1, 13), TIME_SLOTS)
+
+    scheduler.optimize_plan(snap, plan, 40)
+
+    # Stops at the first clock check past the budget, or earlier once nothing is left to improve
+    assert plan.stats['optimizer_ms'] < 40 + 50
+
+
+class FixedDraw:
+    def __init__(self, value):
+        self.value = value
+
+    def random(self):
+        return self.value
+
+
+def test_accept_move_follows_the_metropolis_rule():
+    assert scheduler.accept_move(0, 0.01, FixedDraw(0.999))
+    assert scheduler.accept_move(-3, 0.01, FixedDraw(0.999))
+    # exp(-1 / 2) ~ 0.61
+    assert scheduler.accept_move(1, 2.0, FixedDraw(0.6))
+    assert not scheduler.accept_move(1, 2.0, FixedDraw(0.62))
+    # Cold: a worsening is almost never taken
+    assert not scheduler.accept_move(1, 0.02, FixedDraw(1e-9))
+
+
+# ---------- engine ----------
+
+def engine_conn(conflict_counts=None):
+    """The database side of generate_schedule for a two-formation period"""
+    return FakeConnection(answers={
+        "FROM examens\n": ((), [(100, 1, 90), (101, 1, 90), (200, 2, 120)]),
+        "FROM formations": ((), [(1, "Formation 1", 1), (2, "Formation 2", 2)]),
+        "FROM groupes g": ((), [(11, 1, 30), (12, 1, 20), (21, 2, 45), (22, 2, 120)]),
+        "FROM lieux_examen": ((), [(2, 25, 1), (3, 40, None), (1, 50, 1), (4, 100, 2)]),
+        "FROM enseignants": ((), [(7, 1), (8, 1), (9, 3)]),
+        "SELECT s.formation_id, s.id": ((), [(1, 10), (2, 20)]),
+        "SELECT se.examen_id, se.id": ((), [(100, 1000), (101, 1001), (200, 2000)]),
+        "FROM schedule_conflicts": ((), [conflict_counts or {
+            "total_conflicts": 2, "student_conflicts": 0, "teacher_conflicts": 0, "room_conflicts": 1,
+        }]),
+    })
+
+
+def test_generate_schedule_places_rooms_and_teachers_as_the_sql_engine():
+    """
+    Expected rows worked out by hand from the rules sp_phase1-3 apply:
+    each exam on its formation's first free day, the slot rotating with the
+    day's exam count; smallest department room that fits, then any room;
+    least loaded free teacher of the department, then of any department.
+    """
+    conn = engine_conn()
+
+    result = scheduler.generate_schedule(
+        conn, ANNEE, SEMESTER, date(2025, 1, 12), date(2025, 1, 14), TIME_SLOTS, 1)
+
+    [exams] = conn.calls("INSERT INTO schedule_examens")
+    assert exams == [
+        (10, 100, date(2025, 1, 12), "08:30:00"),
+        (10, 101, date(2025, 1, 13), "08:30:00"),
+        (20, 200, date(2025, 1, 12), "11:00:00"),
+    ]
+    [rooms] = conn.calls("INSERT INTO schedule_exam_salles")
+    # Group 22 (120 students) fits in no room
+    assert rooms == [(1000, 11, 1), (1000, 12, 2), (2000, 21, 4), (1001, 11, 1), (1001, 12, 2)]
+    [surveillances] = conn.calls("INSERT INTO surveillances")
+    assert surveillances == [(100, 7, 11), (100, 8, 12), (200, 9, 21), (101, 7, 11), (101, 8, 12)]
+    [conflicts] = conn.calls("INSERT INTO schedule_conflicts")
+    assert [(examen_id, teacher_id, kind) for _run, examen_id, _f, teacher_id, _l, kind, _r in conflicts] == [
+        (200, None, 'ROOM_CAPACITY'),
+        (200, 9, 'TEACHER_CROSS_DEPT'),
+    ]
+    assert (result["exams_scheduled"], result["formations_affected"], result["days_used"]) == (3, 2, 2)
+    assert (result["total_conflicts"], result["room_conflicts"]) == (2, 1)
+
+
+def test_generate_schedule_closes_a_failed_run(monkeypatch):
+    conn = engine_conn()
+
+    def crash(*args, **kwargs):
+        raise IndexError("Cannot choose from an empty sequence")
+
+    monkeypatch.setattr(scheduler, "optimize_plan", crash)
+
+    try:
+        scheduler.generate_schedule(
+            conn, ANNEE, SEMESTER, date(2025, 1, 12), date(2025, 1, 14), TIME_SLOTS, 1, optimize_ms=50)
+    except IndexError:
+        pass
+    else:
+        raise AssertionError("the optimizer's error must reach the caller")
+
+    [(finished_at, _total_ms, error, run_id)] = conn.calls("UPDATE generation_runs")
+    # The run row start_run created is the connection's first insert
+    assert finished_at is not None and run_id == 1
+    assert error == "IndexError: Cannot choose from an empty sequence"
+    [phases] = conn.calls("INSERT INTO generation_run_phases")
+    assert [phase for _run, _seq, phase, *_ in phases] == [
+        'loading', 'time_slots', 'rooms', 'surveillance', 'optimizing'
+    ]
+    assert not conn.calls("INSERT INTO schedules")
+
+
+# ---------- phase 1: formation x day bitmap ----------
+
+def placement_snapshot(exams_per_formation, formations=2):
+    exams = [(100 * f + n, f, 90) for f in range(1, formations + 1) for n in range(exams_per_formation)]
+    return scheduler.Snapshot(
+        exams=exams,
+        formations={f: (f"Formation {f}", 1) for f in range(1, formations + 1)},
+        groups={f: [(10 * f, 30)] for f in range(1, formations + 1)},
+        rooms=[(1, 40, 1), (2, 40, 1)],
+        teachers=[(7, 1), (8, 1)],
+    )
+
+
+def bare_plan(days, slots=TIME_SLOTS):
+    return scheduler.Plan(start_date=date(2025, 1, 12), day_count=days, slots=scheduler.parse_time_slots(slots))
+
+
+def test_bitmap_gives_each_formation_one_exam_per_day():
+    snap = placement_snapshot(exams_per_formation=3)
+    plan = bare_plan(days=3)
+
+    scheduler.plan_time_slots(snap, plan)
+
+    assert list(plan.exam_day) == [0, 1, 2, 0, 1, 2]
+    # The second exam of a day takes the next slot
+    assert list(plan.exam_slot) == [0, 0, 0, 1, 1, 1]
+    assert plan.conflicts == []
+
+
+def test_bitmap_rejects_an_exam_once_every_day_is_taken():
+    snap = placement_snapshot(exams_per_formation=3, formations=1)
+    plan = bare_plan(days=2)
+
+    scheduler.plan_time_slots(snap, plan)
+
+    assert list(plan.exam_day) == [0, 1, -1]
+    assert plan.conflicts == [(102, 1, None, None, 'STUDENT_OVERLOAD', 'No dates available in range')]
+
+
+def test_bitmap_counts_exams_of_fixed_schedules_in_the_slot_rotation():
+    snap = placement_snapshot(exams_per_formation=1, formations=1)
+    plan = bare_plan(days=2)
+    fixed = scheduler.Occupancy(exams_per_date={date(2025, 1, 12): 1})
+
+    scheduler.plan_time_slots(snap, plan, fixed)
+
+    assert (plan.exam_day[0], plan.exam_slot[0]) == (0, 1)
+
+
+# ---------- phase 2: FreeRoomIndex ----------
+
+ROOMS = [(1, 60, 1), (2, 30, 1), (3, 40, None), (4, 35, 2), (5, 200, None)]
+
+
+def test_free_room_index_takes_the_smallest_room_that_fits():
+    rooms = scheduler.FreeRoomIndex(ROOMS)
+
+    assert rooms.take(0, 510, None, 33) == (4, 35)
+    assert rooms.take(0, 510, None, 33) == (3, 40)
+    assert rooms.take(0, 510, None, 33) == (1, 60)
+
+
+def test_free_room_index_prefers_the_department_then_falls_back():
+    rooms = scheduler.FreeRoomIndex(ROOMS)
+
+    # Department 1 owns 30 and 60: 60 beats the better-fitting shared 40
+    assert rooms.take(0, 510, 1, 33) == (1, 60)
+    # Nothing of department 1 fits any more
+    assert rooms.take(0, 510, 1, 33) == (4, 35)
+    assert rooms.take(0, 510, 1, 300) is None
+
+
+def test_free_room_index_never_hands_a_room_out_twice_in_a_slot():
+    rooms = scheduler.FreeRoomIndex(ROOMS)
+    taken = [rooms.take(0, 510, 1, 10) for _ in range(len(ROOMS))]
+
+    assert sorted(lieu_id for lieu_id, _capacite in taken) == [1, 2, 3, 4, 5]
+    assert rooms.take(0, 510, 1, 10) is None
+    # Another slot or day has every room again
+    assert rooms.take(0, 660, 1, 10) == (2, 30)
+    assert rooms.take(1, 510, 1, 10) == (2, 30)
+
+
+def test_free_room_index_skips_reserved_rooms():
+    rooms = scheduler.FreeRoomIndex(ROOMS)
+    rooms.reserve(0, 510, 4)
+    rooms.reserve(0, 510, 99)  # not an available room: ignored
+
+    assert rooms.take(0, 510, 2, 33) == (3, 40)
+
+
+# ---------- phase 3: TeacherLoadIndex ----------
+
+TEACHERS = [(7, 1), (8, 1), (9, 2), (10, None)]
+
+
+def test_teacher_load_index_picks_the_least_loaded_teacher():
+    loads = scheduler.TeacherLoadIndex(TEACHERS, max_per_day=3)
+
+    assert loads.pick(0, 510, 1) == 7
+    loads.assign(0, 510, 7)
+    # 7 is busy in this slot; 8 has no surveillance yet
+    assert loads.pick(0, 510, 1) == 8
+    assert loads.pick(0, 660, 1) == 8
+    # All teachers: lowest load, then lowest id
+    assert loads.pick(0, 660, None) == 8
+
+
+def test_teacher_load_index_skips_stale_heap_entries():
+    loads = scheduler.TeacherLoadIndex(TEACHERS, max_per_day=3)
+    assert loads.pick(0, 510, None) == 7
+
+    # Each assignment leaves the previous (load, teacher) entry behind in the heap
+    loads.assign(0, 510, 7)
+    loads.assign(0, 660, 7)
+    loads.assign(0, 510, 8)
+
+    # (0, 7) and (1, 7) are stale; 9 and 10 are still at 0
+    assert loads.pick(0, 660, None) == 9
+    loads.assign(0, 660, 9)
+    loads.assign(0, 660, 10)
+    assert loads.pick(0, 810, None) == 8
+    assert loads.load_range(0) == (1, 2)
+
+
+def test_teacher_load_index_respects_the_daily_limit():
+    loads = scheduler.TeacherLoadIndex([(7, 1)], max_per_day=2)
+    loads.assign(0, 510, 7)
+    loads.assign(0, 660, 7)
+
+    assert loads.pick(0, 810, 1) is None
+    assert loads.pick(1, 510, 1) == 7
+
+
+# ---------- phase 1: DSatur ----------
+
+def dsatur_snapshot(formations=6, exams_per_formation=3):
+    return scheduler.Snapshot(
+        exams=[(100 * f + n, f, 90) for f in range(1, formations + 1) for n in range(exams_per_formation)],
+        formations={f: (f"Formation {f}", 1 + f % 2) for f in range(1, formations + 1)},
+        groups={f: [(10 * f + g, 25 + 10 * ((f + g) % 3)) for g in range(2)] for f in range(1, formations + 1)},
+        rooms=[(1, 60, 1), (2, 45, 2), (3, 35, None), (4, 30, None)],
+        teachers=[(t, 1 + t % 2) for t in range(1, 7)],
+    )
+
+
+def test_dsatur_never_puts_two_exams_of_a_formation_on_one_day():
+    snap = dsatur_snapshot()
+    plan = bare_plan(days=6, slots=TIME_SLOTS + [("Apres-midi", "13:30", "15:30")])
+
+    scheduler.plan_time_slots_dsatur(snap, plan)
+
+    days = {}
+    for i, (_exam_id, formation_id, _duree) in enumerate(snap.exams):
+        assert plan.exam_day[i] >= 0
+        days.setdefault(formation_id, []).append(plan.exam_day[i])
+    assert all(len(set(used)) == len(used) for used in days.values())
+
+
+def test_dsatur_only_shares_a_slot_when_its_rooms_seat_everyone():
+    snap = dsatur_snapshot()
+    # Greedy would put three exams (six groups, four rooms) in a slot
+    plan = bare_plan(days=6)
+
+    scheduler.plan_time_slots_dsatur(snap, plan)
+
+    groups_at = {}
+    for i, (_exam_id, formation_id, _duree) in enumerate(snap.exams):
+        groups_at.setdefault((plan.exam_day[i], plan.exam_slot[i]), []).extend(
+            count for _g, count in snap.groups[formation_id])
+    capacities = sorted((capacite for _l, capacite, _d in snap.rooms), reverse=True)
+    for sizes in groups_at.values():
+        # Largest group in the largest room, and so on: fits iff a seating exists
+        sizes.sort(reverse=True)
+        assert len(sizes) <= min(len(capacities), len(snap.teachers))
+        assert all(size <= capacity for size, capacity in zip(sizes, capacities))
+
+
+def test_dsatur_reports_a_formation_with_more_exams_than_days():
+    snap = dsatur_snapshot(formations=1, exams_per_formation=3)
+    plan = bare_plan(days=2)
+
+    scheduler.plan_time_slots_dsatur(snap, plan)
+
+    assert sorted(plan.exam_day) == [-1, 0, 1]
+    assert [conflict[4] for conflict in plan.conflicts] == ['STUDENT_OVERLOAD']
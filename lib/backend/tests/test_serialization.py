@@ -0,0 +1,48 @@
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+
+import app as backend
+from conftest import FakeConnection, FakePool
+from serialization import ColumnarResponse, FastJSONResponse, dumps
+
+
+def test_dumps_writes_temporal_values_as_str():
+    body = dumps({
+        "day": date(2025, 1, 12),
+        "at": datetime(2025, 1, 12, 8, 30),
+        "start": time(8, 30),
+        "duration": timedelta(hours=8, minutes=30),
+        "total": Decimal("3"),
+        "average": Decimal("2.5"),
+    })
+    assert body == (b'{"day":"2025-01-12","at":"2025-01-12 08:30:00","start":"08:30:00",'
+                    b'"duration":"8:30:00","total":3,"average":2.5}')
+
+
+def test_render_outside_a_request():
+    assert FastJSONResponse({"start": time(8, 30)}).body == b'{"start":"08:30:00"}'
+    assert ColumnarResponse({"rows": []}).body == b'{"rows":[]}'
+
+
+def test_endpoint_renders_through_the_app(monkeypatch):
+    conn = FakeConnection([
+        (("id", "annee_universitaire", "semester", "engine", "strategy", "created_by",
+          "started_at", "finished_at", "error", "total_ms", "exams_scheduled", "total_conflicts"),
+         [(3, "2024-2025", "S1", "python", "greedy", None,
+           datetime(2025, 1, 5, 9, 0), datetime(2025, 1, 5, 9, 0, 1), None, Decimal("812.500"), 120, 2)]),
+        (("run_id", "phase", "wall_ms", "iterations", "rows_inserted", "conflicts_logged"),
+         [(3, "placement", Decimal("700.250"), 120, 0, 1)]),
+    ])
+    monkeypatch.setattr(backend, "db_pool", FakePool(conn))
+
+    response = TestClient(backend.app).get("/api/generation-runs?annee=2024-2025&semester=S1")
+
+    assert response.status_code == 200
+    assert "server-timing" in response.headers
+    run = response.json()["runs"][0]
+    assert run["started_at"] == "2025-01-05 09:00:00"
+    assert run["total_ms"] == 812.5
+    assert run["phases"] == [{"phase": "placement", "wall_ms": 700.25, "iterations": 120,
+                              "rows_inserted": 0, "conflicts_logged": 1}]
@@ -0,0 +1,142 @@
+import sqlite3
+from datetime import date, timedelta
+
+import validator
+from conftest import FakeConnection
+
+
+ANNEE, SEMESTER = "2024-2025", "S1"
+DAY = date(2025, 1, 12)
+
+
+def row(hour, examen_id, formation_id, lieu_id=None, enseignant_id=None, in_scope=1, duree=90):
+    return (DAY, timedelta(hours=hour), duree, examen_id, formation_id, lieu_id, enseignant_id, in_scope)
+
+
+def event(hour, examen_id, formation_id, lieu_id=None, enseignant_id=None, in_scope=True):
+    return validator._events([row(hour, examen_id, formation_id, lieu_id, enseignant_id, in_scope)])[0]
+
+
+def events_conn(exams, rooms, surveillances):
+    return FakeConnection(answers={
+        "SELECT MIN(se.date_exam)": (("first", "last"), [(DAY, DAY)]),
+        "NULL, NULL,": ((), exams),
+        "ses.lieu_id, NULL,": ((), rooms),
+        "ses.lieu_id, sv.enseignant_id,": ((), surveillances),
+    })
+
+
+def test_overlapping_pairs_finds_only_overlaps_within_a_key():
+    events = [event(8, 1, 10, lieu_id=5), event(9, 2, 11, lieu_id=5), event(10, 3, 12, lieu_id=5),
+              event(8, 4, 13, lieu_id=6)]
+
+    pairs = {(a.examen_id, b.examen_id) for a, b in validator.overlapping_pairs(events, 4)}
+
+    # 08:00-09:30 / 09:00-10:30 / 10:00-11:30: neighbours overlap, 1 and 3 do not
+    assert pairs == {(1, 2), (2, 3)}
+
+
+def test_overlapping_pairs_sorts_sittings_without_a_room():
+    # Same exam and times, one surveillance without a matching room row
+    events = [event(8, 1, 10, lieu_id=None, enseignant_id=7), event(8, 1, 10, lieu_id=5, enseignant_id=7)]
+
+    assert len(list(validator.overlapping_pairs(events, 5))) == 1
+
+
+def test_find_conflicts_reports_each_kind_once():
+    found = validator.find_conflicts(validator.Events(
+        exams=[event(8, 1, 10), event(9, 2, 10), event(8, 3, 11, in_scope=False)],
+        # Two groups of exam 1 share room 5
+        rooms=[event(8, 1, 10, lieu_id=5), event(8, 1, 10, lieu_id=5), event(9, 2, 10, lieu_id=5)],
+        surveillances=[event(8, 1, 10, lieu_id=5, enseignant_id=7), event(9, 2, 10, lieu_id=6, enseignant_id=7)],
+    ))
+
+    assert sorted(conflict[4] for conflict in found) == ['ROOM_OVERLAP', 'STUDENT_OVERLOAD', 'TEACHER_OVERLOAD']
+
+
+def test_validate_persists_after_reading_on_the_same_connection():
+    conn = events_conn(
+        exams=[row(8, 1, 10), row(9, 2, 10)],
+        rooms=[row(8, 1, 10, lieu_id=5), row(9, 2, 10, lieu_id=6)],
+        surveillances=[],
+    )
+
+    result = validator.validate(conn, ANNEE, SEMESTER)
+
+    assert result["total_conflicts"] == 1
+    assert result["conflicts_by_type"] == {'STUDENT_OVERLOAD': 1}
+    [inserted] = conn.calls("INSERT INTO schedule_conflicts")
+    assert [(run_id, conflict_type) for run_id, *_, conflict_type, _reason in inserted] == \
+        [(result["run_id"], 'STUDENT_OVERLOAD')]
+    assert conn.calls("sp_refresh_period_stats") == [(ANNEE, SEMESTER)]
+    assert [timing["phase"] for timing in result["timings"]["phases"]] == ['loading', 'sweeping', 'persisting']
+    assert not conn.in_transaction
+
+
+def test_validate_without_persist_writes_nothing():
+    conn = events_conn(exams=[row(8, 1, 10), row(9, 2, 10)], rooms=[], surveillances=[])
+
+    result = validator.validate(conn, ANNEE, SEMESTER, persist=False)
+
+    assert result["run_id"] is None and result["total_conflicts"] == 1
+    assert all(statement.startswith("SELECT") for statement, _params in conn.statements)
+
+
+class SqliteConnection:
+    """Runs load_events' queries for real: %s placeholders, DATE and TIME columns"""
+
+    def __init__(self):
+        self.db = sqlite3.connect(":memory:")
+        self.db.executescript("""
+            CREATE TABLE examens (id INTEGER PRIMARY KEY, duree_minutes INT);
+            CREATE TABLE schedules (id INTEGER PRIMARY KEY, formation_id INT,
+                                    annee_universitaire TEXT, semester TEXT);
+            CREATE TABLE schedule_examens (id INTEGER PRIMARY KEY, schedule_id INT, examen_id INT,
+                                           date_exam TEXT, heure_debut INT);
+            CREATE TABLE schedule_exam_salles (schedule_exam_id INT, groupe_id INT, lieu_id INT);
+            CREATE TABLE surveillances (examen_id INT, enseignant_id INT, groupe_id INT);
+        """)
+
+    def cursor(self):
+        return SqliteCursor(self.db.cursor())
+
+
+class SqliteCursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self, operation, params=()):
+        self.cursor.execute(operation.replace("%s", "?"), params)
+
+    def fetchone(self):
+        # MIN / MAX(date_exam)
+        first, last = self.cursor.fetchone()
+        return (date.fromisoformat(first), date.fromisoformat(last)) if first else (None, None)
+
+    def fetchall(self):
+        # As mysql.connector returns them: date and timedelta (heure_debut is stored in minutes)
+        return [(date.fromisoformat(day), timedelta(minutes=start), *rest)
+                for day, start, *rest in self.cursor.fetchall()]
+
+    def close(self):
+        self.cursor.close()
+
+
+def test_load_events_counts_a_surveillance_once_when_two_schedules_hold_its_exam():
+    conn = SqliteConnection()
+    conn.db.executescript("""
+        INSERT INTO examens VALUES (1, 90);
+        -- An older schedule of the formation still holds exam 1, in another room
+        INSERT INTO schedules VALUES (10, 100, '2024-2025', 'S1'), (11, 100, '2024-2025', 'S1');
+        INSERT INTO schedule_examens VALUES (20, 10, 1, '2025-01-12', 480), (21, 11, 1, '2025-01-12', 480);
+        INSERT INTO schedule_exam_salles VALUES (20, 5, 3), (21, 5, 4);
+        INSERT INTO surveillances VALUES (1, 7, 5);
+    """)
+
+    events = validator.load_events(conn, ANNEE, SEMESTER)
+
+    assert len(events.exams) == 2
+    [surveillance] = events.surveillances
+    assert (surveillance.lieu_id, surveillance.enseignant_id) == (4, 7)
+    # Once per schedule, teacher 7 would surveil rooms 3 and 4 at once
+    assert 'TEACHER_OVERLOAD' not in [conflict[4] for conflict in validator.find_conflicts(events)]
@@ -0,0 +1,291 @@
+"""
+Overlap check of persisted schedules.
+
+Reads the exams, room allocations and surveillances of a period (or of
+one schedule) back from schedule_examens, schedule_exam_salles and
+surveillances, so manual edits and partial regenerations can be checked
+after the fact. Two sittings conflict when their intervals
+[heure_debut, heure_debut + duree_minutes) overlap and they share:
+- a room (ROOM_OVERLAP), unless they are groups of the same exam,
+- a teacher (TEACHER_OVERLOAD), unless both are one exam in one room,
+- a formation (STUDENT_OVERLOAD).
+
+Events are grouped per room, teacher and formation and swept in start
+order with a min-heap of end times, which finds every overlapping pair in
+O(n log n + pairs). Findings are inserted in one batch under a
+generation_runs row (engine 'validator') and replace the previous
+validation of the same scope.
+"""
+
+from datetime import date
+from heapq import heappop, heappush
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import scheduler
+
+
+class Event(NamedTuple):
+    # Minutes since 0001-01-01, so events of different days order correctly
+    start: int
+    end: int
+    examen_id: int
+    formation_id: int
+    lieu_id: Optional[int]
+    enseignant_id: Optional[int]
+    # False for schedules outside the scope that share its dates
+    in_scope: bool
+
+
+class Events(NamedTuple):
+    exams: List[Event]
+    rooms: List[Event]
+    surveillances: List[Event]
+
+
+def _minutes(day: date, start) -> int:
+    # TIME columns come back as timedelta
+    return day.toordinal() * 1440 + int(start.total_seconds()) // 60
+
+
+def _describe(minutes: int) -> str:
+    day = date.fromordinal(minutes // 1440)
+    return f"{day} {scheduler.format_time(minutes % 1440)}"
+
+
+# ============================================
+# LOADING
+# ============================================
+
+def load_events(conn, annee: str, semester: str, schedule_id: Optional[int] = None) -> Events:
+    """
+    Sittings of the period (or of schedule_id) plus those of any other
+    schedule on the same dates, since rooms and teachers are shared
+    """
+    scope = "s.annee_universitaire = %s AND s.semester = %s"
+    scope_params: Tuple = (annee, semester)
+    if schedule_id is not None:
+        scope += " AND s.id = %s"
+        scope_params += (schedule_id,)
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            SELECT MIN(se.date_exam), MAX(se.date_exam)
+            FROM schedule_examens se
+            JOIN schedules s ON s.id = se.schedule_id
+            WHERE {scope}
+        """, scope_params)
+        first_day, last_day = cursor.fetchone()
+        if first_day is None:
+            return Events([], [], [])
+
+        joins = """
+            JOIN schedules s ON s.id = se.schedule_id
+            JOIN examens e ON e.id = se.examen_id
+        """
+        params = (*scope_params, first_day, last_day)
+
+        cursor.execute(f"""
+            SELECT se.date_exam, se.heure_debut, e.duree_minutes, se.examen_id, s.formation_id,
+                   NULL, NULL, {scope}
+            FROM schedule_examens se
+            {joins}
+            WHERE se.date_exam BETWEEN %s AND %s
+        """, params)
+        exams = _events(cursor.fetchall())
+
+        cursor.execute(f"""
+            SELECT se.date_exam, se.heure_debut, e.duree_minutes, se.examen_id, s.formation_id,
+                   ses.lieu_id, NULL, {scope}
+            FROM schedule_exam_salles ses
+            JOIN schedule_examens se ON se.id = ses.schedule_exam_id
+            {joins}
+            WHERE se.date_exam BETWEEN %s AND %s
+        """, params)
+        rooms = _events(cursor.fetchall())
+
+        # A surveillance is for one group, so its room is that group's room.
+        # surveillances has no schedule_id: it goes with the exam's newest
+        # placement, not once per schedule that holds the exam
+        cursor.execute(f"""
+            SELECT se.date_exam, se.heure_debut, e.duree_minutes, se.examen_id, s.formation_id,
+                   ses.lieu_id, sv.enseignant_id, {scope}
+            FROM surveillances sv
+            JOIN (
+                SELECT examen_id, MAX(id) AS id FROM schedule_examens GROUP BY examen_id
+            ) cur ON cur.examen_id = sv.examen_id
+            JOIN schedule_examens se ON se.id = cur.id
+            {joins}
+            LEFT JOIN schedule_exam_salles ses
+                   ON ses.schedule_exam_id = se.id AND ses.groupe_id = sv.groupe_id
+            WHERE se.date_exam BETWEEN %s AND %s
+        """, params)
+        surveillances = _events(cursor.fetchall())
+    finally:
+        cursor.close()
+    return Events(exams, rooms, surveillances)
+
+
+def _events(rows) -> List[Event]:
+    events = []
+    for day, heure_debut, duree, examen_id, formation_id, lieu_id, enseignant_id, in_scope in rows:
+        start = _minutes(day, heure_debut)
+        events.append(Event(start, start + duree, examen_id, formation_id, lieu_id, enseignant_id, bool(in_scope)))
+    return events
+
+
+# ============================================
+# SWEEP
+# ============================================
+
+def overlapping_pairs(events: List[Event], key_index: int) -> Iterator[Tuple[Event, Event]]:
+    """
+    Every pair of events with the same events[key_index] whose intervals
+    overlap. Each group is sorted by start; a heap holds the end times of
+    the events still running, so the ones it contains when an event starts
+    are exactly those it overlaps.
+    """
+    groups: Dict[int, List[Event]] = {}
+    for event in events:
+        key = event[key_index]
+        if key is not None:
+            groups.setdefault(key, []).append(event)
+
+    for group in groups.values():
+        if len(group) < 2:
+            continue
+        # Not the whole tuple: a surveillance without its room row has lieu_id None
+        group.sort(key=lambda event: (event.start, event.end))
+        running: List[Tuple[int, int]] = []
+        for index, event in enumerate(group):
+            while running and running[0][0] <= event.start:
+                heappop(running)
+            for _end, other in running:
+                yield group[other], event
+            heappush(running, (event.end, index))
+
+
+def find_conflicts(events: Events) -> List[tuple]:
+    """
+    schedule_conflicts rows (examen_id, formation_id, enseignant_id,
+    lieu_id, conflict_type, conflict_reason), one per overlapping pair with
+    at least one side in scope; the exam stored is an in-scope one
+    """
+    conflicts = []
+
+    def scoped(a: Event, b: Event) -> Optional[Event]:
+        return b if b.in_scope else a if a.in_scope else None
+
+    for a, b in overlapping_pairs(events.rooms, Event._fields.index('lieu_id')):
+        mine = scoped(a, b)
+        if mine is None or a.examen_id == b.examen_id:
+            continue
+        conflicts.append((
+            mine.examen_id, mine.formation_id, None, a.lieu_id, 'ROOM_OVERLAP',
+            f"Room {a.lieu_id} holds exams {a.examen_id} and {b.examen_id} at {_describe(b.start)}"
+        ))
+
+    for a, b in overlapping_pairs(events.surveillances, Event._fields.index('enseignant_id')):
+        mine = scoped(a, b)
+        if mine is None or (a.examen_id == b.examen_id and a.lieu_id == b.lieu_id):
+            continue
+        conflicts.append((
+            mine.examen_id, mine.formation_id, a.enseignant_id, mine.lieu_id, 'TEACHER_OVERLOAD',
+            f"Teacher {a.enseignant_id} surveils rooms {a.lieu_id} and {b.lieu_id} "
+            f"(exams {a.examen_id}, {b.examen_id}) at {_describe(b.start)}"
+        ))
+
+    for a, b in overlapping_pairs(events.exams, Event._fields.index('formation_id')):
+        mine = scoped(a, b)
+        if mine is None or a.examen_id == b.examen_id:
+            continue
+        conflicts.append((
+            mine.examen_id, mine.formation_id, None, None, 'STUDENT_OVERLOAD',
+            f"Formation {a.formation_id} sits exams {a.examen_id} and {b.examen_id} at {_describe(b.start)}"
+        ))
+
+    # Groups of one exam sharing a room would report the same clash once each
+    return list(dict.fromkeys(conflicts))
+
+
+# ============================================
+# PERSIST
+# ============================================
+
+def store_conflicts(conn, run_id: int, conflicts: List[tuple], annee: str, semester: str,
+                    schedule_id: Optional[int] = None) -> int:
+    """
+    Replace the previous validator findings of the scope with conflicts,
+    in one transaction; returns the number of rows inserted
+    """
+    cursor = conn.cursor()
+    try:
+        # Reading the events left a transaction open (autocommit is off)
+        if conn.in_transaction:
+            conn.commit()
+        conn.start_transaction()
+        scope, params = "", (annee, semester, run_id)
+        if schedule_id is not None:
+            scope = " AND sc.examen_id IN (SELECT examen_id FROM schedule_examens WHERE schedule_id = %s)"
+            params += (schedule_id,)
+        cursor.execute(f"""
+            DELETE sc FROM schedule_conflicts sc
+            JOIN generation_runs r ON r.id = sc.run_id
+            WHERE r.engine = 'validator'
+              AND r.annee_universitaire = %s AND r.semester = %s
+              AND r.id <> %s{scope}
+        """, params)
+        if conflicts:
+            cursor.executemany("""
+                INSERT INTO schedule_conflicts
+                (run_id, examen_id, formation_id, enseignant_id, lieu_id, conflict_type, conflict_reason)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, [(run_id, *conflict) for conflict in conflicts])
+        cursor.callproc("sp_refresh_period_stats", (annee, semester))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return len(conflicts)
+
+
+def validate(conn, annee: str, semester: str, schedule_id: Optional[int] = None,
+             created_by: Optional[int] = None, persist: bool = True) -> dict:
+    """
+    Check the period (or one of its schedules); with persist the findings
+    are stored as a validator run, otherwise only returned
+    """
+    timings = scheduler.RunTimings()
+    run_id = None
+    if persist:
+        run_id = scheduler.start_run(conn, annee, semester, 'validator', None, created_by, timings)
+
+    with scheduler.recording_failure(conn, run_id, timings):
+        with timings.phase('loading') as phase:
+            events = load_events(conn, annee, semester, schedule_id)
+            phase.iterations = len(events.exams) + len(events.rooms) + len(events.surveillances)
+        with timings.phase('sweeping') as phase:
+            conflicts = find_conflicts(events)
+            phase.iterations = len(events.exams) + len(events.rooms) + len(events.surveillances)
+            phase.conflicts_logged = len(conflicts)
+
+        exams_checked = sum(1 for event in events.exams if event.in_scope)
+        by_type: Dict[str, int] = {}
+        for conflict in conflicts:
+            by_type[conflict[4]] = by_type.get(conflict[4], 0) + 1
+
+        result = {
+            "run_id": run_id,
+            "exams_scheduled": exams_checked,
+            "total_conflicts": len(conflicts),
+            "conflicts_by_type": by_type,
+            "conflicts": conflicts,
+        }
+        if persist:
+            with timings.phase('persisting') as phase:
+                phase.rows_inserted = store_conflicts(conn, run_id, conflicts, annee, semester, schedule_id)
+            scheduler.finish_run(conn, run_id, timings, result)
+    result["timings"] = timings.to_dict()
+    return result